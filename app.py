@@ -43,6 +43,7 @@ class TaskManager:
     def __init__(self):
         self.tasks = {}
         self.queues = {}
+        self.traces = {}
 
     def create_task(self, prompt: str) -> Task:
         task_id = str(uuid.uuid4())
@@ -90,16 +91,45 @@ async def index(request: Request):
 
 
 @app.post("/tasks")
-async def create_task(prompt: str = Body(..., embed=True)):
+async def create_task(
+    prompt: str = Body(..., embed=True), trace: bool = Body(False, embed=True)
+):
     task = task_manager.create_task(prompt)
-    asyncio.create_task(run_task(task.id, prompt))
+    asyncio.create_task(run_admitted_task(task.id, prompt, trace))
     return {"task_id": task.id}
 
 
 from app.agent.manus import Manus
+from app.llm.events import TokenSink, token_sink
+from app.runner import AgentRunner
+from app.sandbox.client import sandbox_session
+from app.tracing import Tracer, tracing
 
 
-async def run_task(task_id: str, prompt: str):
+class SSETokenSink(TokenSink):
+    """Forwards streamed LLM text to a task's event stream."""
+
+    def __init__(self, task_id: str):
+        self.task_id = task_id
+
+    async def on_token(self, text: str) -> None:
+        await task_manager.queues[self.task_id].put({"type": "token", "text": text})
+
+    async def on_end(self) -> None:
+        await task_manager.queues[self.task_id].put({"type": "token_end"})
+
+
+# Tasks stay pending until the runner has a free slot and LLM rate limit headroom
+runner = AgentRunner()
+
+
+async def run_admitted_task(task_id: str, prompt: str, trace: bool = False):
+    async with runner.admission(), sandbox_session():
+        await run_task(task_id, prompt, trace)
+
+
+async def run_task(task_id: str, prompt: str, trace: bool = False):
+    tracer = Tracer() if trace else None
     try:
         task_manager.tasks[task_id].status = "running"
 
@@ -107,6 +137,7 @@ async def run_task(task_id: str, prompt: str):
             name="Manus",
             description="A versatile agent that can solve various tasks using multiple tools",
             max_steps=30,
+            stream_tool_calls=True,
         )
         if not agent:
             raise RuntimeError("Failed to initialize Manus agent.")
@@ -158,11 +189,15 @@ async def run_task(task_id: str, prompt: str):
         sse_handler = SSELogHandler(task_id)
         logger.add(sse_handler)
 
-        result = await agent.run(prompt)
+        with token_sink(SSETokenSink(task_id)), tracing(tracer):
+            result = await agent.run(prompt)
         await task_manager.update_task_step(task_id, 1, result, "result")
         await task_manager.complete_task(task_id)
     except Exception as e:
         await task_manager.fail_task(task_id, str(e))
+    finally:
+        if tracer is not None:
+            task_manager.traces[task_id] = tracer.to_chrome_trace()
 
 
 @app.get("/tasks/{task_id}/events")
@@ -244,6 +279,17 @@ async def get_task(task_id: str):
     return task_manager.tasks[task_id]
 
 
+@app.get("/tasks/{task_id}/trace")
+async def get_task_trace(task_id: str):
+    """Chrome trace of a task started with `trace`, for chrome://tracing or Perfetto"""
+    if task_id not in task_manager.traces:
+        raise HTTPException(status_code=404, detail="No trace for this task")
+    return JSONResponse(
+        content=task_manager.traces[task_id],
+        headers={"Content-Disposition": f'attachment; filename="{task_id}.trace.json"'},
+    )
+
+
 @app.exception_handler(Exception)
 async def generic_exception_handler(request: Request, exc: Exception):
     return JSONResponse(
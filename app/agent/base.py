@@ -1,13 +1,24 @@
 from abc import ABC, abstractmethod
-from contextlib import asynccontextmanager
-from typing import List, Optional
+from contextlib import asynccontextmanager, nullcontext
+from pathlib import Path
+from typing import Any, Awaitable, Callable, ClassVar, Dict, List, Optional, Tuple, Union
 
 from pydantic import BaseModel, Field, model_validator
 
+from app.agent.checkpoint import Checkpoint
+from app.agent.loop_detection import LoopDetector, StuckLoop
+from app.budget import RunBudget, current_budget, run_budget
+from app.exceptions import BudgetExceeded
+from app.llm.cost import call_site
 from app.llm.inference import LLM
 from app.logger import logger
-from app.sandbox.client import SANDBOX_CLIENT
-from app.schema import ROLE_TYPE, AgentState, Memory, Message
+from app.sandbox.client import current_sandbox_client
+from app.schema import ROLE_TYPE, AgentState, Memory, Message, Role
+from app.tracing import span
+
+
+# Share of the model's context window the agent's memory may fill
+MEMORY_CONTEXT_SHARE = 0.75
 
 
 class BaseAgent(BaseModel, ABC):
@@ -41,6 +52,24 @@ class BaseAgent(BaseModel, ABC):
     current_step: int = Field(default=0, description="Current step in execution")
 
     duplicate_threshold: int = Field(default=2, description="Threshold for duplicate messages")
+    stuck_window: int = Field(
+        default=10, description="Recent responses searched for duplicates"
+    )
+    on_stuck: Optional[Callable[[StuckLoop], Awaitable[Optional[bool]]]] = Field(
+        default=None,
+        description="Awaited when the agent repeats itself; return True to end the run",
+    )
+
+    # Save a checkpoint here after every step, see `resume`
+    checkpoint_path: Optional[str] = Field(
+        default=None, description="File the agent checkpoints to after each step"
+    )
+    # Fields beyond memory, step and state that a checkpoint restores
+    checkpoint_fields: ClassVar[Tuple[str, ...]] = ("next_step_prompt",)
+
+    _loop_detector: Optional[LoopDetector] = None
+    _observed_response: Optional[Message] = None
+    _stuck_loop: Optional[StuckLoop] = None
 
     class Config:
         arbitrary_types_allowed = True
@@ -53,6 +82,11 @@ class BaseAgent(BaseModel, ABC):
             self.llm = LLM(config_name=self.name.lower())
         if not isinstance(self.memory, Memory):
             self.memory = Memory()
+        if self.memory.max_tokens is None:
+            context_window = (self.llm.model_info or {}).get("max_input_tokens")
+            if context_window:
+                # Leave room for the system prompt, tool schemas and the reply
+                self.memory.max_tokens = int(context_window * MEMORY_CONTEXT_SHARE)
         return self
 
     @asynccontextmanager
@@ -113,11 +147,16 @@ class BaseAgent(BaseModel, ABC):
         kwargs = {"base64_image": base64_image, **(kwargs if role == "tool" else {})}
         self.memory.add_message(message_map[role](content, **kwargs))
 
-    async def run(self, request: Optional[str] = None) -> str:
+    async def run(
+        self, request: Optional[str] = None, budget: Optional[RunBudget] = None
+    ) -> str:
         """Execute the agent's main loop asynchronously.
 
         Args:
             request: Optional initial user request to process.
+            budget: Limits of the run; without one, the budget of the run this
+                agent is part of applies, if any. A step still running when the
+                deadline passes is cancelled.
 
         Returns:
             A string summarizing the execution results.
@@ -131,28 +170,115 @@ class BaseAgent(BaseModel, ABC):
         if request:
             self.update_memory("user", request)
 
-        results: List[str] = []
-        async with self.state_context(AgentState.RUNNING):
-            while (
-                self.current_step < self.max_steps and self.state != AgentState.FINISHED
-            ):
-                self.current_step += 1
-                logger.info(f"Executing step {self.current_step}/{self.max_steps}")
-                step_result = await self.step()
-
-                # Check for stuck state
-                if self.is_stuck():
-                    self.handle_stuck_state()
-
-                results.append(f"Step {self.current_step}: {step_result}")
-
-            if self.current_step >= self.max_steps:
-                self.current_step = 0
-                self.state = AgentState.IDLE
-                results.append(f"Terminated: Reached max steps ({self.max_steps})")
-        await SANDBOX_CLIENT.cleanup()
+        with span("run", "agent", agent=self.name), run_budget(budget):
+            budget = current_budget()
+            results: List[str] = []
+            async with self.state_context(AgentState.RUNNING):
+                while (
+                    self.current_step < self.max_steps and self.state != AgentState.FINISHED
+                ):
+                    self.current_step += 1
+                    logger.info(f"Executing step {self.current_step}/{self.max_steps}")
+                    try:
+                        with call_site(self.name), span(
+                            "step", "agent", agent=self.name, step=self.current_step
+                        ) as step_span:
+                            async with budget.enforce() if budget else nullcontext():
+                                step_result = await self.step()
+                            step_span.set(memory_tokens=self.memory.token_count)
+                    except BudgetExceeded as e:
+                        logger.warning(f"{self.name} ran out of budget: {e}")
+                        results.append(f"Stopped: run budget exhausted ({e})")
+                        break
+
+                    results.append(f"Step {self.current_step}: {step_result}")
+
+                    # Check for stuck state
+                    if self.is_stuck():
+                        if self.on_stuck is not None and await self.on_stuck(
+                            self._stuck_loop
+                        ):
+                            logger.warning(f"{self.name} is stuck in a loop, ending the run")
+                            results.append(
+                                f"Stopped: repeated the same response {self._stuck_loop.repeats + 1} times"
+                            )
+                            break
+                        self.handle_stuck_state()
+
+                    if self.checkpoint_path:
+                        await self.save_checkpoint(self.checkpoint_path)
+
+                if self.current_step >= self.max_steps:
+                    self.current_step = 0
+                    self.state = AgentState.IDLE
+                    results.append(f"Terminated: Reached max steps ({self.max_steps})")
+            await current_sandbox_client().cleanup()
         return "\n".join(results) if results else "No steps executed"
 
+    async def checkpoint(self) -> Checkpoint:
+        """Snapshot the agent as of its last completed step"""
+        return Checkpoint(
+            agent=self.name,
+            current_step=self.current_step,
+            state=self.state,
+            messages=list(self.memory.messages),
+            agent_state={
+                field: getattr(self, field) for field in self.checkpoint_fields
+            },
+            tool_state=await self._save_tool_state(),
+        )
+
+    async def save_checkpoint(self, path: Union[str, Path]) -> None:
+        """Write a checkpoint to `path`; a failed write is logged, not raised"""
+        try:
+            (await self.checkpoint()).save(path)
+        except Exception as e:
+            logger.warning(f"Could not save checkpoint of {self.name} to {path}: {e}")
+
+    async def restore(self, checkpoint: Checkpoint) -> None:
+        """Put the agent back into the state saved in a checkpoint"""
+        if checkpoint.agent != self.name:
+            raise ValueError(
+                f"Checkpoint of agent '{checkpoint.agent}' cannot restore '{self.name}'"
+            )
+        self.memory.clear()
+        self.memory.add_messages(checkpoint.messages)
+        self.current_step = checkpoint.current_step
+        self.state = checkpoint.state
+        for field, value in checkpoint.agent_state.items():
+            if field in self.checkpoint_fields:
+                setattr(self, field, value)
+        await self._restore_tool_state(checkpoint.tool_state)
+        self._loop_detector = None
+        self._observed_response = None
+        self._stuck_loop = None
+
+    async def resume(self, checkpoint: Union[str, Path, Checkpoint]) -> str:
+        """Continue a run from the last step completed before the checkpoint.
+
+        Args:
+            checkpoint: A checkpoint or the file it was saved to.
+
+        Returns:
+            A string summarizing the steps run after the checkpoint.
+        """
+        if not isinstance(checkpoint, Checkpoint):
+            checkpoint = Checkpoint.load(checkpoint)
+        await self.restore(checkpoint)
+        if self.state == AgentState.FINISHED:
+            return f"Already finished at step {self.current_step}"
+
+        logger.info(f"Resuming {self.name} after step {self.current_step}")
+        self.state = AgentState.IDLE
+        return await self.run()
+
+    async def _save_tool_state(self) -> Dict[str, Any]:
+        """State of the agent's tools to include in a checkpoint"""
+        return {}
+
+    async def _restore_tool_state(self, tool_state: Dict[str, Any]) -> None:
+        """Restore the tool state saved by `_save_tool_state`"""
+
     @abstractmethod
     async def step(self) -> str:
         """Execute a single step in the agent's workflow.
@@ -168,22 +294,29 @@ class BaseAgent(BaseModel, ABC):
         logger.warning(f"Agent detected stuck state. Added prompt: {stuck_prompt}")
 
     def is_stuck(self) -> bool:
-        """Check if the agent is stuck in a loop by detecting duplicate content"""
-        if len(self.memory.messages) < 2:
-            return False
-
-        last_message = self.memory.messages[-1]
-        if not last_message.content:
+        """Check if the agent is stuck in a loop by detecting duplicate responses"""
+        response = self._latest_response()
+        if response is None:
             return False
 
-        # Count identical content occurrences
-        duplicate_count = sum(
-            1
-            for msg in reversed(self.memory.messages[:-1])
-            if msg.role == "assistant" and msg.content == last_message.content
-        )
-
-        return duplicate_count >= self.duplicate_threshold
+        # Each response is indexed once, however often this is asked
+        if response is not self._observed_response:
+            if self._loop_detector is None:
+                self._loop_detector = LoopDetector(
+                    self.stuck_window, self.duplicate_threshold
+                )
+            self._observed_response = response
+            self._stuck_loop = self._loop_detector.observe(response)
+        return self._stuck_loop is not None
+
+    def _latest_response(self) -> Optional[Message]:
+        """The assistant message of the last step, if it produced one"""
+        for message in reversed(self.memory.messages):
+            if message.role == Role.ASSISTANT:
+                return message
+            if message.role != Role.TOOL:
+                return None
+        return None
 
     @property
     def messages(self) -> List[Message]:
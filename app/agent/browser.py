@@ -1,9 +1,12 @@
+import asyncio
 import json
 from typing import Any, Optional
 
 from pydantic import Field
 
 from app.agent.toolcall import ToolCallAgent
+from app.config import BrowserSettings, config
+from app.llm.images import Fingerprint, fingerprint_distance, image_fingerprint
 from app.logger import logger
 from app.prompt.browser import NEXT_STEP_PROMPT, SYSTEM_PROMPT
 from app.schema import Message, ToolChoice
@@ -24,7 +27,6 @@ class BrowserAgent(ToolCallAgent):
     system_prompt: str = SYSTEM_PROMPT
     next_step_prompt: str = NEXT_STEP_PROMPT
 
-    max_observe: int = 10000
     max_steps: int = 20
 
     # Configure the available tools
@@ -37,6 +39,7 @@ class BrowserAgent(ToolCallAgent):
     special_tool_names: list[str] = Field(default_factory=lambda: [Terminate().name])
 
     _current_base64_image: Optional[str] = None
+    _last_screenshot_fingerprint: Optional[Fingerprint] = None
 
     async def _handle_special_tool(self, name: str, result: Any, **kwargs):
         if not self._is_special_tool(name):
@@ -70,6 +73,29 @@ class BrowserAgent(ToolCallAgent):
             logger.debug(f"Failed to get browser state: {str(e)}")
             return None
 
+    async def _is_repeated_screenshot(self, base64_image: str) -> bool:
+        """Whether a screenshot looks the same as the previous one"""
+        settings = config.browser_config or BrowserSettings()
+        if settings.screenshot_dedup_distance < 0:
+            return False
+        try:
+            fingerprint = await asyncio.to_thread(image_fingerprint, base64_image)
+        except Exception as e:
+            logger.debug(f"Could not fingerprint screenshot: {e}")
+            return False
+
+        previous = self._last_screenshot_fingerprint
+        self._last_screenshot_fingerprint = fingerprint
+        if previous is None:
+            return False
+        repeated = (
+            fingerprint_distance(previous, fingerprint)
+            <= settings.screenshot_dedup_distance
+        )
+        if repeated:
+            logger.debug("Browser screenshot unchanged, not sending it again")
+        return repeated
+
     async def think(self) -> bool:
         """Process current state and decide next actions using tools, with browser state info added"""
         # Add browser state to the context
@@ -102,8 +128,10 @@ class BrowserAgent(ToolCallAgent):
             if pixels_below > 0:
                 content_below_info = f" ({pixels_below} pixels)"
 
-            # Add screenshot as base64 if available
-            if self._current_base64_image:
+            # Add screenshot as base64 if available and the page changed
+            if self._current_base64_image and not await self._is_repeated_screenshot(
+                self._current_base64_image
+            ):
                 # Create a message with image attachment
                 image_message = Message.user_message(
                     content="Current browser screenshot:",
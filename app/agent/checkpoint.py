@@ -0,0 +1,63 @@
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Union
+
+from pydantic import BaseModel, Field
+
+from app.schema import AgentState, Message
+
+
+# Bumped when the layout changes so old snapshots are rejected, not misread
+CHECKPOINT_VERSION = 1
+
+
+def write_atomic(path: Union[str, Path], text: str) -> None:
+    """
+    Write a text file by replacing it atomically.
+
+    A crash mid-write leaves the previous version of the file intact.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.tmp")
+    tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, path)
+
+
+class Checkpoint(BaseModel):
+    """
+    Snapshot of an agent after a completed step.
+
+    Holds everything `BaseAgent.resume` needs to continue the run without
+    redoing the steps before it: the memory, the step counter and state,
+    agent-specific fields (e.g. the active plan) and the state of tools that
+    outlive a call (e.g. the bash working directory or the browser URL).
+    """
+
+    version: int = Field(default=CHECKPOINT_VERSION)
+    agent: str = Field(..., description="Name of the checkpointed agent")
+    current_step: int = Field(..., description="Last completed step")
+    state: AgentState = Field(..., description="Agent state after the step")
+    messages: List[Message] = Field(default_factory=list)
+    agent_state: Dict[str, Any] = Field(
+        default_factory=dict, description="Fields listed in the agent's checkpoint_fields"
+    )
+    tool_state: Dict[str, Any] = Field(
+        default_factory=dict, description="Saved state by tool name"
+    )
+    created_at: float = Field(default_factory=time.time)
+
+    def save(self, path: Union[str, Path]) -> None:
+        """Write the checkpoint as compact JSON, see `write_atomic`"""
+        write_atomic(path, self.model_dump_json(exclude_none=True))
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "Checkpoint":
+        """Read a checkpoint written by `save`"""
+        checkpoint = cls.model_validate_json(Path(path).read_text(encoding="utf-8"))
+        if checkpoint.version != CHECKPOINT_VERSION:
+            raise ValueError(
+                f"Checkpoint {path} has version {checkpoint.version}, expected {CHECKPOINT_VERSION}"
+            )
+        return checkpoint
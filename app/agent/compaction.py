@@ -0,0 +1,127 @@
+from typing import List, Optional, Tuple
+
+from app.llm.inference import LLM
+from app.llm.router import AGENT_COMPACT_MEMORY, route
+from app.logger import logger
+from app.prompt.toolcall import COMPACTION_PROMPT
+from app.schema import Memory, Message, Role
+
+
+SUMMARY_PREFIX = "Summary of earlier steps:\n"
+
+# Characters of each folded message that go into the summary prompt
+TRANSCRIPT_CHARS_PER_MESSAGE = 2000
+# Characters of each folded message kept by the extractive fallback
+EXTRACT_CHARS_PER_MESSAGE = 200
+
+
+def split_for_compaction(
+    messages: List[Message], keep_tokens: int, min_fold: int = 4
+) -> Optional[Tuple[List[Message], List[Message], List[Message]]]:
+    """
+    Split messages into (head, folded, recent) for compaction.
+
+    `head` is the leading system messages and the first user message (the
+    task), `recent` the newest messages worth at most `keep_tokens` tokens.
+    A tool result is never separated from the assistant message that called
+    it. Returns None when fewer than `min_fold` messages would be folded.
+    """
+    start = 0
+    while start < len(messages) and messages[start].role == Role.SYSTEM:
+        start += 1
+    if start < len(messages) and messages[start].role == Role.USER:
+        start += 1
+
+    split = len(messages)
+    kept_tokens = 0
+    while split > start:
+        tokens = messages[split - 1].token_count
+        if kept_tokens + tokens > keep_tokens and split < len(messages):
+            break
+        kept_tokens += tokens
+        split -= 1
+    # Keep tool results together with the call that produced them
+    while start < split < len(messages) and messages[split].role == Role.TOOL:
+        split -= 1
+
+    if split - start < min_fold:
+        return None
+    return messages[:start], messages[start:split], messages[split:]
+
+
+def _describe(message: Message, limit: int) -> str:
+    """One transcript line for a message"""
+    text = (message.content or "").strip()
+    if len(text) > limit:
+        text = text[:limit] + "..."
+    if message.role == Role.TOOL:
+        return f"[tool {message.name}] {text}"
+    if message.tool_calls:
+        calls = ", ".join(
+            f"{call.function.name}({call.function.arguments[:limit]})"
+            for call in message.tool_calls
+        )
+        text = f"{text} -> {calls}" if text else calls
+    return f"[{message.role}] {text}"
+
+
+def extractive_summary(messages: List[Message]) -> str:
+    """Summarize messages without a model call, keeping the start of each one"""
+    return "\n".join(_describe(msg, EXTRACT_CHARS_PER_MESSAGE) for msg in messages)
+
+
+async def summarize(messages: List[Message], llm: Optional[LLM]) -> str:
+    """Summarize messages with the (routed) LLM, falling back to an extract"""
+    if llm is not None:
+        transcript = "\n".join(
+            _describe(msg, TRANSCRIPT_CHARS_PER_MESSAGE) for msg in messages
+        )
+        try:
+            summary = await route(AGENT_COMPACT_MEMORY, llm).ask(
+                [Message.user_message(COMPACTION_PROMPT.format(transcript=transcript))],
+                stream=False,
+            )
+            if summary and summary.strip():
+                return summary.strip()
+        except Exception as e:
+            logger.warning(f"Memory summary failed, using an extract instead: {e}")
+    return extractive_summary(messages)
+
+
+async def compact_memory(
+    memory: Memory, keep_tokens: int, llm: Optional[LLM] = None
+) -> bool:
+    """
+    Fold older turns of `memory` into one summary message.
+
+    The task, the newest `keep_tokens` tokens of messages and the latest
+    screenshot are kept as they are.
+
+    Returns:
+        bool: Whether anything was folded
+    """
+    parts = split_for_compaction(memory.messages, keep_tokens)
+    if parts is None:
+        return False
+    head, folded, recent = parts
+
+    summary = await summarize(folded, llm)
+    compacted = head + [Message.user_message(SUMMARY_PREFIX + summary)]
+
+    # The latest browser state stays visible if it was folded
+    if not any(msg.base64_image for msg in recent):
+        latest = next((msg for msg in reversed(folded) if msg.base64_image), None)
+        if latest is not None:
+            compacted.append(
+                Message.user_message(
+                    "Latest browser state:", base64_image=latest.base64_image
+                )
+            )
+
+    before = memory.token_count
+    memory.messages = compacted + recent
+    logger.info(
+        f"🗜️ Compacted {len(folded)} messages into a summary: "
+        f"{before} -> {memory.token_count} tokens"
+    )
+    return True
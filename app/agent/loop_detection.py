@@ -0,0 +1,103 @@
+import json
+import re
+from collections import Counter, deque
+from typing import Deque, Literal, Optional, Tuple
+
+from pydantic import BaseModel, Field
+
+from app.schema import Message
+
+
+_NUMBER = re.compile(r"\d+(?:\.\d+)?")
+_WHITESPACE = re.compile(r"\s+")
+
+
+class StuckLoop(BaseModel):
+    """A response that repeats recent responses of the agent."""
+
+    kind: Literal["exact", "near"] = Field(
+        ..., description="Whether the repeat is identical or only the same up to numbers"
+    )
+    repeats: int = Field(..., description="Earlier responses in the window it repeats")
+    response: Message = Field(..., description="The repeating response")
+
+
+def _loosen(text: str) -> str:
+    """Text with case, whitespace and numbers normalized away"""
+    return _WHITESPACE.sub(" ", _NUMBER.sub("#", text.lower())).strip()
+
+
+def _arguments(arguments: Optional[str]) -> str:
+    """Tool call arguments as canonical JSON, independent of key order and spacing"""
+    try:
+        return json.dumps(
+            json.loads(arguments or "{}"), sort_keys=True, separators=(",", ":")
+        )
+    except (TypeError, ValueError):
+        return (arguments or "").strip()
+
+
+def fingerprint(message: Message) -> Tuple[int, int]:
+    """
+    Hashes of a response for exact and near-duplicate detection.
+
+    Both cover the text and the tool calls (name and normalized arguments).
+    The near-duplicate hash also ignores case, whitespace and numbers in the
+    text, so e.g. "retrying in 5s" and "retrying in 6s" count as the same
+    response. Numbers in tool arguments are kept: paging through view_range
+    windows or marking step 0, then 1, then 2 is progress, not a loop.
+    """
+    text = (message.content or "").strip()
+    calls = tuple(
+        (call.function.name, _arguments(call.function.arguments))
+        for call in message.tool_calls or []
+    )
+    exact = hash((text, calls))
+    near = hash((_loosen(text), calls))
+    return exact, near
+
+
+class LoopDetector:
+    """
+    Rolling index of the agent's recent responses.
+
+    Keeps the fingerprints of the last `window` responses with a count per
+    fingerprint, so checking a new response costs the same however long the
+    run is. A response is a loop once `threshold` earlier responses in the
+    window are exact (or near) duplicates of it.
+    """
+
+    def __init__(self, window: int, threshold: int):
+        self.window = window
+        self.threshold = threshold
+        self._recent: Deque[Tuple[int, int]] = deque()
+        self._exact: Counter = Counter()
+        self._near: Counter = Counter()
+
+    def observe(self, message: Message) -> Optional[StuckLoop]:
+        """Add a response to the index, returning the loop it continues, if any"""
+        if not (message.content or "").strip() and not message.tool_calls:
+            return None
+
+        exact, near = fingerprint(message)
+        exact_repeats, near_repeats = self._exact[exact], self._near[near]
+
+        self._recent.append((exact, near))
+        self._exact[exact] += 1
+        self._near[near] += 1
+        if len(self._recent) > self.window:
+            old_exact, old_near = self._recent.popleft()
+            self._forget(self._exact, old_exact)
+            self._forget(self._near, old_near)
+
+        if exact_repeats >= self.threshold:
+            return StuckLoop(kind="exact", repeats=exact_repeats, response=message)
+        if near_repeats >= self.threshold:
+            return StuckLoop(kind="near", repeats=near_repeats, response=message)
+        return None
+
+    @staticmethod
+    def _forget(counts: Counter, key: int) -> None:
+        counts[key] -= 1
+        if not counts[key]:
+            del counts[key]
@@ -34,8 +34,8 @@ class Manus(BrowserAgent):
     system_prompt: str = SYSTEM_PROMPT.format(directory=config.workspace_root)
     next_step_prompt: str = NEXT_STEP_PROMPT
 
-    max_observe: int = 10000
     max_steps: int = 20
+    compaction_threshold: int = 32000
 
     # Add general-purpose tools to the tool collection
     available_tools: ToolCollection = Field(
@@ -0,0 +1,113 @@
+import re
+from typing import List, Optional
+
+from app.config import ObservationSettings, config
+from app.logger import logger
+from app.tool.artifact import ArtifactStore
+
+
+# CSI sequences (colors, cursor movement) and OSC sequences (window titles, links)
+_ANSI = re.compile(r"\x1b\[[0-?]*[ -/]*[@-~]|\x1b\][^\x07\x1b]*(?:\x07|\x1b\\)|\x1b[@-Z\\-_]")
+
+
+def strip_ansi(text: str) -> str:
+    """
+    Remove terminal escape codes and overwritten line content.
+
+    A carriage return inside a line (progress bars, spinners) overwrites what
+    came before it, so only the text after the last one is kept.
+    """
+    text = _ANSI.sub("", text).replace("\r\n", "\n")
+    if "\r" not in text:
+        return text
+    return "\n".join(line.rsplit("\r", 1)[-1] for line in text.split("\n"))
+
+
+def collapse_repeats(text: str, min_run: int) -> str:
+    """Replace runs of at least `min_run` identical lines with one line and a count"""
+    lines = text.split("\n")
+    collapsed: List[str] = []
+    i = 0
+    while i < len(lines):
+        end = i + 1
+        while end < len(lines) and lines[end] == lines[i]:
+            end += 1
+        run = end - i
+        if run >= min_run:
+            collapsed.append(lines[i])
+            collapsed.append(f"[... previous line repeated {run - 1} more times]")
+        else:
+            collapsed.extend(lines[i:end])
+        i = end
+    return "\n".join(collapsed)
+
+
+def head_and_tail(text: str, max_chars: int, head_share: float, marker: str) -> str:
+    """
+    Keep the start and the end of a text within `max_chars`.
+
+    Both ends are cut at line boundaries where a line boundary is close, and
+    the elided middle is replaced by `marker`, in which `{lines}` and `{chars}`
+    are filled with the size of what was left out.
+    """
+    head_chars = int(max_chars * head_share)
+    tail_chars = max_chars - head_chars
+
+    head_end = text.rfind("\n", 0, head_chars)
+    if head_end < head_chars // 2:
+        head_end = head_chars
+    tail_start = text.find("\n", len(text) - tail_chars)
+    if tail_start == -1 or tail_start > len(text) - tail_chars // 2:
+        tail_start = len(text) - tail_chars
+    else:
+        tail_start += 1
+
+    middle = text[head_end:tail_start]
+    elided = marker.format(
+        lines=len(middle.strip("\n").splitlines()), chars=len(middle)
+    )
+    return f"{text[:head_end]}\n{elided}\n{text[tail_start:]}"
+
+
+class ObservationPipeline:
+    """
+    Condenses tool outputs before they enter the agent's memory.
+
+    Escape codes are stripped and repeated lines collapsed, which loses
+    nothing. An output still over `max_chars` keeps its head and tail inline,
+    and the full output is saved to the artifact store under a handle the
+    agent can page through with the read_artifact tool. Pages read back
+    from the store are only cleaned, never cut again.
+    """
+
+    def __init__(
+        self,
+        settings: Optional[ObservationSettings] = None,
+        max_chars: Optional[int] = None,
+        store: Optional[ArtifactStore] = None,
+    ):
+        self.settings = settings or config.observation
+        self.max_chars = self.settings.max_chars if max_chars is None else max_chars
+        self.store = store or ArtifactStore(self.settings.artifact_dir)
+
+    def __call__(self, output: str, truncate: bool = True) -> str:
+        """Condense one tool output; without `truncate` it is only cleaned"""
+        if self.settings.strip_ansi:
+            output = strip_ansi(output)
+        condensed = output
+        if self.settings.collapse_repeats > 1:
+            condensed = collapse_repeats(condensed, self.settings.collapse_repeats)
+        if not truncate or not self.max_chars or len(condensed) <= self.max_chars:
+            return condensed
+
+        try:
+            handle = f"artifact:{self.store.put(output)}"
+        except OSError as e:
+            logger.warning(f"Could not save the full tool output: {e}")
+            marker = "[... {lines} lines ({chars} chars) elided ...]"
+        else:
+            marker = (
+                "[... {lines} lines ({chars} chars) elided; read the full output "
+                f"with read_artifact(handle=\"{handle}\") ...]"
+            )
+        return head_and_tail(condensed, self.max_chars, self.settings.head_share, marker)
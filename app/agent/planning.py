@@ -1,9 +1,11 @@
 import time
-from typing import Dict, List, Optional
+from typing import ClassVar, Dict, List, Optional, Tuple
 
 from pydantic import Field, model_validator
 
 from app.agent.toolcall import ToolCallAgent
+from app.budget import RunBudget, run_budget
+from app.llm.router import PLANNING_AGENT_INITIAL_PLAN, route
 from app.logger import logger
 from app.prompt.planning import NEXT_STEP_PROMPT, PLANNING_SYSTEM_PROMPT
 from app.schema import TOOL_CHOICE_TYPE, Message, ToolCall, ToolChoice
@@ -39,6 +41,13 @@ class PlanningAgent(ToolCallAgent):
 
     max_steps: int = 20
 
+    checkpoint_fields: ClassVar[Tuple[str, ...]] = (
+        "next_step_prompt",
+        "active_plan_id",
+        "step_execution_tracker",
+        "current_step_index",
+    )
+
     @model_validator(mode="after")
     def initialize_plan_and_verify_tools(self) -> "PlanningAgent":
         """Initialize the agent with a default plan ID and validate required tools."""
@@ -56,7 +65,7 @@ class PlanningAgent(ToolCallAgent):
             if self.active_plan_id
             else self.next_step_prompt
         )
-        self.messages.append(Message.user_message(prompt))
+        self.memory.add_message(Message.user_message(prompt))
 
         # Get the current step index before thinking
         self.current_step_index = await self._get_current_step_index()
@@ -113,11 +122,14 @@ class PlanningAgent(ToolCallAgent):
         )
         return result.output if hasattr(result, "output") else str(result)
 
-    async def run(self, request: Optional[str] = None) -> str:
+    async def run(
+        self, request: Optional[str] = None, budget: Optional[RunBudget] = None
+    ) -> str:
         """Run the agent with an optional initial request."""
-        if request:
-            await self.create_initial_plan(request)
-        return await super().run()
+        with run_budget(budget):
+            if request:
+                await self.create_initial_plan(request)
+            return await super().run()
 
     async def update_plan_status(self, tool_call_id: str) -> None:
         """
@@ -208,7 +220,7 @@ class PlanningAgent(ToolCallAgent):
             )
         ]
         self.memory.add_messages(messages)
-        response = await self.llm.ask_tool(
+        response = await route(PLANNING_AGENT_INITIAL_PLAN, self.llm).ask_tool(
             messages=messages,
             system_msgs=[Message.system_message(self.system_prompt)],
             tools=self.available_tools.to_params(),
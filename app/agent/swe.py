@@ -17,9 +17,10 @@ class SWEAgent(ToolCallAgent):
     system_prompt: str = SYSTEM_PROMPT
     next_step_prompt: str = NEXT_STEP_TEMPLATE
 
-    available_tools: ToolCollection = ToolCollection(
-        Bash(), StrReplaceEditor(), AiderTool(), Terminate(),FileEditor(), # Add FileEditor() to the list
-
+    available_tools: ToolCollection = Field(
+        default_factory=lambda: ToolCollection(
+            Bash(), StrReplaceEditor(), AiderTool(), Terminate(),FileEditor(), # Add FileEditor() to the list
+        )
     )
     special_tool_names: List[str] = Field(default_factory=lambda: [Terminate().name])
 
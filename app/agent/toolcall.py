@@ -1,14 +1,19 @@
+import asyncio
 import json
-from typing import Any, Dict, List, Optional, Union
+from typing import Any, Dict, List, Optional, Tuple, Union
 
-from pydantic import Field
+from pydantic import Field, model_validator
 
+from app.agent.compaction import compact_memory
+from app.agent.observation import ObservationPipeline
 from app.agent.react import ReActAgent
-from app.exceptions import TokenLimitExceeded
+from app.exceptions import TokenLimitExceeded, ToolCallStreamInterrupted
 from app.logger import logger
 from app.prompt.toolcall import NEXT_STEP_PROMPT, SYSTEM_PROMPT
 from app.schema import TOOL_CHOICE_TYPE, AgentState, Message, ToolCall, ToolChoice
 from app.tool import CreateChatCompletion, Terminate, ToolCollection
+from app.tool.artifact import READ_ARTIFACT, ReadArtifact
+from app.tracing import span
 
 
 TOOL_CALL_REQUIRED = "Tool calls required but none provided"
@@ -23,8 +28,8 @@ class ToolCallAgent(ReActAgent):
     system_prompt: str = SYSTEM_PROMPT
     next_step_prompt: str = NEXT_STEP_PROMPT
 
-    available_tools: ToolCollection = ToolCollection(
-        CreateChatCompletion(), Terminate()
+    available_tools: ToolCollection = Field(
+        default_factory=lambda: ToolCollection(CreateChatCompletion(), Terminate())
     )
     tool_choices: TOOL_CHOICE_TYPE = ToolChoice.AUTO  # type: ignore
     special_tool_names: List[str] = Field(default_factory=lambda: [Terminate().name])
@@ -34,43 +39,94 @@ class ToolCallAgent(ReActAgent):
     # MCP tools that have been registered
     mcp_tools: Dict[str, Any] = Field(default_factory=dict)
     _current_base64_image: Optional[str] = None
+    _system_message: Optional[Message] = None
 
     max_steps: int = 30
+    # Characters of a tool output kept inline, see ObservationPipeline;
+    # defaults to max_chars of the [observation] config
     max_observe: Optional[Union[int, bool]] = None
+    _observation: Optional[ObservationPipeline] = None
+
+    # Stream the LLM response and start each tool as soon as its call is complete.
+    # Calls of parallel-safe tools run concurrently, see BaseTool.parallel_safe
+    stream_tool_calls: bool = False
+    _pending_tool_tasks: Optional[Dict[str, asyncio.Task]] = None
+    _exclusive_tool_task: Optional[asyncio.Task] = None
+    _dispatch_stopped: bool = False
+
+    # Fold older turns into a summary once the prompt reaches `compaction_threshold`
+    # tokens, or the run reaches `compaction_budget_ratio` of max_input_tokens
+    compaction_threshold: Optional[int] = None
+    compaction_budget_ratio: float = 0.8
+    compaction_keep_tokens: int = 8000
+
+    @model_validator(mode="after")
+    def add_artifact_reader(self) -> "ToolCallAgent":
+        """Let the agent read the full outputs that observations elide."""
+        if ReadArtifact().name not in self.available_tools.tool_map:
+            self.available_tools.add_tool(ReadArtifact())
+        return self
+
+    @property
+    def observation(self) -> ObservationPipeline:
+        """Pipeline that condenses tool outputs before they enter memory"""
+        if self._observation is None:
+            self._observation = ObservationPipeline(
+                max_chars=None if self.max_observe is None else int(self.max_observe)
+            )
+        return self._observation
 
     async def think(self) -> bool:
         """Process current state and decide next actions using tools"""
         if self.next_step_prompt:
             user_msg = Message.user_message(self.next_step_prompt)
-            self.messages += [user_msg]
+            self.memory.add_message(user_msg)
+
+        system_msgs = self._system_messages()
+
+        # Pre-flight budget check from the running token total of memory
+        system_tokens = sum(msg.token_count for msg in system_msgs or [])
+        input_tokens = self.memory.token_count + system_tokens
+        if self._should_compact(input_tokens) and await compact_memory(
+            self.memory, self.compaction_keep_tokens, self.llm
+        ):
+            input_tokens = self.memory.token_count + system_tokens
+        if not self.llm.check_token_limit(input_tokens):
+            self._handle_token_limit(
+                TokenLimitExceeded(self.llm.get_limit_error_message(input_tokens))
+            )
+            return False
+
+        self._cancel_pending_tools()
+        on_tool_call = (
+            self._dispatch_tool_call
+            if self.stream_tool_calls and self.tool_choices != ToolChoice.NONE
+            else None
+        )
 
         try:
             # Get response with tool options
             response = await self.llm.ask_tool(
                 messages=self.messages,
-                system_msgs=(
-                    [Message.system_message(self.system_prompt)]
-                    if self.system_prompt
-                    else None
-                ),
+                system_msgs=system_msgs,
                 tools=self.available_tools.to_params(),
                 tool_choice=self.tool_choices,
+                on_tool_call=on_tool_call,
             )
         except ValueError:
+            self._cancel_pending_tools()
+            raise
+        except TokenLimitExceeded as e:
+            self._handle_token_limit(e)
+            return False
+        except ToolCallStreamInterrupted:
+            self._cancel_pending_tools()
             raise
         except Exception as e:
+            self._cancel_pending_tools()
             # Check if this is a RetryError containing TokenLimitExceeded
             if hasattr(e, "__cause__") and isinstance(e.__cause__, TokenLimitExceeded):
-                token_limit_error = e.__cause__
-                logger.error(
-                    f"🚨 Token limit error (from RetryError): {token_limit_error}"
-                )
-                self.memory.add_message(
-                    Message.assistant_message(
-                        f"Maximum token limit reached, cannot continue execution: {str(token_limit_error)}"
-                    )
-                )
-                self.state = AgentState.FINISHED
+                self._handle_token_limit(e.__cause__)
                 return False
             raise
 
@@ -96,6 +152,7 @@ class ToolCallAgent(ReActAgent):
 
             # Handle different tool_choices modes
             if self.tool_choices == ToolChoice.NONE:
+                self._cancel_pending_tools()
                 if tool_calls:
                     logger.warning(
                         f"🤔 Hmm, {self.name} tried to use tools when they weren't available!"
@@ -122,6 +179,7 @@ class ToolCallAgent(ReActAgent):
 
             return bool(self.tool_calls)
         except Exception as e:
+            self._cancel_pending_tools()
             logger.error(f"🚨 Oops! The {self.name}'s thinking process hit a snag: {e}")
             self.memory.add_message(
                 Message.assistant_message(
@@ -130,6 +188,37 @@ class ToolCallAgent(ReActAgent):
             )
             return False
 
+    def _system_messages(self) -> Optional[List[Message]]:
+        """Return the system prompt as a message, reusing it while the prompt is unchanged"""
+        if not self.system_prompt:
+            return None
+        if (
+            self._system_message is None
+            or self._system_message.content != self.system_prompt
+        ):
+            self._system_message = Message.system_message(self.system_prompt)
+        return [self._system_message]
+
+    def _should_compact(self, input_tokens: int) -> bool:
+        """Whether the next prompt is large enough to fold older turns"""
+        if self.compaction_threshold and input_tokens >= self.compaction_threshold:
+            return True
+        max_input_tokens = self.llm.max_input_tokens
+        return bool(max_input_tokens) and (
+            self.llm.total_input_tokens + input_tokens
+            >= self.compaction_budget_ratio * max_input_tokens
+        )
+
+    def _handle_token_limit(self, error: TokenLimitExceeded) -> None:
+        """Record a token limit error in memory and finish the run"""
+        logger.error(f"🚨 Token limit error: {error}")
+        self.memory.add_message(
+            Message.assistant_message(
+                f"Maximum token limit reached, cannot continue execution: {str(error)}"
+            )
+        )
+        self.state = AgentState.FINISHED
+
     async def act(self) -> str:
         """Execute tool calls and handle their results"""
         if not self.tool_calls:
@@ -139,40 +228,119 @@ class ToolCallAgent(ReActAgent):
             # Return last message content if no tool calls
             return self.messages[-1].content or "No content or commands to execute"
 
-        results = []
+        # Start every call not yet started while the response streamed;
+        # independent calls run concurrently
+        if self._pending_tool_tasks is None:
+            self._pending_tool_tasks = {}
         for command in self.tool_calls:
-            # Reset base64_image for each tool call
-            self._current_base64_image = None
+            if command.id not in self._pending_tool_tasks:
+                self._start_tool_call(command)
 
-            result = await self.execute_tool(command)
-
-            if self.max_observe:
-                result = result[: self.max_observe]
+        results = []
+        try:
+            for command in self.tool_calls:
+                # Results are added to memory in call order
+                result, base64_image = await self._pending_tool_tasks[command.id]
+
+                # Artifact pages are already bounded; cutting them again would
+                # elide lines the agent can then never read
+                result = self.observation(
+                    result, truncate=command.function.name != READ_ARTIFACT
+                )
 
-            logger.info(
-                f"🎯 Tool '{command.function.name}' completed its mission! Result: {result}"
-            )
+                logger.info(
+                    f"🎯 Tool '{command.function.name}' completed its mission! Result: {result}"
+                )
 
-            # Add tool response to memory
-            tool_msg = Message.tool_message(
-                content=result,
-                tool_call_id=command.id,
-                name=command.function.name,
-                base64_image=self._current_base64_image,
-            )
-            self.memory.add_message(tool_msg)
-            results.append(result)
+                # Add tool response to memory
+                tool_msg = Message.tool_message(
+                    content=result,
+                    tool_call_id=command.id,
+                    name=command.function.name,
+                    base64_image=base64_image,
+                )
+                self.memory.add_message(tool_msg)
+                results.append(result)
+        finally:
+            self._cancel_pending_tools()
 
         return "\n\n".join(results)
 
+    async def _dispatch_tool_call(self, command: ToolCall) -> None:
+        """Start a streamed tool call in the background, in call order"""
+        if self._dispatch_stopped or self._is_special_tool(command.function.name):
+            # Special tools end the run, so they and everything after them
+            # wait for act() to keep the original execution order
+            self._dispatch_stopped = True
+            return
+
+        logger.info(f"⚡ Starting tool '{command.function.name}' while response streams")
+        self._start_tool_call(command)
+
+    def _runs_alone(self, command: ToolCall) -> bool:
+        """Whether a call must wait for the calls before it, and block those after it"""
+        tool = self.available_tools.get_tool(command.function.name)
+        return tool is None or not tool.parallel_safe
+
+    def _start_tool_call(self, command: ToolCall) -> asyncio.Task:
+        """
+        Start a tool call in a task, once the calls it depends on have finished.
+
+        A parallel-safe call only waits for the last call before it that runs
+        alone; any other call waits for every call before it.
+        """
+        runs_alone = self._runs_alone(command)
+        if runs_alone:
+            after = list(self._pending_tool_tasks.values())
+        else:
+            after = [self._exclusive_tool_task] if self._exclusive_tool_task else []
+
+        task = asyncio.create_task(self._execute_after(after, command))
+        if runs_alone:
+            self._exclusive_tool_task = task
+        self._pending_tool_tasks[command.id] = task
+        return task
+
+    async def _execute_after(
+        self, after: List[asyncio.Task], command: ToolCall
+    ) -> Tuple[str, Optional[str]]:
+        """Execute a tool call once the given calls finished, returning (result, image)"""
+        if after:
+            await asyncio.wait(after)
+        return await self._execute_tool(command)
+
+    def _cancel_pending_tools(self) -> None:
+        """Cancel tool calls that were started but will not be collected"""
+        for task in (self._pending_tool_tasks or {}).values():
+            task.cancel()
+        self._pending_tool_tasks = {}
+        self._exclusive_tool_task = None
+        self._dispatch_stopped = False
+
     async def execute_tool(self, command: ToolCall) -> str:
         """Execute a single tool call with robust error handling"""
-        if not command or not command.function or not command.function.name:
-            return "Error: Invalid command format"
+        result, self._current_base64_image = await self._execute_tool(command)
+        return result
 
+    async def _execute_tool(self, command: ToolCall) -> Tuple[str, Optional[str]]:
+        """Execute a tool call, returning the observation and the screenshot it took"""
+        if not command or not command.function or not command.function.name:
+            return "Error: Invalid command format", None
+
+        with span(
+            "execute_tool",
+            "tool",
+            tool=command.function.name,
+            arguments_size=len(command.function.arguments or ""),
+        ) as tool_span:
+            observation, image = await self._run_tool_call(command)
+            tool_span.set(observation_size=len(observation), screenshot=image is not None)
+        return observation, image
+
+    async def _run_tool_call(self, command: ToolCall) -> Tuple[str, Optional[str]]:
         name = command.function.name
         if name not in self.available_tools.tool_map:
-            return f"Error: Unknown tool '{name}'"
+            return f"Error: Unknown tool '{name}'", None
 
         try:
             # Parse arguments
@@ -185,37 +353,49 @@ class ToolCallAgent(ReActAgent):
             # Handle special tools
             await self._handle_special_tool(name=name, result=result)
 
-            # Check if result is a ToolResult with base64_image
-            if hasattr(result, "base64_image") and result.base64_image:
-                # Store the base64_image for later use in tool_message
-                self._current_base64_image = result.base64_image
-
-                # Format result for display
-                observation = (
-                    f"Observed output of cmd `{name}` executed:\n{str(result)}"
-                    if result
-                    else f"Cmd `{name}` completed with no output"
-                )
-                return observation
-
-            # Format result for display (standard case)
+            # Format result for display
             observation = (
                 f"Observed output of cmd `{name}` executed:\n{str(result)}"
                 if result
                 else f"Cmd `{name}` completed with no output"
             )
-
-            return observation
+            # A screenshot goes to the tool message along with the observation
+            return observation, getattr(result, "base64_image", None) or None
         except json.JSONDecodeError:
             error_msg = f"Error parsing arguments for {name}: Invalid JSON format"
             logger.error(
                 f"📝 Oops! The arguments for '{name}' don't make sense - invalid JSON, arguments:{command.function.arguments}"
             )
-            return f"Error: {error_msg}"
+            return f"Error: {error_msg}", None
         except Exception as e:
             error_msg = f"⚠️ Tool '{name}' encountered a problem: {str(e)}"
             logger.exception(error_msg)
-            return f"Error: {error_msg}"
+            return f"Error: {error_msg}", None
+
+    async def _save_tool_state(self) -> Dict[str, Any]:
+        """State of the tools that keep any, by tool name"""
+        tool_state = {}
+        for tool in self.available_tools:
+            try:
+                state = await tool.save_state()
+            except Exception as e:
+                logger.warning(f"Could not save the state of tool '{tool.name}': {e}")
+                continue
+            if state is not None:
+                tool_state[tool.name] = state
+        return tool_state
+
+    async def _restore_tool_state(self, tool_state: Dict[str, Any]) -> None:
+        """Restore each tool's saved state; a tool that fails starts afresh"""
+        for name, state in tool_state.items():
+            tool = self.available_tools.get_tool(name)
+            if tool is None:
+                logger.warning(f"Checkpoint has state of unknown tool '{name}'")
+                continue
+            try:
+                await tool.restore_state(state)
+            except Exception as e:
+                logger.warning(f"Could not restore the state of tool '{name}': {e}")
 
     async def initialize(self):
         """Initialize the agent, including MCP tools."""
@@ -227,20 +407,9 @@ class ToolCallAgent(ReActAgent):
                 # Initialize MCP tools with agent name
                 self.mcp_tools = await MCPToolRegistry.initialize(agent_name=self.name)
 
-                # Add MCP tools to available tools
-                for tool_name, tool in self.mcp_tools.items():
-                    self.available_tools.add_tool(tool)
-
-                # Update next_step_prompt to include MCP tools
-                if self.mcp_tools:
-                    mcp_tools_desc = "\n\n".join([
-                        f"{tool.name}: {tool.description} Parameters: {tool.parameters}"
-                        for tool in self.mcp_tools.values()
-                    ])
-
-                    # Add MCP tools to the prompt
-                    # Simply append MCP tools description to the prompt
-                    self.next_step_prompt = self.next_step_prompt + f"\n\nAdditional MCP Tools:\n{mcp_tools_desc}"
+                # Add MCP tools to available tools; their schemas reach the
+                # LLM with the other tools, so the prompt does not repeat them
+                self.available_tools.add_tools(*self.mcp_tools.values())
 
                 logger.info(f"Initialized {len(self.mcp_tools)} MCP tools for agent {self.name}")
             else:
@@ -0,0 +1,175 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Iterator, Optional
+
+from app.config import BudgetSettings
+from app.exceptions import BudgetExceeded
+
+
+class RunBudget:
+    """
+    Limits of one run, shared by every agent, tool and LLM call it makes.
+
+    A run has a wall-clock deadline and may cap the prompt tokens it sends,
+    the cost of its LLM calls and the seconds its tools spend executing; a
+    limit of None is no limit. Calls with a timeout of their own wait at most
+    for the time left until the deadline, so one slow step cannot overrun
+    the run.
+    """
+
+    def __init__(
+        self,
+        timeout: Optional[float] = None,
+        max_prompt_tokens: Optional[int] = None,
+        max_cost: Optional[float] = None,
+        max_tool_seconds: Optional[float] = None,
+    ):
+        self.deadline = None if timeout is None else time.monotonic() + timeout
+        self.max_prompt_tokens = max_prompt_tokens
+        self.max_cost = max_cost
+        self.max_tool_seconds = max_tool_seconds
+
+        self.prompt_tokens = 0
+        self.cost = 0.0
+        self.tool_seconds = 0.0
+
+    @classmethod
+    def from_settings(cls, settings: BudgetSettings) -> "RunBudget":
+        """Budget with the limits of the [budget] config, starting now"""
+        return cls(
+            timeout=settings.timeout,
+            max_prompt_tokens=settings.max_prompt_tokens,
+            max_cost=settings.max_cost,
+            max_tool_seconds=settings.max_tool_seconds,
+        )
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left until the deadline, None without one"""
+        if self.deadline is None:
+            return None
+        return max(self.deadline - time.monotonic(), 0.0)
+
+    def tool_seconds_left(self) -> Optional[float]:
+        """Seconds tools may still spend executing, None without a limit"""
+        if self.max_tool_seconds is None:
+            return None
+        return max(self.max_tool_seconds - self.tool_seconds, 0.0)
+
+    def timeout(self, own: Optional[float]) -> Optional[float]:
+        """Timeout for a call: its own, cut to the time left in the run"""
+        remaining = self.remaining()
+        if remaining is None:
+            return own
+        return remaining if own is None else min(own, remaining)
+
+    def exceeded(self) -> Optional[str]:
+        """Which limit is used up, None while the run may go on"""
+        if self.deadline is not None and self.remaining() == 0:
+            return "run deadline reached"
+        if (
+            self.max_prompt_tokens is not None
+            and self.prompt_tokens >= self.max_prompt_tokens
+        ):
+            return f"prompt token budget of {self.max_prompt_tokens} used up"
+        if self.max_cost is not None and self.cost >= self.max_cost:
+            return f"cost budget of ${self.max_cost:g} used up"
+        if (
+            self.max_tool_seconds is not None
+            and self.tool_seconds >= self.max_tool_seconds
+        ):
+            return f"tool time budget of {self.max_tool_seconds:g}s used up"
+        return None
+
+    def check(self, prompt_tokens: int = 0) -> None:
+        """
+        Raise BudgetExceeded if a limit is used up, or if sending a prompt of
+        `prompt_tokens` would go over the prompt token budget.
+        """
+        reason = self.exceeded()
+        if reason is None and self.max_prompt_tokens is not None:
+            if self.prompt_tokens + prompt_tokens > self.max_prompt_tokens:
+                reason = (
+                    f"a prompt of {prompt_tokens} tokens would exceed the prompt "
+                    f"token budget ({self.prompt_tokens}/{self.max_prompt_tokens} used)"
+                )
+        if reason is not None:
+            raise BudgetExceeded(reason)
+
+    def charge(
+        self, prompt_tokens: int = 0, cost: float = 0.0, tool_seconds: float = 0.0
+    ) -> None:
+        """Add usage to the run's totals"""
+        self.prompt_tokens += prompt_tokens
+        self.cost += cost
+        self.tool_seconds += tool_seconds
+
+    @asynccontextmanager
+    async def enforce(self, tool_time: bool = False) -> AsyncIterator[None]:
+        """
+        Run a block within the budget, cancelling it at the deadline.
+
+        Raises BudgetExceeded at once if a limit is already used up, and when
+        the block is cancelled. With `tool_time`, the block is a tool call: its
+        time is charged to the tool time budget, which also cuts it short.
+        """
+        self.check()
+        remaining = self.remaining()
+        tool_left = self.tool_seconds_left() if tool_time else None
+        tool_limited = tool_left is not None and (
+            remaining is None or tool_left < remaining
+        )
+        started = time.monotonic()
+        timed_out = False
+        try:
+            async with asyncio.timeout(self.timeout(tool_left)) as scope:
+                yield
+        except TimeoutError:
+            if not scope.expired():
+                raise
+            timed_out = True
+        finally:
+            if tool_time:
+                self.charge(tool_seconds=time.monotonic() - started)
+        if timed_out:
+            reason = (
+                f"tool time budget of {self.max_tool_seconds:g}s used up"
+                if tool_limited
+                else "run deadline reached"
+            )
+            raise BudgetExceeded(reason)
+
+
+# Budget of the run in progress; nothing is limited unless an entry point sets one
+_run_budget: ContextVar[Optional[RunBudget]] = ContextVar("run_budget", default=None)
+
+
+def current_budget() -> Optional[RunBudget]:
+    """Return the budget of the run in progress."""
+    return _run_budget.get()
+
+
+@contextmanager
+def run_budget(budget: Optional[RunBudget]) -> Iterator[None]:
+    """Limit the code run inside the block by `budget`; None keeps the current one."""
+    if budget is None:
+        yield
+        return
+    token = _run_budget.set(budget)
+    try:
+        yield
+    finally:
+        _run_budget.reset(token)
+
+
+def budget_timeout(timeout: Optional[float]) -> Optional[float]:
+    """
+    Timeout for a call made now: `timeout` cut to the time left in the
+    current run budget. Raises BudgetExceeded if the budget is used up.
+    """
+    budget = _run_budget.get()
+    if budget is None:
+        return timeout
+    budget.check()
+    return budget.timeout(timeout)
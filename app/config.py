@@ -1,7 +1,7 @@
 import threading
 import tomllib
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, List, Literal, Optional
 
 from pydantic import BaseModel, Field
 
@@ -28,6 +28,53 @@ class LLMSettings(BaseModel):
     api_type: str = Field(..., description="Azure, Openai, or Ollama")
     api_version: str = Field(..., description="Azure Openai version if AzureOpenai")
     timeout: int = Field(120, description="Request timeout in seconds")
+    coalesce_requests: bool = Field(
+        True,
+        description="Share one provider call between identical concurrent requests",
+    )
+    http_max_connections: int = Field(
+        100, description="Maximum open connections in the shared HTTP pool"
+    )
+    http_max_connections_per_host: Optional[int] = Field(
+        None,
+        description="Maximum open connections to a single host (None for no extra limit)",
+    )
+    http_max_keepalive_connections: int = Field(
+        20, description="Maximum idle connections kept alive in the pool"
+    )
+    http_keepalive_expiry: float = Field(
+        60.0, description="Seconds an idle connection is kept alive"
+    )
+    http2: bool = Field(False, description="Use HTTP/2 for provider requests")
+    rpm_limit: Optional[int] = Field(
+        None, description="Maximum requests per minute to this model (None for unlimited)"
+    )
+    tpm_limit: Optional[int] = Field(
+        None, description="Maximum tokens per minute to this model (None for unlimited)"
+    )
+    supports_images: Optional[bool] = Field(
+        None,
+        description="Whether the model accepts images (None to ask litellm)",
+    )
+    max_images: Optional[int] = Field(
+        2,
+        description="Only the most recent N images are sent with a request (None for all)",
+    )
+    hedge_with: Optional[str] = Field(
+        None,
+        description="[llm.<name>] config of an equivalent endpoint that slow tool "
+        "requests are duplicated to (None to disable hedging)",
+    )
+    hedge_percentile: float = Field(
+        95.0,
+        description="Hedge once a request is slower than this percentile of recent ones",
+    )
+    hedge_min_delay: float = Field(
+        1.0, description="Never hedge a request sooner than this many seconds"
+    )
+    hedge_initial_delay: float = Field(
+        10.0, description="Seconds to wait before hedging until enough calls were timed"
+    )
 
 
 class ProxySettings(BaseModel):
@@ -63,6 +110,22 @@ class BrowserSettings(BaseModel):
     max_content_length: int = Field(
         2000, description="Maximum length for content retrieval operations"
     )
+    screenshot_max_tiles: int = Field(
+        6, description="High detail 512px tiles a screenshot may be billed for"
+    )
+    screenshot_quality: int = Field(
+        75, description="JPEG quality screenshots are recompressed with"
+    )
+    screenshot_crop: bool = Field(
+        False,
+        description="Cut screenshots over the tile budget to their top part "
+        "instead of downscaling them whole",
+    )
+    screenshot_dedup_distance: int = Field(
+        0,
+        description="Screenshots differing from the previous one in at most this many "
+        "thumbnail pixels are not sent again (negative to send every screenshot)",
+    )
 
 
 class SandboxSettings(BaseModel):
@@ -79,6 +142,127 @@ class SandboxSettings(BaseModel):
     )
 
 
+class LLMCacheSettings(BaseModel):
+    """Configuration for the LLM response cache"""
+
+    enabled: bool = Field(False, description="Whether to cache LLM responses")
+    memory_max_entries: int = Field(
+        256, description="Maximum number of responses kept in the in-process tier"
+    )
+    disk_enabled: bool = Field(
+        True, description="Whether to persist responses in the on-disk tier"
+    )
+    disk_path: Optional[str] = Field(
+        None, description="SQLite file for the on-disk tier (default: .cache/llm)"
+    )
+    disk_max_entries: int = Field(
+        10000, description="Maximum number of responses kept on disk"
+    )
+    disk_max_bytes: int = Field(
+        256 * 1024 * 1024, description="Maximum total payload size kept on disk"
+    )
+    ttl: int = Field(7 * 24 * 3600, description="Time to live of a response (seconds)")
+
+
+class LLMRoutingSettings(BaseModel):
+    """Configuration for cheap-first model routing"""
+
+    enabled: bool = Field(False, description="Whether to route calls by call site")
+    routes: Dict[str, str] = Field(
+        default_factory=dict,
+        description="Call site to the [llm.<name>] config that is tried first",
+    )
+    min_response_chars: int = Field(
+        1, description="Shorter text answers from the cheap model are escalated"
+    )
+
+
+class LLMBackendSettings(BaseModel):
+    """Configuration for recording and replaying LLM traffic"""
+
+    mode: Literal["live", "record", "replay"] = Field(
+        "live",
+        description="live: call the provider, record: call it and write a cassette, "
+        "replay: serve responses from the cassette without network",
+    )
+    cassette_path: Optional[str] = Field(
+        None, description="JSONL cassette file (default: .cache/llm/cassette.jsonl)"
+    )
+    simulate_latency: bool = Field(
+        False, description="Whether replay waits as long as the recorded calls took"
+    )
+    latency_scale: float = Field(
+        1.0, description="Multiplier applied to recorded latencies during replay"
+    )
+
+
+class ObservationSettings(BaseModel):
+    """Configuration for condensing tool outputs before they enter agent memory"""
+
+    strip_ansi: bool = Field(
+        True, description="Whether to remove terminal escape codes and overwritten progress lines"
+    )
+    collapse_repeats: int = Field(
+        3, description="Runs of at least this many identical lines become one (0 to keep them)"
+    )
+    max_chars: int = Field(
+        6000,
+        description="Longer outputs keep only their head and tail inline; the full "
+        "output goes to the artifact store (0 for no limit)",
+    )
+    head_share: float = Field(
+        0.4,
+        description="Share of max_chars kept from the head; the tail, where errors "
+        "usually are, gets the rest",
+    )
+    artifact_dir: Optional[str] = Field(
+        None, description="Directory of the artifact store (default: .cache/artifacts)"
+    )
+
+
+class ToolMemoSettings(BaseModel):
+    """Configuration for reusing the results of idempotent tool calls"""
+
+    enabled: bool = Field(True, description="Whether to reuse idempotent tool results")
+    max_entries: int = Field(256, description="Results kept per tool collection")
+    ttl: int = Field(600, description="Time to live of a result (seconds)")
+    web_search: bool = Field(
+        False,
+        description="Reuse the results of repeated web searches; off by default "
+        "since search results change over time",
+    )
+
+
+class RunnerSettings(BaseModel):
+    """Configuration for running many agent tasks in one process"""
+
+    max_concurrency: int = Field(4, description="Tasks running at the same time")
+    admission_llm: str = Field(
+        "default",
+        description="[llm] config whose rate limits gate the start of new tasks",
+    )
+    admission_tokens: Optional[int] = Field(
+        None,
+        description="Tokens of free TPM budget a task needs to start "
+        "(default: the median prompt size of recent calls)",
+    )
+
+
+class BudgetSettings(BaseModel):
+    """Limits of one run, shared by all of its agents, tools and LLM calls"""
+
+    timeout: Optional[float] = Field(
+        3600, description="Wall-clock seconds a run may take (None: no deadline)"
+    )
+    max_prompt_tokens: Optional[int] = Field(
+        None, description="Prompt tokens a run may send to LLMs"
+    )
+    max_cost: Optional[float] = Field(None, description="Dollars a run may spend on LLMs")
+    max_tool_seconds: Optional[float] = Field(
+        None, description="Seconds a run's tools may spend executing"
+    )
+
+
 class AppConfig(BaseModel):
     llm: Dict[str, LLMSettings]
     sandbox: Optional[SandboxSettings] = Field(
@@ -90,6 +274,27 @@ class AppConfig(BaseModel):
     search_config: Optional[SearchSettings] = Field(
         None, description="Search configuration"
     )
+    llm_cache: Optional[LLMCacheSettings] = Field(
+        None, description="LLM response cache configuration"
+    )
+    llm_routing: Optional[LLMRoutingSettings] = Field(
+        None, description="LLM call routing configuration"
+    )
+    llm_backend: Optional[LLMBackendSettings] = Field(
+        None, description="LLM record/replay configuration"
+    )
+    observation: Optional[ObservationSettings] = Field(
+        None, description="Tool output condensing configuration"
+    )
+    tool_memo: Optional[ToolMemoSettings] = Field(
+        None, description="Tool result memoization configuration"
+    )
+    runner: Optional[RunnerSettings] = Field(
+        None, description="Concurrent task runner configuration"
+    )
+    budget: Optional[BudgetSettings] = Field(
+        None, description="Run budget configuration"
+    )
 
     class Config:
         arbitrary_types_allowed = True
@@ -148,6 +353,24 @@ class Config:
             "api_type": base_llm.get("api_type", ""),
             "api_version": base_llm.get("api_version", ""),
             "timeout": base_llm.get("timeout", 120),
+            "coalesce_requests": base_llm.get("coalesce_requests", True),
+            "http_max_connections": base_llm.get("http_max_connections", 100),
+            "http_max_connections_per_host": base_llm.get(
+                "http_max_connections_per_host"
+            ),
+            "http_max_keepalive_connections": base_llm.get(
+                "http_max_keepalive_connections", 20
+            ),
+            "http_keepalive_expiry": base_llm.get("http_keepalive_expiry", 60.0),
+            "http2": base_llm.get("http2", False),
+            "rpm_limit": base_llm.get("rpm_limit"),
+            "tpm_limit": base_llm.get("tpm_limit"),
+            "supports_images": base_llm.get("supports_images"),
+            "max_images": base_llm.get("max_images", 2),
+            "hedge_with": base_llm.get("hedge_with"),
+            "hedge_percentile": base_llm.get("hedge_percentile", 95.0),
+            "hedge_min_delay": base_llm.get("hedge_min_delay", 1.0),
+            "hedge_initial_delay": base_llm.get("hedge_initial_delay", 10.0),
         }
 
         # handle browser config.
@@ -193,6 +416,27 @@ class Config:
         else:
             sandbox_settings = SandboxSettings()
 
+        llm_cache_config = raw_config.get("llm_cache", {})
+        llm_cache_settings = LLMCacheSettings(**llm_cache_config)
+
+        llm_routing_config = raw_config.get("llm_routing", {})
+        llm_routing_settings = LLMRoutingSettings(**llm_routing_config)
+
+        llm_backend_config = raw_config.get("llm_backend", {})
+        llm_backend_settings = LLMBackendSettings(**llm_backend_config)
+
+        observation_config = raw_config.get("observation", {})
+        observation_settings = ObservationSettings(**observation_config)
+
+        tool_memo_config = raw_config.get("tool_memo", {})
+        tool_memo_settings = ToolMemoSettings(**tool_memo_config)
+
+        runner_config = raw_config.get("runner", {})
+        runner_settings = RunnerSettings(**runner_config)
+
+        budget_config = raw_config.get("budget", {})
+        budget_settings = BudgetSettings(**budget_config)
+
         config_dict = {
             "llm": {
                 "default": default_settings,
@@ -204,6 +448,13 @@ class Config:
             "sandbox": sandbox_settings,
             "browser_config": browser_settings,
             "search_config": search_settings,
+            "llm_cache": llm_cache_settings,
+            "llm_routing": llm_routing_settings,
+            "llm_backend": llm_backend_settings,
+            "observation": observation_settings,
+            "tool_memo": tool_memo_settings,
+            "runner": runner_settings,
+            "budget": budget_settings,
         }
 
         self._config = AppConfig(**config_dict)
@@ -224,6 +475,34 @@ class Config:
     def search_config(self) -> Optional[SearchSettings]:
         return self._config.search_config
 
+    @property
+    def llm_cache(self) -> LLMCacheSettings:
+        return self._config.llm_cache
+
+    @property
+    def llm_routing(self) -> LLMRoutingSettings:
+        return self._config.llm_routing
+
+    @property
+    def llm_backend(self) -> LLMBackendSettings:
+        return self._config.llm_backend
+
+    @property
+    def observation(self) -> ObservationSettings:
+        return self._config.observation
+
+    @property
+    def tool_memo(self) -> ToolMemoSettings:
+        return self._config.tool_memo
+
+    @property
+    def runner(self) -> RunnerSettings:
+        return self._config.runner
+
+    @property
+    def budget(self) -> BudgetSettings:
+        return self._config.budget
+
     @property
     def workspace_root(self) -> Path:
         """Get the workspace root directory"""
@@ -11,3 +11,15 @@ class OpenManusError(Exception):
 
 class TokenLimitExceeded(OpenManusError):
     """Exception raised when the token limit is exceeded"""
+
+
+class BudgetExceeded(OpenManusError):
+    """Exception raised when a run has used up its time, token, cost or tool budget"""
+
+
+class ToolCallStreamInterrupted(OpenManusError):
+    """Exception raised when a tool call stream fails after tools were dispatched"""
+
+
+class CassetteMiss(OpenManusError):
+    """Exception raised when a replayed request is not in the cassette"""
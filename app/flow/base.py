@@ -4,6 +4,7 @@ from typing import Dict, List, Optional, Union
 
 from pydantic import BaseModel
 from app.agent.base import BaseAgent
+from app.budget import RunBudget
 from app.logger import logger
 
 
@@ -61,8 +62,8 @@ class BaseFlow(BaseModel, ABC):
         self.agents[key] = agent
 
     @abstractmethod
-    async def execute(self, input_text: str) -> str:
-        """Execute the flow with given input"""
+    async def execute(self, input_text: str, budget: Optional[RunBudget] = None) -> str:
+        """Execute the flow with given input, within `budget` if given"""
 
 
 class PlanStepStatus(str, Enum):
@@ -1,17 +1,33 @@
 import json
 import time
+from pathlib import Path
 from typing import Dict, List, Optional, Union
 
-from pydantic import Field
+from pydantic import BaseModel, Field
 
 from app.agent.base import BaseAgent
+from app.agent.checkpoint import Checkpoint, write_atomic
+from app.budget import RunBudget, current_budget, run_budget
 from app.flow.base import BaseFlow, PlanStepStatus
 from app.llm.inference import LLM
+from app.llm.router import PLANNING_FLOW_FINALIZE, route
 from app.logger import logger
 from app.schema import AgentState, Message, ToolChoice
 from app.tool import PlanningTool
 
 
+class FlowCheckpoint(BaseModel):
+    """Progress of a planning flow, saved next to the checkpoints of its agents."""
+
+    active_plan_id: str
+    planning: dict = Field(default_factory=dict, description="Planning tool state")
+    result: str = Field(default="", description="Output of the completed steps")
+    finished: bool = False
+    # Agent running the in-progress step and its step count when the step began
+    executor_key: Optional[str] = None
+    executor_step: int = 0
+
+
 class PlanningFlow(BaseFlow):
     """A flow that manages planning and execution of tasks using agents."""
 
@@ -21,6 +37,9 @@ class PlanningFlow(BaseFlow):
     active_plan_id: str = Field(default_factory=lambda: f"plan_{int(time.time())}")
     current_step_index: Optional[int] = None
 
+    # Save progress here so an interrupted execution can be resumed, see `resume`
+    checkpoint_dir: Optional[str] = None
+
     def __init__(
         self, agents: Union[BaseAgent, List[BaseAgent], Dict[str, BaseAgent]], **data
     ):
@@ -61,8 +80,17 @@ class PlanningFlow(BaseFlow):
         # Fallback to primary agent
         return self.primary_agent
 
-    async def execute(self, input_text: str) -> str:
-        """Execute the planning flow with agents."""
+    async def execute(self, input_text: str, budget: Optional[RunBudget] = None) -> str:
+        """
+        Execute the planning flow with agents.
+
+        With a `budget`, the steps stop once it is used up, and every agent,
+        tool and LLM call of the flow waits at most until its deadline.
+        """
+        with run_budget(budget):
+            return await self._execute(input_text)
+
+    async def _execute(self, input_text: str) -> str:
         try:
             if not self.primary_agent:
                 raise ValueError("No primary agent available")
@@ -78,31 +106,126 @@ class PlanningFlow(BaseFlow):
                     )
                     return f"Failed to create plan for: {input_text}"
 
-            result = ""
-            while True:
-                # Get current step to execute
-                self.current_step_index, step_info = await self._get_current_step_info()
-
-                # Exit if no more steps or plan completed
-                if self.current_step_index is None:
-                    result += await self._finalize_plan()
-                    break
+            self._attach_agent_checkpoints()
+            await self._save_checkpoint("")
+            return await self._execute_plan("")
+        except Exception as e:
+            logger.error(f"Error in PlanningFlow: {str(e)}")
+            return f"Execution failed: {str(e)}"
 
-                # Execute current step with appropriate agent
-                step_type = step_info.get("type") if step_info else None
-                executor = self.get_executor(step_type)
-                step_result = await self._execute_step(executor, step_info)
-                result += step_result + "\n"
+    async def resume(self, budget: Optional[RunBudget] = None) -> str:
+        """
+        Continue an execution from the checkpoints in `checkpoint_dir`.
 
-                # Check if agent wants to terminate
-                if hasattr(executor, "state") and executor.state == AgentState.FINISHED:
-                    break
+        Completed plan steps are not run again, and the agent that was working
+        on the interrupted step continues after its last completed step. The
+        `budget` limits the rest of the execution like in `execute`.
+        """
+        with run_budget(budget):
+            return await self._resume()
 
-            return result
+    async def _resume(self) -> str:
+        try:
+            if not self.checkpoint_dir:
+                raise ValueError("No checkpoint_dir to resume from")
+            checkpoint = FlowCheckpoint.model_validate_json(
+                self._checkpoint_file("flow").read_text(encoding="utf-8")
+            )
+            if checkpoint.finished:
+                return checkpoint.result
+
+            self.active_plan_id = checkpoint.active_plan_id
+            await self.planning_tool.restore_state(checkpoint.planning)
+            for key, agent in self.agents.items():
+                path = self._checkpoint_file(key)
+                if path.exists():
+                    await agent.restore(Checkpoint.load(path))
+
+            # Only the agent interrupted mid-step picks up where it was
+            interrupted = self.agents.get(checkpoint.executor_key)
+            if interrupted and interrupted.current_step <= checkpoint.executor_step:
+                interrupted = None
+            for agent in self.agents.values():
+                if agent is not interrupted:
+                    agent.state = AgentState.IDLE
+
+            self._attach_agent_checkpoints()
+            logger.info(f"Resuming plan {self.active_plan_id} from {self.checkpoint_dir}")
+            return await self._execute_plan(checkpoint.result, interrupted)
         except Exception as e:
             logger.error(f"Error in PlanningFlow: {str(e)}")
             return f"Execution failed: {str(e)}"
 
+    async def _execute_plan(
+        self, result: str, interrupted: Optional[BaseAgent] = None
+    ) -> str:
+        """Execute the remaining steps of the active plan."""
+        budget = current_budget()
+        while True:
+            # Leave the remaining steps for a resume with a new budget
+            reason = budget.exceeded() if budget else None
+            if reason:
+                logger.warning(f"Stopping the plan: run budget exhausted ({reason})")
+                result += f"Stopped: run budget exhausted ({reason})\n"
+                break
+
+            # Get current step to execute
+            self.current_step_index, step_info = await self._get_current_step_info()
+
+            # Exit if no more steps or plan completed
+            if self.current_step_index is None:
+                result += await self._finalize_plan()
+                await self._save_checkpoint(result, finished=True)
+                break
+
+            # Execute current step with appropriate agent
+            step_type = step_info.get("type") if step_info else None
+            executor = self.get_executor(step_type)
+            resume = executor is interrupted
+            if not resume:
+                await self._save_checkpoint(result, executor=executor)
+            step_result = await self._execute_step(executor, step_info, resume)
+            interrupted = None
+            result += step_result + "\n"
+            await self._save_checkpoint(result)
+
+            # Check if agent wants to terminate
+            if hasattr(executor, "state") and executor.state == AgentState.FINISHED:
+                break
+
+        return result
+
+    def _checkpoint_file(self, name: str) -> Path:
+        return Path(self.checkpoint_dir) / f"{name}.json"
+
+    def _attach_agent_checkpoints(self) -> None:
+        """Have every agent checkpoint itself after each of its steps."""
+        if self.checkpoint_dir:
+            for key, agent in self.agents.items():
+                agent.checkpoint_path = str(self._checkpoint_file(key))
+
+    async def _save_checkpoint(
+        self, result: str, executor: Optional[BaseAgent] = None, finished: bool = False
+    ) -> None:
+        """Save the flow's progress; a failed write is logged, not raised."""
+        if not self.checkpoint_dir:
+            return
+        executor_key = next(
+            (key for key, agent in self.agents.items() if agent is executor), None
+        )
+        checkpoint = FlowCheckpoint(
+            active_plan_id=self.active_plan_id,
+            planning=await self.planning_tool.save_state() or {},
+            result=result,
+            finished=finished,
+            executor_key=executor_key,
+            executor_step=executor.current_step if executor else 0,
+        )
+        try:
+            write_atomic(self._checkpoint_file("flow"), checkpoint.model_dump_json())
+        except Exception as e:
+            logger.warning(f"Could not save flow checkpoint to {self.checkpoint_dir}: {e}")
+
     async def _create_initial_plan(self, request: str) -> None:
         """Create an initial plan based on the request using the flow's LLM and PlanningTool."""
         logger.info(f"Creating initial plan with ID: {self.active_plan_id}")
@@ -226,8 +349,14 @@ class PlanningFlow(BaseFlow):
             logger.warning(f"Error finding current step index: {e}")
             return None, None
 
-    async def _execute_step(self, executor: BaseAgent, step_info: dict) -> str:
-        """Execute the current step with the specified agent using agent.run()."""
+    async def _execute_step(
+        self, executor: BaseAgent, step_info: dict, resume: bool = False
+    ) -> str:
+        """Execute the current step with the specified agent using agent.run().
+
+        With `resume`, the executor was restored from a checkpoint taken while
+        it worked on this step and continues from there.
+        """
         # Prepare context for the agent with current plan status
         plan_status = await self._get_plan_text()
         step_text = step_info.get("text", f"Step {self.current_step_index}")
@@ -245,10 +374,21 @@ class PlanningFlow(BaseFlow):
 
         # Use agent.run() to execute the step
         try:
-            step_result = await executor.run(step_prompt)
-
-            # Mark the step as completed after successful execution
-            await self._mark_step_completed()
+            if not resume:
+                step_result = await executor.run(step_prompt)
+            elif executor.state == AgentState.FINISHED:
+                # The step ended just before the interruption
+                executor.state = AgentState.IDLE
+                step_result = f"Step {self.current_step_index} was completed before resuming"
+            else:
+                executor.state = AgentState.IDLE
+                step_result = await executor.run()
+
+            # Mark the step as completed after successful execution, unless
+            # the agent was stopped by the run budget before it was done
+            budget = current_budget()
+            if not (budget and budget.exceeded()):
+                await self._mark_step_completed()
 
             return step_result
         except Exception as e:
@@ -369,7 +509,7 @@ class PlanningFlow(BaseFlow):
                 f"The plan has been completed. Here is the final plan status:\n\n{plan_text}\n\nPlease provide a summary of what was accomplished and any final thoughts."
             )
 
-            response = await self.llm.ask(
+            response = await route(PLANNING_FLOW_FINALIZE, self.llm).ask(
                 messages=[user_message], system_msgs=[system_message]
             )
 
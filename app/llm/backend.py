@@ -0,0 +1,233 @@
+import asyncio
+import json
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import litellm
+from litellm.types.utils import ModelResponseStream
+
+from app.config import PROJECT_ROOT, LLMBackendSettings, config
+from app.exceptions import CassetteMiss
+from app.llm.cache import ResponseCache
+from app.logger import logger
+
+
+DEFAULT_CASSETTE_PATH = PROJECT_ROOT / ".cache" / "llm" / "cassette.jsonl"
+
+# Request arguments that do not change the response
+_IGNORED_PARAMS = {
+    "api_key",
+    "base_url",
+    "api_version",
+    "custom_llm_provider",
+    "client",
+    "timeout",
+    "stream_options",
+}
+
+
+def request_key(kwargs: Dict[str, Any]) -> str:
+    """Identify a completion request by the arguments that determine its response."""
+    return ResponseCache.make_key(
+        **{name: value for name, value in kwargs.items() if name not in _IGNORED_PARAMS}
+    )
+
+
+class CassetteBackend:
+    """
+    Base class for backends that sit between the LLM class and the provider.
+
+    `send` is the live litellm function for the request, which a backend may
+    call, wrap or skip entirely.
+    """
+
+    #: Whether requests reach the provider, and so need HTTP clients
+    sends_requests: bool = True
+
+    def __init__(self, path: Path):
+        self.path = path
+
+    async def acompletion(self, send: Callable[..., Awaitable[Any]], **kwargs) -> Any:
+        raise NotImplementedError
+
+    def completion(self, send: Callable[..., Any], **kwargs) -> Any:
+        raise NotImplementedError
+
+
+class RecordBackend(CassetteBackend):
+    """Call the provider and append every request and response to the cassette."""
+
+    def __init__(self, path: Path):
+        super().__init__(path)
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+    def _write(self, entry: Dict[str, Any]) -> None:
+        line = json.dumps(entry, default=str, ensure_ascii=False)
+        with self._lock, self.path.open("a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+    def _entry(self, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "key": request_key(kwargs),
+            "model": kwargs.get("model"),
+            "stream": bool(kwargs.get("stream")),
+        }
+
+    async def acompletion(self, send: Callable[..., Awaitable[Any]], **kwargs) -> Any:
+        entry = self._entry(kwargs)
+        started = time.perf_counter()
+        response = await send(**kwargs)
+        if not entry["stream"]:
+            entry["elapsed"] = time.perf_counter() - started
+            entry["response"] = response.model_dump()
+            self._write(entry)
+            return response
+        return self._record_astream(response, entry, started)
+
+    async def _record_astream(self, stream, entry: Dict[str, Any], started: float):
+        chunks = []
+        async for chunk in stream:
+            chunks.append(
+                {"at": time.perf_counter() - started, "chunk": chunk.model_dump()}
+            )
+            yield chunk
+        # Only complete streams are recorded
+        entry["chunks"] = chunks
+        self._write(entry)
+
+    def completion(self, send: Callable[..., Any], **kwargs) -> Any:
+        entry = self._entry(kwargs)
+        started = time.perf_counter()
+        response = send(**kwargs)
+        if not entry["stream"]:
+            entry["elapsed"] = time.perf_counter() - started
+            entry["response"] = response.model_dump()
+            self._write(entry)
+            return response
+        return self._record_stream(response, entry, started)
+
+    def _record_stream(self, stream, entry: Dict[str, Any], started: float):
+        chunks = []
+        for chunk in stream:
+            chunks.append(
+                {"at": time.perf_counter() - started, "chunk": chunk.model_dump()}
+            )
+            yield chunk
+        entry["chunks"] = chunks
+        self._write(entry)
+
+
+class ReplayBackend(CassetteBackend):
+    """
+    Serve responses from the cassette without touching the network.
+
+    Identical requests are answered in recorded order; once a request has been
+    replayed as often as it was recorded, its last response is repeated.
+    """
+
+    sends_requests = False
+
+    def __init__(
+        self, path: Path, simulate_latency: bool = False, latency_scale: float = 1.0
+    ):
+        super().__init__(path)
+        self.simulate_latency = simulate_latency
+        self.latency_scale = latency_scale
+        self._entries: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        self._served: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self) -> None:
+        if not self.path.exists():
+            logger.warning(f"LLM cassette {self.path} does not exist, replay will miss")
+            return
+        with self.path.open(encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    self._entries[entry["key"]].append(entry)
+
+    def _next_entry(self, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        key = request_key(kwargs)
+        with self._lock:
+            entries = self._entries.get(key)
+            if not entries:
+                raise CassetteMiss(
+                    f"No recorded response for this {kwargs.get('model')} request "
+                    f"in {self.path}; record it with [llm_backend] mode = \"record\""
+                )
+            index = min(self._served[key], len(entries) - 1)
+            self._served[key] += 1
+            entry = entries[index]
+        if entry["stream"] != bool(kwargs.get("stream")):
+            raise CassetteMiss(
+                f"Recorded response is {'' if entry['stream'] else 'not '}streamed, "
+                f"the request is {'' if kwargs.get('stream') else 'not '}streamed"
+            )
+        return entry
+
+    def _delay(self, seconds: float) -> float:
+        return max(0.0, seconds * self.latency_scale) if self.simulate_latency else 0.0
+
+    async def acompletion(self, send: Callable[..., Awaitable[Any]], **kwargs) -> Any:
+        entry = self._next_entry(kwargs)
+        if not entry["stream"]:
+            await asyncio.sleep(self._delay(entry["elapsed"]))
+            return litellm.ModelResponse(**entry["response"])
+        return self._replay_astream(entry["chunks"])
+
+    async def _replay_astream(self, chunks: List[Dict[str, Any]]):
+        previous = 0.0
+        for recorded in chunks:
+            await asyncio.sleep(self._delay(recorded["at"] - previous))
+            previous = recorded["at"]
+            yield ModelResponseStream(**recorded["chunk"])
+
+    def completion(self, send: Callable[..., Any], **kwargs) -> Any:
+        entry = self._next_entry(kwargs)
+        if not entry["stream"]:
+            time.sleep(self._delay(entry["elapsed"]))
+            return litellm.ModelResponse(**entry["response"])
+        return self._replay_stream(entry["chunks"])
+
+    def _replay_stream(self, chunks: List[Dict[str, Any]]):
+        previous = 0.0
+        for recorded in chunks:
+            time.sleep(self._delay(recorded["at"] - previous))
+            previous = recorded["at"]
+            yield ModelResponseStream(**recorded["chunk"])
+
+
+_shared: Dict[Any, Optional[CassetteBackend]] = {}
+_shared_lock = threading.Lock()
+
+
+def get_backend(
+    settings: Optional[LLMBackendSettings] = None,
+) -> Optional[CassetteBackend]:
+    """
+    Return the process-wide backend for the configured mode.
+
+    Returns None in live mode, where requests go straight to litellm.
+    """
+    settings = settings or config.llm_backend
+    if not settings or settings.mode == "live":
+        return None
+
+    path = Path(settings.cassette_path or DEFAULT_CASSETTE_PATH)
+    key = (settings.mode, path, settings.simulate_latency, settings.latency_scale)
+    with _shared_lock:
+        if key not in _shared:
+            if settings.mode == "record":
+                _shared[key] = RecordBackend(path)
+            else:
+                _shared[key] = ReplayBackend(
+                    path, settings.simulate_latency, settings.latency_scale
+                )
+            logger.info(f"LLM backend: {settings.mode} ({path})")
+        return _shared[key]
@@ -0,0 +1,230 @@
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from app.config import PROJECT_ROOT, LLMCacheSettings, config
+from app.logger import logger
+
+
+DEFAULT_CACHE_PATH = PROJECT_ROOT / ".cache" / "llm" / "responses.sqlite"
+
+
+class ResponseCache:
+    """
+    Two-tier cache for LLM responses.
+
+    The first tier is an in-process LRU map, the second an SQLite file that
+    survives restarts. Both tiers honour the configured TTL; the disk tier is
+    additionally bounded by entry count and total payload size. Payloads must
+    be JSON serializable.
+    """
+
+    _shared: Optional["ResponseCache"] = None
+    _shared_lock = threading.Lock()
+
+    # Prune the disk tier every N writes instead of on every write
+    PRUNE_INTERVAL = 32
+
+    def __init__(self, settings: Optional[LLMCacheSettings] = None):
+        self.settings = settings or LLMCacheSettings(enabled=True)
+        self._memory: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._memory_lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self._writes_since_prune = 0
+
+        if self.settings.disk_enabled:
+            self._open_db(Path(self.settings.disk_path or DEFAULT_CACHE_PATH))
+
+    @classmethod
+    def shared(cls) -> "ResponseCache":
+        """Return the process-wide cache built from the application config."""
+        if cls._shared is None:
+            with cls._shared_lock:
+                if cls._shared is None:
+                    cls._shared = cls(config.llm_cache)
+        return cls._shared
+
+    @staticmethod
+    def make_key(**parts: Any) -> str:
+        """Build a stable hash from the parts that determine a response."""
+        payload = json.dumps(parts, sort_keys=True, default=str, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _open_db(self, path: Path) -> None:
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(path), check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+                "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS responses_accessed_at "
+                "ON responses (accessed_at)"
+            )
+            self._db.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"LLM cache disk tier disabled, cannot open {path}: {e}")
+            self._db = None
+
+    def _is_expired(self, created_at: float, now: float) -> bool:
+        return self.settings.ttl > 0 and now - created_at > self.settings.ttl
+
+    def _memory_get(self, key: str, now: float) -> Optional[Any]:
+        with self._memory_lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            created_at, value = entry
+            if self._is_expired(created_at, now):
+                del self._memory[key]
+                return None
+            self._memory.move_to_end(key)
+            return value
+
+    def _memory_set(self, key: str, value: Any, created_at: float) -> None:
+        with self._memory_lock:
+            self._memory[key] = (created_at, value)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.settings.memory_max_entries:
+                self._memory.popitem(last=False)
+
+    def _disk_get(self, key: str, now: float) -> Optional[Tuple[float, Any]]:
+        if self._db is None:
+            return None
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT value, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, created_at = row
+            if self._is_expired(created_at, now):
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._db.commit()
+                return None
+            self._db.execute(
+                "UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+            self._db.commit()
+        return created_at, json.loads(value)
+
+    def _disk_set(self, key: str, value: Any, now: float) -> None:
+        if self._db is None:
+            return
+        data = json.dumps(value, ensure_ascii=False, default=str)
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses "
+                "(key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, data, len(data), now, now),
+            )
+            self._writes_since_prune += 1
+            if self._writes_since_prune >= self.PRUNE_INTERVAL:
+                self._prune_locked(now)
+            self._db.commit()
+
+    def _prune_locked(self, now: float) -> None:
+        """Drop expired rows, then least recently used rows over the size limits."""
+        self._writes_since_prune = 0
+        if self.settings.ttl > 0:
+            self._db.execute(
+                "DELETE FROM responses WHERE created_at < ?", (now - self.settings.ttl,)
+            )
+
+        count, total_size = self._db.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()
+        if (
+            count <= self.settings.disk_max_entries
+            and total_size <= self.settings.disk_max_bytes
+        ):
+            return
+
+        evict_keys = []
+        for key, size in self._db.execute(
+            "SELECT key, size FROM responses ORDER BY accessed_at ASC"
+        ):
+            if (
+                count <= self.settings.disk_max_entries
+                and total_size <= self.settings.disk_max_bytes
+            ):
+                break
+            evict_keys.append((key,))
+            count -= 1
+            total_size -= size
+        self._db.executemany("DELETE FROM responses WHERE key = ?", evict_keys)
+
+    def get_sync(self, key: str) -> Optional[Any]:
+        """Look a key up in both tiers, promoting disk hits to memory."""
+        now = time.time()
+        value = self._memory_get(key, now)
+        if value is not None:
+            return value
+
+        entry = self._disk_get(key, now)
+        if entry is None:
+            return None
+        created_at, value = entry
+        self._memory_set(key, value, created_at)
+        return value
+
+    def set_sync(self, key: str, value: Any) -> None:
+        """Store a value in both tiers."""
+        now = time.time()
+        self._memory_set(key, value, now)
+        try:
+            self._disk_set(key, value, now)
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to persist LLM cache entry: {e}")
+
+    async def get(self, key: str) -> Optional[Any]:
+        """Async lookup; the disk tier is queried off the event loop."""
+        value = self._memory_get(key, time.time())
+        if value is not None or self._db is None:
+            return value
+        return await asyncio.to_thread(self.get_sync, key)
+
+    async def set(self, key: str, value: Any) -> None:
+        """Async store; the disk tier is written off the event loop."""
+        if self._db is None:
+            self._memory_set(key, value, time.time())
+            return
+        await asyncio.to_thread(self.set_sync, key, value)
+
+    def clear(self) -> None:
+        """Remove every entry from both tiers."""
+        with self._memory_lock:
+            self._memory.clear()
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+
+    def stats(self) -> Dict[str, int]:
+        """Return the number of entries held by each tier."""
+        with self._memory_lock:
+            memory_entries = len(self._memory)
+        disk_entries = 0
+        if self._db is not None:
+            with self._db_lock:
+                disk_entries = self._db.execute(
+                    "SELECT COUNT(*) FROM responses"
+                ).fetchone()[0]
+        return {"memory_entries": memory_entries, "disk_entries": disk_entries}
+
+    def close(self) -> None:
+        """Close the disk tier."""
+        if self._db is not None:
+            with self._db_lock:
+                self._db.close()
+                self._db = None
@@ -1,5 +1,86 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
+import math
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Deque, Dict, Iterator, Optional
+
+
+# Who is making LLM calls: the running agent, or the tool it is executing
+_call_site: ContextVar[Optional[str]] = ContextVar("llm_call_site", default=None)
+
+
+def current_call_site() -> Optional[str]:
+    """Return the call site LLM calls are currently attributed to."""
+    return _call_site.get()
+
+
+@contextmanager
+def call_site(name: str) -> Iterator[None]:
+    """Attribute the LLM calls made inside the block to `name`."""
+    token = _call_site.set(name)
+    try:
+        yield
+    finally:
+        _call_site.reset(token)
+
+
+class RollingWindow:
+    """The most recent `size` samples of a metric, with percentile summaries."""
+
+    def __init__(self, size: int) -> None:
+        self._samples: Deque[float] = deque(maxlen=size)
+
+    def add(self, value: float) -> None:
+        self._samples.append(value)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Nearest-rank percentile, `q` in [0, 100]."""
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        rank = min(max(1, math.ceil(len(ordered) * q / 100)), len(ordered))
+        return ordered[rank - 1]
+
+    def summary(self) -> Dict[str, Optional[float]]:
+        return {
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+        }
+
+
+class CallStats:
+    """Rolling per-call telemetry for one model or one call site."""
+
+    METRICS = (
+        "ttft",
+        "latency",
+        "prompt_tokens",
+        "completion_tokens",
+        "tokens_per_second",
+        "retries",
+    )
+
+    def __init__(self, window_size: int) -> None:
+        self.calls: int = 0
+        self.windows = {name: RollingWindow(window_size) for name in self.METRICS}
+
+    def add(self, **samples: Optional[float]) -> None:
+        self.calls += 1
+        for name, value in samples.items():
+            if value is not None:
+                self.windows[name].add(value)
+
+    def summary(self) -> dict:
+        return {
+            "calls": self.calls,
+            **{name: window.summary() for name, window in self.windows.items()},
+        }
 
 
 class Cost:
@@ -7,11 +88,29 @@ class Cost:
     Cost class can record various costs during running and evaluation.
     Currently we define the following costs:
         accumulated_cost: the total cost (USD $) of the current LLM.
+        costs: the costs of the most recent calls, at most `window_size` of them.
+        cache_hits / cache_misses: response cache lookups of the current LLM.
+        cache_saved_cost: the cost (USD $) avoided by serving cached responses.
+        coalesced_requests: requests that joined an identical in-flight request.
+        hedged_requests / hedge_wins: slow requests duplicated to another
+            endpoint, and how often that duplicate answered first.
+        calls_by_model / calls_by_call_site: p50/p95/p99 of TTFT, latency (s),
+            prompt and completion tokens, tokens/sec and retries over the most
+            recent `window_size` calls.
     """
 
-    def __init__(self) -> None:
+    def __init__(self, window_size: int = 1000) -> None:
+        self.window_size = window_size
         self._accumulated_cost: float = 0.0
-        self._costs: list[float] = []
+        self._costs: Deque[float] = deque(maxlen=window_size)
+        self._cache_hits: int = 0
+        self._cache_misses: int = 0
+        self._cache_saved_cost: float = 0.0
+        self._coalesced_requests: int = 0
+        self._hedged_requests: int = 0
+        self._hedge_wins: int = 0
+        self._calls_by_model: Dict[str, CallStats] = {}
+        self._calls_by_call_site: Dict[str, CallStats] = {}
 
     @property
     def accumulated_cost(self) -> float:
@@ -25,7 +124,7 @@ class Cost:
 
     @property
     def costs(self) -> list:
-        return self._costs
+        return list(self._costs)
 
     def add_cost(self, value: float) -> None:
         if value < 0:
@@ -33,11 +132,132 @@ class Cost:
         self._accumulated_cost += value
         self._costs.append(value)
 
+    @property
+    def cache_hits(self) -> int:
+        return self._cache_hits
+
+    @property
+    def cache_misses(self) -> int:
+        return self._cache_misses
+
+    @property
+    def cache_saved_cost(self) -> float:
+        return self._cache_saved_cost
+
+    def add_cache_hit(self, saved_cost: float = 0.0) -> None:
+        if saved_cost < 0:
+            raise ValueError("Saved cost cannot be negative.")
+        self._cache_hits += 1
+        self._cache_saved_cost += saved_cost
+
+    def add_cache_miss(self) -> None:
+        self._cache_misses += 1
+
+    @property
+    def coalesced_requests(self) -> int:
+        return self._coalesced_requests
+
+    def add_coalesced_request(self) -> None:
+        self._coalesced_requests += 1
+
+    @property
+    def hedged_requests(self) -> int:
+        return self._hedged_requests
+
+    @property
+    def hedge_wins(self) -> int:
+        return self._hedge_wins
+
+    def add_hedged_request(self) -> None:
+        self._hedged_requests += 1
+
+    def add_hedge_win(self) -> None:
+        self._hedge_wins += 1
+
+    def add_call(
+        self,
+        model: str,
+        latency: float,
+        ttft: Optional[float] = None,
+        prompt_tokens: int = 0,
+        completion_tokens: int = 0,
+        retries: int = 0,
+        call_site: Optional[str] = None,
+    ) -> None:
+        """
+        Record the timing and usage of one provider call.
+
+        Args:
+            model: Model that served the call
+            latency: Seconds from sending the request to the last byte
+            ttft: Seconds to the first streamed token, None if not streamed
+            prompt_tokens: Prompt tokens reported by the provider
+            completion_tokens: Completion tokens reported by the provider
+            retries: Failed attempts before this one
+            call_site: Agent or tool the call is attributed to
+        """
+        if latency < 0:
+            raise ValueError("Latency cannot be negative.")
+        # Throughput is measured over the generation, after the first token
+        generation = latency - (ttft or 0.0)
+        samples = {
+            "ttft": ttft,
+            "latency": latency,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "tokens_per_second": completion_tokens / generation
+            if completion_tokens and generation > 0
+            else None,
+            "retries": retries,
+        }
+        self._stats(self._calls_by_model, model).add(**samples)
+        self._stats(self._calls_by_call_site, call_site or "unknown").add(**samples)
+
+    def _stats(self, table: Dict[str, CallStats], key: str) -> CallStats:
+        stats = table.get(key)
+        if stats is None:
+            stats = table[key] = CallStats(self.window_size)
+        return stats
+
+    def recent_percentile(
+        self, model: str, metric: str, q: float, min_samples: int = 1
+    ) -> Optional[float]:
+        """
+        Percentile `q` of a metric over the recent calls to a model.
+
+        Returns None until at least `min_samples` calls reported the metric.
+        """
+        stats = self._calls_by_model.get(model)
+        if stats is None or len(stats.windows[metric]) < min_samples:
+            return None
+        return stats.windows[metric].percentile(q)
+
+    @property
+    def calls_by_model(self) -> Dict[str, dict]:
+        return {key: stats.summary() for key, stats in self._calls_by_model.items()}
+
+    @property
+    def calls_by_call_site(self) -> Dict[str, dict]:
+        return {
+            key: stats.summary() for key, stats in self._calls_by_call_site.items()
+        }
+
     def get(self):
         """
         Return the costs in a dictionary.
         """
-        return {"accumulated_cost": self._accumulated_cost, "costs": self._costs}
+        return {
+            "accumulated_cost": self._accumulated_cost,
+            "costs": self.costs,
+            "cache_hits": self._cache_hits,
+            "cache_misses": self._cache_misses,
+            "cache_saved_cost": self._cache_saved_cost,
+            "coalesced_requests": self._coalesced_requests,
+            "hedged_requests": self._hedged_requests,
+            "hedge_wins": self._hedge_wins,
+            "calls_by_model": self.calls_by_model,
+            "calls_by_call_site": self.calls_by_call_site,
+        }
 
     def log(self):
         """
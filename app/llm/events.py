@@ -0,0 +1,64 @@
+import asyncio
+import sys
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+
+class TokenSink:
+    """Receives the text of streamed LLM responses as it arrives."""
+
+    async def on_token(self, text: str) -> None:
+        """Called with each chunk of response text."""
+        raise NotImplementedError
+
+    async def on_end(self) -> None:
+        """Called after the last chunk of a response."""
+
+
+class ConsoleTokenSink(TokenSink):
+    """Writes streamed text to stdout, for the command line entry points."""
+
+    async def on_token(self, text: str) -> None:
+        sys.stdout.write(text)
+        sys.stdout.flush()
+
+    async def on_end(self) -> None:
+        sys.stdout.write("\n")
+        sys.stdout.flush()
+
+
+class QueueTokenSink(TokenSink):
+    """Puts streamed text on a queue, followed by `END` after each response."""
+
+    END = None
+
+    def __init__(self, queue: Optional[asyncio.Queue] = None):
+        self.queue = queue if queue is not None else asyncio.Queue()
+
+    async def on_token(self, text: str) -> None:
+        self.queue.put_nowait(text)
+
+    async def on_end(self) -> None:
+        self.queue.put_nowait(self.END)
+
+
+# Where streamed LLM text goes; nowhere unless an entry point subscribes
+_token_sink: ContextVar[Optional[TokenSink]] = ContextVar(
+    "llm_token_sink", default=None
+)
+
+
+def current_token_sink() -> Optional[TokenSink]:
+    """Return the sink streamed LLM text is currently delivered to."""
+    return _token_sink.get()
+
+
+@contextmanager
+def token_sink(sink: Optional[TokenSink]) -> Iterator[None]:
+    """Deliver the text streamed by LLM calls made inside the block to `sink`."""
+    token = _token_sink.set(sink)
+    try:
+        yield
+    finally:
+        _token_sink.reset(token)
@@ -0,0 +1,106 @@
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional, Tuple
+
+
+# Calls to time before hedging at a percentile instead of the initial delay
+HEDGE_MIN_SAMPLES = 20
+
+Send = Callable[[], Awaitable[Any]]
+
+
+async def _with_first_chunk(first: Any, stream: AsyncIterator) -> AsyncIterator:
+    """Replay an already received first chunk, then the rest of the stream"""
+    try:
+        if first is not None:
+            yield first
+        async for chunk in stream:
+            yield chunk
+    finally:
+        await stream.aclose()
+
+
+async def first_byte(send: Send, stream: bool) -> Any:
+    """
+    Send a request and wait for its first byte.
+
+    A non-streaming response arrives whole; a stream is read up to its first
+    chunk and returned as a stream that still yields that chunk.
+    """
+    response = await send()
+    if not stream:
+        return response
+    chunks = response.__aiter__()
+    try:
+        first = await chunks.__anext__()
+    except StopAsyncIteration:
+        first = None
+    except BaseException:
+        await chunks.aclose()
+        raise
+    return _with_first_chunk(first, chunks)
+
+
+async def _discard(task: "asyncio.Task") -> None:
+    """Cancel a losing request, closing its stream if it already returned one"""
+    task.cancel()
+    await asyncio.wait({task})
+    if task.cancelled() or task.exception() is not None:
+        return
+    aclose = getattr(task.result(), "aclose", None)
+    if aclose is not None:
+        await aclose()
+
+
+async def hedge(
+    primary: Send,
+    backup: Send,
+    delay: float,
+    stream: bool = False,
+    on_hedge: Optional[Callable[[], None]] = None,
+) -> Tuple[Any, bool]:
+    """
+    Send a request, and a duplicate of it if the first byte is slow to come.
+
+    If `primary` has not answered within `delay` seconds, `backup` is sent too
+    and whichever answers first is used; the other request is cancelled. A
+    failed request only loses if the other one succeeds.
+
+    Args:
+        primary: Sends the request
+        backup: Sends the duplicate request, typically to another endpoint
+        delay: Seconds to wait for the primary before sending the duplicate
+        stream: Whether the requests return streams; they race to their first chunk
+        on_hedge: Called when the duplicate is sent
+
+    Returns:
+        Tuple[Any, bool]: (response, whether the duplicate answered first)
+    """
+    tasks = [asyncio.ensure_future(first_byte(primary, stream))]
+    winner = None
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if not done:
+            if on_hedge is not None:
+                on_hedge()
+            tasks.append(asyncio.ensure_future(first_byte(backup, stream)))
+
+        pending = {task for task in tasks if not task.done()}
+        while True:
+            winner = next(
+                (task for task in tasks if task.done() and task.exception() is None),
+                None,
+            )
+            if winner is not None or not pending:
+                break
+            _, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+
+        if winner is None:
+            # Every request failed; report the primary's error
+            return tasks[0].result(), False
+        return winner.result(), winner is not tasks[0]
+    finally:
+        for task in tasks:
+            if task is not winner:
+                await _discard(task)
@@ -0,0 +1,167 @@
+import base64
+import io
+import math
+from typing import List, Optional, Tuple
+
+from PIL import Image
+
+from app.llm.tokens import TokenCounter, get_token_counter
+
+
+# Width of the grayscale thumbnail screenshots are compared by
+FINGERPRINT_WIDTH = 128
+# Grey levels a thumbnail pixel may drift by through JPEG recompression
+FINGERPRINT_TOLERANCE = 8
+
+Fingerprint = Tuple[Tuple[int, int], bytes]
+
+
+def fit_tile_budget(
+    width: int,
+    height: int,
+    max_tiles: int,
+    counter: Optional[TokenCounter] = None,
+    crop: bool = False,
+) -> Tuple[int, int]:
+    """
+    Return the largest size of an image billed for at most `max_tiles`.
+
+    The image is downscaled as a whole, keeping its aspect ratio, so nothing
+    on it is lost. With `crop`, only its long side is shortened instead: the
+    result is a top-left crop at full resolution.
+    """
+    counter = counter or get_token_counter()
+    if counter.high_detail_tiles(width, height) <= max_tiles:
+        return width, height
+
+    portrait = height > width
+    long_side, short_side = (height, width) if portrait else (width, height)
+
+    def size(long: int) -> Tuple[int, int]:
+        short = short_side if crop else max(1, round(short_side * long / long_side))
+        return (short, long) if portrait else (long, short)
+
+    # Tiles only grow with the long side, so search for the largest that fits
+    low, high = (short_side if crop else 1), long_side
+    while low < high:
+        middle = (low + high + 1) // 2
+        if counter.high_detail_tiles(*size(middle)) <= max_tiles:
+            low = middle
+        else:
+            high = middle - 1
+    return size(low)
+
+
+def provider_size(
+    width: int, height: int, counter: Optional[TokenCounter] = None
+) -> Tuple[int, int]:
+    """Size a high detail image is downscaled to by the provider anyway"""
+    counter = counter or get_token_counter()
+    scale = min(
+        1.0,
+        counter.MAX_SIZE / max(width, height),
+        counter.HIGH_DETAIL_TARGET_SHORT_SIDE / min(width, height),
+    )
+    return max(1, int(width * scale)), max(1, int(height * scale))
+
+
+def prepare_screenshot(
+    data: bytes, max_tiles: int, quality: int, crop: bool = False
+) -> str:
+    """
+    Downscale and recompress a screenshot for the LLM.
+
+    Args:
+        data: Encoded image bytes
+        max_tiles: High detail tiles the image may be billed for
+        quality: JPEG quality of the result
+        crop: Cut an image over the tile budget to its top-left part instead
+            of downscaling all of it
+
+    Returns:
+        str: Base64 encoded JPEG
+    """
+    with Image.open(io.BytesIO(data)) as image:
+        image = image.convert("RGB")
+        width, height = fit_tile_budget(image.width, image.height, max_tiles, crop=crop)
+        if crop and (width, height) != image.size:
+            image = image.crop((0, 0, width, height))
+        # Resampled once, straight to the size the provider would use
+        size = provider_size(width, height)
+        if size != image.size:
+            image = image.resize(size, Image.LANCZOS)
+
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=quality, optimize=True)
+    return base64.b64encode(buffer.getvalue()).decode("utf-8")
+
+
+def image_fingerprint(base64_image: str) -> Fingerprint:
+    """Small grayscale thumbnail of an image, used to spot unchanged screenshots"""
+    data = base64.b64decode(base64_image)
+    with Image.open(io.BytesIO(data)) as image:
+        height = max(1, round(image.height * FINGERPRINT_WIDTH / image.width))
+        thumbnail = image.convert("L").resize(
+            (FINGERPRINT_WIDTH, height), Image.BILINEAR
+        )
+        return thumbnail.size, thumbnail.tobytes()
+
+
+def fingerprint_distance(first: Fingerprint, second: Fingerprint) -> int:
+    """Number of thumbnail pixels that differ by more than recompression noise"""
+    if first[0] != second[0]:
+        return len(first[1])
+    return sum(
+        abs(a - b) > FINGERPRINT_TOLERANCE for a, b in zip(first[1], second[1])
+    )
+
+
+def attach_images(
+    messages: List[dict], supports_images: bool, max_images: Optional[int]
+) -> List[dict]:
+    """
+    Turn `base64_image` fields of formatted messages into image content.
+
+    Only the most recent `max_images` images are attached; older ones, and all
+    of them for models without vision, are dropped. Tool messages cannot carry
+    images, so their images follow the tool results in a user message.
+    """
+    with_images = [i for i, msg in enumerate(messages) if msg.get("base64_image")]
+    if not with_images:
+        return messages
+    if not supports_images:
+        keep = set()
+    elif max_images is None:
+        keep = set(with_images)
+    else:
+        keep = set(with_images[-max_images:]) if max_images > 0 else set()
+
+    result: List[dict] = []
+    pending_tool_images: List[dict] = []
+    for index, message in enumerate(messages):
+        if pending_tool_images and message.get("role") != "tool":
+            result.append({"role": "user", "content": pending_tool_images})
+            pending_tool_images = []
+
+        base64_image = message.get("base64_image")
+        if base64_image is None:
+            result.append(message)
+            continue
+
+        message = {k: v for k, v in message.items() if k != "base64_image"}
+        if index in keep:
+            image_part = {
+                "type": "image_url",
+                "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"},
+            }
+            if message.get("role") == "tool":
+                pending_tool_images.append(image_part)
+            else:
+                content = message.get("content")
+                parts = [{"type": "text", "text": content}] if content else []
+                message["content"] = parts + [image_part]
+        result.append(message)
+
+    if pending_tool_images:
+        result.append({"role": "user", "content": pending_tool_images})
+    return result
@@ -1,6 +1,23 @@
+import asyncio
 import base64
 import os
-from typing import Any, Dict, List, Literal, Optional, Tuple, Union
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Literal,
+    Mapping,
+    Optional,
+    Tuple,
+    Union,
+)
 
 import litellm
 from litellm import completion, completion_cost
@@ -12,14 +29,65 @@ from litellm.exceptions import (
 from tenacity import (
     retry,
     retry_if_exception_type,
+    retry_if_not_exception_type,
     stop_after_attempt,
     wait_random_exponential,
 )
 
+from app.budget import budget_timeout, current_budget
 from app.config import LLMSettings, config
-from app.llm.cost import Cost
+from app.exceptions import (
+    BudgetExceeded,
+    CassetteMiss,
+    TokenLimitExceeded,
+    ToolCallStreamInterrupted,
+)
+from app.llm.backend import get_backend
+from app.llm.cache import ResponseCache
+from app.llm.cost import Cost, current_call_site
+from app.llm.events import (
+    QueueTokenSink,
+    TokenSink,
+    current_token_sink,
+    token_sink,
+)
+from app.llm.hedging import HEDGE_MIN_SAMPLES, hedge
+from app.llm.images import attach_images
+from app.llm.rate_limit import RateLimiter
+from app.llm.singleflight import Publish, SingleFlight
+from app.llm.streaming import ToolCallAssembler
+from app.llm.tokens import TokenCounter, get_token_counter
+from app.llm.transport import SDK_PROVIDERS, get_sdk_client
 from app.logger import logger
-from app.schema import Message
+from app.schema import Function, Message, ToolCall, ToolParams
+from app.tracing import begin_span, current_tracer, payload_size
+
+
+# Failed attempts before the current one, set by the retry policies
+_retries: ContextVar[int] = ContextVar("llm_retries", default=0)
+
+
+def _note_attempt(retry_state) -> None:
+    _retries.set(retry_state.attempt_number - 1)
+
+
+# Whether calls in progress give up after their first attempt
+_single_attempt: ContextVar[bool] = ContextVar("llm_single_attempt", default=False)
+
+
+def _single_attempt_requested(retry_state) -> bool:
+    """Stop condition of the retry policies inside a single_attempt() block"""
+    return _single_attempt.get()
+
+
+@contextmanager
+def single_attempt() -> Iterator[None]:
+    """Make LLM calls inside the block fail on their first error instead of retrying."""
+    token = _single_attempt.set(True)
+    try:
+        yield
+    finally:
+        _single_attempt.reset(token)
 
 
 class LLM:
@@ -59,6 +127,11 @@ class LLM:
             self.retry_max_wait = getattr(llm_config, "retry_max_wait", 10)
             self.custom_llm_provider = getattr(llm_config, "custom_llm_provider", None)
 
+            # Token accounting against max_input_tokens (across all requests)
+            self.max_input_tokens = getattr(llm_config, "max_input_tokens", None)
+            self.total_input_tokens = 0
+            self.total_completion_tokens = 0
+
             # Get model info if available
             self.model_info = None
             try:
@@ -66,6 +139,14 @@ class LLM:
             except Exception as e:
                 logger.warning(f"Could not get model info for {self.model}: {e}")
 
+            # Screenshots are only sent to vision models, and only the latest ones
+            self.supports_images = getattr(llm_config, "supports_images", None)
+            if self.supports_images is None:
+                self.supports_images = bool(
+                    (self.model_info or {}).get("supports_vision")
+                )
+            self.max_images = getattr(llm_config, "max_images", 2)
+
             # Configure litellm
             if self.api_type == "azure":
                 litellm.api_base = self.base_url
@@ -76,15 +157,304 @@ class LLM:
                 if self.base_url:
                     litellm.api_base = self.base_url
 
+            # Provider litellm routes this model to, used to pick an HTTP client
+            self.provider = self._resolve_provider()
+
+            # Requests and tokens per minute, shared by every user of the model
+            self.rate_limiter = RateLimiter.for_model(
+                self.model,
+                rpm=getattr(llm_config, "rpm_limit", None),
+                tpm=getattr(llm_config, "tpm_limit", None),
+            )
+
+            # Slow tool requests are duplicated to an equivalent endpoint
+            self.hedge_with = getattr(llm_config, "hedge_with", None)
+            if self.hedge_with == config_name:
+                self.hedge_with = None
+            self.hedge_percentile = getattr(llm_config, "hedge_percentile", 95.0)
+            self.hedge_min_delay = getattr(llm_config, "hedge_min_delay", 1.0)
+            self.hedge_initial_delay = getattr(llm_config, "hedge_initial_delay", 10.0)
+
+            # Record/replay of provider traffic, None when calling the provider live
+            self.backend = get_backend()
+
             # Initialize cost tracker
             self.cost_tracker = Cost()
+
+            # Response cache is opt-in and shared by all instances
+            self.response_cache = (
+                ResponseCache.shared()
+                if config.llm_cache and config.llm_cache.enabled
+                else None
+            )
+
+            # Concurrent identical requests share one provider call
+            self.single_flight = (
+                SingleFlight()
+                if getattr(llm_config, "coalesce_requests", True)
+                else None
+            )
+            # Token sinks receiving each in-flight stream, so a sink shared by
+            # coalesced callers gets the text once
+            self._stream_sinks: Dict[str, List[TokenSink]] = {}
             self.initialized = True
 
             # Initialize completion function
             self._initialize_completion_function()
 
+    @property
+    def token_counter(self) -> TokenCounter:
+        """Shared tokenizer of the model, loaded on first use (see prewarm_tokenizers)"""
+        return get_token_counter(self.model)
+
+    def _model_name(self) -> str:
+        """Model name in the format litellm expects"""
+        if self.api_type == "azure":
+            # For Azure, litellm expects model name in format: azure/<deployment_name>
+            return f"azure/{self.model}"
+        return self.model
+
+    def _apply_provider_params(self, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        """Fill in the model name and API credentials if not provided"""
+        kwargs.setdefault("model", self._model_name())
+        if "api_key" not in kwargs:
+            kwargs["api_key"] = self.api_key
+        if "base_url" not in kwargs and self.base_url:
+            kwargs["base_url"] = self.base_url
+        if "api_version" not in kwargs and self.api_version:
+            kwargs["api_version"] = self.api_version
+        if "custom_llm_provider" not in kwargs and self.custom_llm_provider:
+            kwargs["custom_llm_provider"] = self.custom_llm_provider
+        return kwargs
+
+    def _apply_default_params(self, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        """Fill in default sampling parameters and the model name"""
+        if "max_tokens" not in kwargs:
+            kwargs["max_tokens"] = self.max_tokens
+        if "temperature" not in kwargs:
+            kwargs["temperature"] = self.temperature
+        if "top_p" not in kwargs:
+            kwargs["top_p"] = self.top_p
+        if "timeout" not in kwargs:
+            kwargs["timeout"] = self.timeout
+
+        kwargs["model"] = self._model_name()
+        return self._apply_provider_params(kwargs)
+
+    def _resolve_provider(self) -> Optional[str]:
+        """Return the litellm provider for the configured model, if it can be determined"""
+        try:
+            _, provider, _, _ = litellm.get_llm_provider(
+                model=self._model_name(),
+                custom_llm_provider=self.custom_llm_provider,
+                api_base=self.base_url,
+            )
+        except Exception:
+            return None
+        return provider
+
+    async def _acompletion_call(self, prompt_tokens: Optional[int] = None, **kwargs):
+        """
+        Send one async completion request, without retries.
+
+        Every async request to the provider goes through here. It waits for the
+        model's rate limits, and OpenAI and Azure requests reuse the pooled
+        connections of the shared HTTP client.
+
+        Args:
+            prompt_tokens: Prompt size if already known, used for the TPM budget
+            **kwargs: litellm completion arguments
+        """
+        kwargs = self._apply_provider_params(kwargs)
+        if (
+            "client" not in kwargs
+            and self.provider in SDK_PROVIDERS
+            and (self.backend is None or self.backend.sends_requests)
+        ):
+            kwargs["client"] = get_sdk_client(
+                self.provider,
+                kwargs["api_key"],
+                kwargs.get("base_url"),
+                kwargs.get("api_version"),
+            )
+
+        budget = current_budget()
+        if budget is not None:
+            # Wait no longer than the run has left, and do not send once it is over budget
+            if budget.max_prompt_tokens is not None and prompt_tokens is None:
+                prompt_tokens = self.count_message_tokens(kwargs.get("messages") or [])
+            budget.check(prompt_tokens or 0)
+            kwargs["timeout"] = budget.timeout(kwargs.get("timeout"))
+
+        limiter = self.rate_limiter
+        reserved = 0
+        if limiter is not None:
+            if limiter.limits_tokens and prompt_tokens is None:
+                prompt_tokens = self.count_message_tokens(kwargs.get("messages") or [])
+            # Reserve the worst case, then settle with the usage the provider reports
+            reserved = await limiter.acquire(
+                (prompt_tokens or 0) + (kwargs.get("max_tokens") or 0)
+            )
+
+        span = begin_span("llm.request", "llm", model=kwargs["model"])
+        if current_tracer() is not None:
+            span.set(
+                call_site=current_call_site(),
+                stream=bool(kwargs.get("stream")),
+                request_size=payload_size(kwargs.get("messages")),
+            )
+        started = time.perf_counter()
+        try:
+            if self.backend is None:
+                response = await litellm.acompletion(**kwargs)
+            else:
+                response = await self.backend.acompletion(litellm.acompletion, **kwargs)
+        except BaseException as e:
+            # A failed request uses no tokens, only its request slot
+            if limiter is not None:
+                limiter.settle(reserved, 0)
+            span.finish(error=type(e).__name__)
+            raise
+
+        if not kwargs.get("stream"):
+            if limiter is not None:
+                limiter.settle(reserved, self._usage_tokens(response, reserved))
+            self._record_call(kwargs["model"], started, response, span=span)
+            return response
+        return self._observe_stream(
+            response, kwargs["model"], started, limiter, reserved, span
+        )
+
+    @property
+    def hedge_llm(self) -> Optional["LLM"]:
+        """LLM slow requests are duplicated to, None if hedging is off"""
+        if not self.hedge_with:
+            return None
+        return LLM(self.hedge_with)
+
+    def _hedge_delay(self, stream: bool) -> float:
+        """
+        Seconds to wait for the first byte before hedging a request.
+
+        This is the configured percentile of the model's recent time to first
+        token (or latency, for non-streaming requests), once enough calls were
+        timed, and a fixed initial delay before that.
+        """
+        delay = self.cost_tracker.recent_percentile(
+            self._model_name(),
+            "ttft" if stream else "latency",
+            self.hedge_percentile,
+            min_samples=HEDGE_MIN_SAMPLES,
+        )
+        if delay is None:
+            delay = self.hedge_initial_delay
+        return max(delay, self.hedge_min_delay)
+
+    async def _hedged_call(self, **kwargs):
+        """
+        Send a request like `_acompletion_call`, hedging it if it is slow.
+
+        If the first byte has not arrived within `_hedge_delay`, the request is
+        also sent to the `hedge_with` endpoint, with that endpoint's model and
+        credentials, and the first to answer is used. A stream is only handed
+        back once its first chunk is in, so no tool call is ever dispatched from
+        the losing request.
+        """
+        hedge_llm = self.hedge_llm
+        if hedge_llm is None:
+            return await self._acompletion_call(**kwargs)
+
+        stream = bool(kwargs.get("stream"))
+        backup_kwargs = {k: v for k, v in kwargs.items() if k != "model"}
+
+        def on_hedge() -> None:
+            logger.info(
+                f"No response from {self.model} yet, hedging the request to {hedge_llm.model}"
+            )
+            self.cost_tracker.add_hedged_request()
+
+        response, backup_won = await hedge(
+            lambda: self._acompletion_call(**kwargs),
+            lambda: hedge_llm._acompletion_call(**backup_kwargs),
+            self._hedge_delay(stream),
+            stream=stream,
+            on_hedge=on_hedge,
+        )
+        if backup_won:
+            self.cost_tracker.add_hedge_win()
+        return response
+
+    @staticmethod
+    def _usage_tokens(response, default: int) -> int:
+        """Total tokens reported by a response, or `default` if it has no usage"""
+        usage = getattr(response, "usage", None)
+        return getattr(usage, "total_tokens", None) or default
+
+    async def _observe_stream(
+        self,
+        stream,
+        model: str,
+        started: float,
+        limiter: Optional[RateLimiter],
+        reserved: int,
+        span=None,
+    ):
+        """
+        Pass a stream through, timing its first token and settling the token
+        reservation from its usage chunk.
+        """
+        ttft = None
+        usage_chunk = None
+        try:
+            async for chunk in stream:
+                if ttft is None and getattr(chunk, "choices", None):
+                    ttft = time.perf_counter() - started
+                if getattr(chunk, "usage", None):
+                    usage_chunk = chunk
+                yield chunk
+        except BaseException as e:
+            if span is not None:
+                span.finish(error=type(e).__name__)
+            raise
+        finally:
+            if limiter is not None:
+                limiter.settle(reserved, self._usage_tokens(usage_chunk, reserved))
+        self._record_call(model, started, usage_chunk, ttft=ttft, span=span)
+
+    def _record_call(
+        self,
+        model: str,
+        started: float,
+        response,
+        ttft: Optional[float] = None,
+        span=None,
+    ) -> None:
+        """Add the timing and usage of one finished provider call to the telemetry"""
+        usage = getattr(response, "usage", None)
+        prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+        completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+        self.cost_tracker.add_call(
+            model=model,
+            latency=time.perf_counter() - started,
+            ttft=ttft,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            retries=_retries.get(),
+            call_site=current_call_site(),
+        )
+        budget = current_budget()
+        if budget is not None:
+            budget.charge(prompt_tokens=prompt_tokens)
+        if span:
+            span.finish(
+                prompt_tokens=prompt_tokens,
+                completion_tokens=completion_tokens,
+                ttft_ms=round(ttft * 1000, 1) if ttft is not None else None,
+                retries=_retries.get(),
+            )
+
     def _initialize_completion_function(self):
-        """Initialize the completion function with retry logic"""
+        """Initialize the sync and async completion functions with retry logic"""
 
         def attempt_on_error(retry_state):
             logger.error(
@@ -92,48 +462,40 @@ class LLM:
             )
             return True
 
-        @retry(
+        retry_policy = retry(
             reraise=True,
-            stop=stop_after_attempt(self.num_retries),
+            stop=stop_after_attempt(self.num_retries) | _single_attempt_requested,
             wait=wait_random_exponential(
                 min=self.retry_min_wait, max=self.retry_max_wait
             ),
             retry=retry_if_exception_type(
                 (RateLimitError, APIConnectionError, ServiceUnavailableError)
             ),
+            before=_note_attempt,
             after=attempt_on_error,
         )
+
+        @retry_policy
         def wrapper(*args, **kwargs):
-            model_name = self.model
-            if self.api_type == "azure":
-                model_name = f"azure/{self.model}"
-
-            # Set default parameters if not provided
-            if "max_tokens" not in kwargs:
-                kwargs["max_tokens"] = self.max_tokens
-            if "temperature" not in kwargs:
-                kwargs["temperature"] = self.temperature
-            if "top_p" not in kwargs:
-                kwargs["top_p"] = self.top_p
-            if "timeout" not in kwargs:
-                kwargs["timeout"] = self.timeout
-
-            kwargs["model"] = model_name
-
-            # Add API credentials if not in kwargs
-            if "api_key" not in kwargs:
-                kwargs["api_key"] = self.api_key
-            if "base_url" not in kwargs and self.base_url:
-                kwargs["base_url"] = self.base_url
-            if "api_version" not in kwargs and self.api_version:
-                kwargs["api_version"] = self.api_version
-            if "custom_llm_provider" not in kwargs and self.custom_llm_provider:
-                kwargs["custom_llm_provider"] = self.custom_llm_provider
-
-            resp = completion(**kwargs)
-            return resp
+            kwargs = self._apply_default_params(kwargs)
+            kwargs["timeout"] = budget_timeout(kwargs["timeout"])
+            started = time.perf_counter()
+            if self.backend is None:
+                response = completion(*args, **kwargs)
+            else:
+                response = self.backend.completion(completion, *args, **kwargs)
+            if not kwargs.get("stream"):
+                self._record_call(kwargs["model"], started, response)
+            return response
+
+        @retry_policy
+        async def async_wrapper(*args, **kwargs):
+            return await self._acompletion_call(
+                *args, **self._apply_default_params(kwargs)
+            )
 
         self._completion = wrapper
+        self._acompletion = async_wrapper
 
     @staticmethod
     def format_messages(messages: List[Union[dict, Message]]) -> List[dict]:
@@ -175,6 +537,83 @@ class LLM:
 
         return formatted_messages
 
+    def _format_prompt(
+        self,
+        messages: List[Union[dict, Message]],
+        system_msgs: Optional[List[Union[dict, Message]]] = None,
+    ) -> List[dict]:
+        """Format system and conversation messages and attach the latest images"""
+        formatted = self.format_messages(messages)
+        if system_msgs:
+            formatted = self.format_messages(system_msgs) + formatted
+        return attach_images(formatted, self.supports_images, self.max_images)
+
+    def count_message_tokens(self, messages: List[Union[dict, Message]]) -> int:
+        """
+        Count prompt tokens of a message list.
+
+        Message objects reuse their cached token count, so counting an agent's
+        memory does not re-encode messages that were already counted.
+
+        Args:
+            messages: List of messages that can be either dict or Message objects
+
+        Returns:
+            int: Token count
+        """
+        counted = [msg.token_count for msg in messages if isinstance(msg, Message)]
+        # Plain dicts are encoded together as one batch
+        uncounted = [msg for msg in messages if not isinstance(msg, Message)]
+        return (
+            self.token_counter.FORMAT_TOKENS
+            + sum(counted)
+            + sum(self.token_counter.count_messages(uncounted))
+        )
+
+    def check_token_limit(self, input_tokens: int) -> bool:
+        """Check whether a request of `input_tokens` fits in max_input_tokens"""
+        if self.max_input_tokens is not None:
+            return (self.total_input_tokens + input_tokens) <= self.max_input_tokens
+        # If max_input_tokens is not set, always return True
+        return True
+
+    def get_limit_error_message(self, input_tokens: int) -> str:
+        """Generate error message for token limit exceeded"""
+        if (
+            self.max_input_tokens is not None
+            and (self.total_input_tokens + input_tokens) > self.max_input_tokens
+        ):
+            return f"Request may exceed input token limit (Current: {self.total_input_tokens}, Needed: {input_tokens}, Max: {self.max_input_tokens})"
+
+        return "Token limit exceeded"
+
+    def _prompt_tokens(
+        self,
+        messages: List[Union[dict, Message]],
+        system_msgs: Optional[List[Union[dict, Message]]] = None,
+    ) -> Optional[int]:
+        """Count the prompt tokens of a request, if a token limit or TPM budget needs them"""
+        if self.max_input_tokens is None and not (
+            self.rate_limiter and self.rate_limiter.limits_tokens
+        ):
+            return None
+        return self.count_message_tokens(list(system_msgs or []) + messages)
+
+    def _ensure_token_limit(self, input_tokens: Optional[int]) -> None:
+        """Raise TokenLimitExceeded if the request would exceed max_input_tokens"""
+        if self.max_input_tokens is None or input_tokens is None:
+            return
+        if not self.check_token_limit(input_tokens):
+            raise TokenLimitExceeded(self.get_limit_error_message(input_tokens))
+
+    def update_token_count(self, response) -> None:
+        """Add the usage reported by a response to the running totals"""
+        usage = getattr(response, "usage", None)
+        if not usage:
+            return
+        self.total_input_tokens += getattr(usage, "prompt_tokens", 0) or 0
+        self.total_completion_tokens += getattr(usage, "completion_tokens", 0) or 0
+
     def _calculate_and_track_cost(self, response) -> float:
         """
         Calculate and track the cost of an LLM API call.
@@ -189,9 +628,12 @@ class LLM:
             # Use litellm's completion_cost function
             cost = completion_cost(completion_response=response)
 
-            # Add the cost to our tracker
+            # Add the cost to our tracker and the run's budget
             if cost > 0:
                 self.cost_tracker.add_cost(cost)
+                budget = current_budget()
+                if budget is not None:
+                    budget.charge(cost=cost)
                 logger.info(
                     f"Added cost: ${cost:.6f}, Total: ${self.cost_tracker.accumulated_cost:.6f}"
                 )
@@ -201,6 +643,85 @@ class LLM:
             logger.warning(f"Cost calculation failed: {e}")
             return 0.0
 
+    def _request_key(self, kind: str, **parts) -> str:
+        """
+        Build a key identifying a request by everything that determines its response.
+
+        Args:
+            kind: The request kind ("ask" or "ask_tool")
+            **parts: Everything else that determines the response
+
+        Returns:
+            str: The key
+        """
+        return ResponseCache.make_key(kind=kind, model=self.model, **parts)
+
+    def _cache_key(self, request_key: str) -> Optional[str]:
+        """Return the response cache key for a request, or None if caching is disabled"""
+        return request_key if self.response_cache is not None else None
+
+    def _joins_flight(self, key: str) -> bool:
+        """Return True if a request with this key would join one already in flight"""
+        return self.single_flight is not None and self.single_flight.in_flight(key)
+
+    async def _coalesce(
+        self,
+        key: str,
+        fn: Callable[[Publish], Awaitable[Any]],
+        on_item: Optional[Callable[[Any], Awaitable[None]]] = None,
+    ) -> Any:
+        """
+        Run a provider call, sharing it with identical calls already in flight.
+
+        Args:
+            key: Request key; calls with equal keys are interchangeable
+            fn: Makes the call; receives a `publish` callable for streamed items
+            on_item: Awaited with each item `fn` publishes, for this caller only
+
+        Returns:
+            The result of `fn`
+        """
+        flights = self.single_flight
+        if flights is None:
+            # Not shared with anyone, but items are still delivered the same way
+            flights = SingleFlight()
+        elif self._joins_flight(key):
+            self.cost_tracker.add_coalesced_request()
+            logger.info("Joining an identical in-flight LLM request")
+        return await flights.do(key, fn, on_item=on_item)
+
+    async def _cache_lookup(self, key: Optional[str]) -> Optional[dict]:
+        """
+        Look up a cached response and record the hit or miss.
+
+        Args:
+            key: Cache key from `_cache_key`
+
+        Returns:
+            Optional[dict]: The cached entry, or None on a miss
+        """
+        if key is None:
+            return None
+        entry = await self.response_cache.get(key)
+        if entry is None:
+            self.cost_tracker.add_cache_miss()
+            return None
+        self.cost_tracker.add_cache_hit(entry.get("cost", 0.0))
+        logger.info(
+            f"LLM cache hit ({self.cost_tracker.cache_hits} hits, "
+            f"{self.cost_tracker.cache_misses} misses)"
+        )
+        return entry
+
+    async def _cache_store(self, key: Optional[str], entry: dict) -> None:
+        """Store a response entry if caching is enabled."""
+        if key is None:
+            return
+        try:
+            await self.response_cache.set(key, entry)
+        except Exception as e:
+            logger.warning(f"Failed to store LLM response in cache: {e}")
+
     def is_local(self) -> bool:
         """
         Check if the model is running locally.
@@ -221,7 +742,10 @@ class LLM:
 
     def do_completion(self, *args, **kwargs) -> Tuple[Any, float, float]:
         """
-        Perform a completion request and track cost.
+        Perform a blocking completion request and track cost.
+
+        Use `ado_completion` from async code; this blocks the calling thread
+        for the whole request.
 
         Returns:
             Tuple[Any, float, float]: (response, current_cost, accumulated_cost)
@@ -233,6 +757,34 @@ class LLM:
 
         return response, current_cost, self.cost_tracker.accumulated_cost
 
+    async def ado_completion(self, *args, **kwargs) -> Tuple[Any, float, float]:
+        """
+        Perform a completion request without blocking the event loop and track cost.
+
+        Returns:
+            Tuple[Any, float, float]: (response, current_cost, accumulated_cost)
+        """
+        response = await self._acompletion(*args, **kwargs)
+
+        # Calculate and track cost
+        current_cost = self._calculate_and_track_cost(response)
+
+        return response, current_cost, self.cost_tracker.accumulated_cost
+
+    async def ado_completion_in_thread(
+        self, *args, **kwargs
+    ) -> Tuple[Any, float, float]:
+        """
+        Run the blocking `do_completion` in a worker thread.
+
+        Fallback for async callers that need the synchronous litellm path; the
+        event loop stays free while the request runs.
+
+        Returns:
+            Tuple[Any, float, float]: (response, current_cost, accumulated_cost)
+        """
+        return await asyncio.to_thread(self.do_completion, *args, **kwargs)
+
     @staticmethod
     def encode_image(image_path: str) -> str:
         """
@@ -288,9 +840,71 @@ class LLM:
         messages = self.prepare_messages(text, image_path=image_path)
         return self.do_completion(messages=messages)
 
+    async def ado_multimodal_completion(
+        self, text: str, image_path: str
+    ) -> Tuple[Any, float, float]:
+        """
+        Perform a multimodal completion with text and image without blocking the event loop.
+
+        Args:
+            text: Text prompt
+            image_path: Path to the image file
+
+        Returns:
+            Tuple[Any, float, float]: (response, current_cost, accumulated_cost)
+        """
+        # Reading and encoding the image is file I/O, keep it off the event loop
+        messages = await asyncio.to_thread(
+            self.prepare_messages, text, image_path=image_path
+        )
+        return await self.ado_completion(messages=messages)
+
+    async def _complete_text(
+        self, params: Dict[str, Any], cache_key: Optional[str]
+    ) -> str:
+        """Make one non-streaming text request and cache its content."""
+        response = await self._acompletion_call(**params, stream=False)
+
+        # Calculate and track cost
+        cost = self._calculate_and_track_cost(response)
+        self.update_token_count(response)
+
+        if not response.choices or not response.choices[0].message.content:
+            raise ValueError("Empty or invalid response from LLM")
+        content = response.choices[0].message.content
+        await self._cache_store(cache_key, {"content": content, "cost": cost})
+        return content
+
+    async def _stream_text(
+        self, params: Dict[str, Any], cache_key: Optional[str], publish: Publish
+    ) -> str:
+        """Make one streaming text request, publishing each chunk of content."""
+        collected_messages = []
+        chunk = None
+        async for chunk in await self._acompletion_call(**params, stream=True):
+            chunk_message = chunk.choices[0].delta.content or ""
+            collected_messages.append(chunk_message)
+            if chunk_message:
+                publish(chunk_message)
+
+        # For streaming responses, cost is calculated on the last chunk
+        cost = 0.0
+        if getattr(chunk, "usage", None):
+            cost = self._calculate_and_track_cost(chunk)
+            self.update_token_count(chunk)
+
+        full_response = "".join(collected_messages).strip()
+        if full_response:
+            await self._cache_store(cache_key, {"content": full_response, "cost": cost})
+        return full_response
+
     @retry(
         wait=wait_random_exponential(min=1, max=60),
-        stop=stop_after_attempt(6),
+        stop=stop_after_attempt(6) | _single_attempt_requested,
+        retry=retry_if_not_exception_type(
+            (TokenLimitExceeded, CassetteMiss, BudgetExceeded)
+        ),
+        before=_note_attempt,
     )
     async def ask(
         self,
@@ -302,6 +916,9 @@ class LLM:
         """
         Send a prompt to the LLM and get the response.
 
+        A streamed response is delivered to the current token sink as it
+        arrives (see `app.llm.events.token_sink`); without one it is silent.
+
         Args:
             messages: List of conversation messages
             system_msgs: Optional system messages to prepend
@@ -312,62 +929,72 @@ class LLM:
             str: The generated response
 
         Raises:
+            TokenLimitExceeded: If token limits are exceeded
             ValueError: If messages are invalid or response is empty
             Exception: For unexpected errors
         """
         try:
-            # Format system and user messages
-            if system_msgs:
-                system_msgs = self.format_messages(system_msgs)
-                messages = system_msgs + self.format_messages(messages)
-            else:
-                messages = self.format_messages(messages)
-
-            model_name = self.model
-            if self.api_type == "azure":
-                # For Azure, litellm expects model name in format: azure/<deployment_name>
-                model_name = f"azure/{self.model}"
-
-            if not stream:
-                # Non-streaming request
-                response = await litellm.acompletion(
-                    model=model_name,
-                    messages=messages,
-                    max_tokens=self.max_tokens,
-                    temperature=temperature or self.temperature,
-                    stream=False,
-                )
+            input_tokens = self._prompt_tokens(messages, system_msgs)
+            self._ensure_token_limit(input_tokens)
 
-                # Calculate and track cost
-                self._calculate_and_track_cost(response)
-
-                if not response.choices or not response.choices[0].message.content:
-                    raise ValueError("Empty or invalid response from LLM")
-                return response.choices[0].message.content
-
-            # Streaming request
-            collected_messages = []
-            async for chunk in await litellm.acompletion(
-                model=model_name,
+            # Format system and user messages
+            messages = self._format_prompt(messages, system_msgs)
+
+            params = {
+                "model": self._model_name(),
+                "messages": messages,
+                "max_tokens": self.max_tokens,
+                "temperature": temperature or self.temperature,
+                "prompt_tokens": input_tokens,
+            }
+
+            request_key = self._request_key(
+                "ask",
                 messages=messages,
                 max_tokens=self.max_tokens,
                 temperature=temperature or self.temperature,
-                stream=True,
-            ):
-                chunk_message = chunk.choices[0].delta.content or ""
-                collected_messages.append(chunk_message)
-                print(chunk_message, end="", flush=True)
+            )
+            cache_key = self._cache_key(request_key)
+            cached = await self._cache_lookup(cache_key)
+            if cached is not None:
+                return cached["content"]
 
-            # For streaming responses, cost is calculated on the last chunk
-            if hasattr(chunk, "usage") and chunk.usage:
-                self._calculate_and_track_cost(chunk)
+            if not stream:
+                # Non-streaming request
+                return await self._coalesce(
+                    request_key,
+                    lambda publish: self._complete_text(params, cache_key),
+                )
 
-            print()  # Newline after streaming
-            full_response = "".join(collected_messages).strip()
+            # Streaming request, chunks go to this caller's token sink unless
+            # it already gets them through a coalesced caller
+            stream_key = f"{request_key}:stream"
+            sink = current_token_sink()
+            receivers = self._stream_sinks.setdefault(stream_key, [])
+            if sink in receivers:
+                sink = None
+            if sink is not None:
+                receivers.append(sink)
+            try:
+                full_response = await self._coalesce(
+                    stream_key,
+                    lambda publish: self._stream_text(params, cache_key, publish),
+                    on_item=sink.on_token if sink is not None else None,
+                )
+            finally:
+                if sink is not None:
+                    receivers.remove(sink)
+                if not receivers:
+                    self._stream_sinks.pop(stream_key, None)
+            if sink is not None:
+                await sink.on_end()
             if not full_response:
                 raise ValueError("Empty response from streaming LLM")
             return full_response
 
+        except (TokenLimitExceeded, CassetteMiss, BudgetExceeded):
+            # Re-raise non-retryable errors without logging
+            raise
         except ValueError as ve:
             logger.error(f"Validation error: {ve}")
             raise
@@ -375,36 +1002,189 @@ class LLM:
             logger.error(f"Unexpected error in ask: {e}")
             raise
 
+    async def ask_stream(
+        self,
+        messages: List[Union[dict, Message]],
+        system_msgs: Optional[List[Union[dict, Message]]] = None,
+        temperature: Optional[float] = None,
+    ) -> AsyncIterator[str]:
+        """
+        Stream the response to a prompt as it arrives.
+
+        Same as a streaming `ask`, but the text is yielded to the caller instead
+        of the current token sink. A retried request starts over from its first
+        chunk.
+
+        Args:
+            messages: List of conversation messages
+            system_msgs: Optional system messages to prepend
+            temperature (float): Sampling temperature for the response
+
+        Yields:
+            str: Chunks of response text
+        """
+        sink = QueueTokenSink()
+
+        async def run() -> str:
+            with token_sink(sink):
+                try:
+                    return await self.ask(
+                        messages, system_msgs, stream=True, temperature=temperature
+                    )
+                finally:
+                    await sink.on_end()
+
+        task = asyncio.create_task(run())
+        try:
+            while True:
+                chunk = await sink.queue.get()
+                if chunk is sink.END:
+                    break
+                yield chunk
+            # Raise the request's error, if any
+            await task
+        finally:
+            if not task.done():
+                task.cancel()
+
+    async def _stream_tool_calls(
+        self,
+        params: Dict[str, Any],
+        publish: Publish,
+    ) -> Tuple[Any, float]:
+        """
+        Stream a tool completion, handing each tool call over as soon as it is complete.
+
+        Args:
+            params: Completion parameters
+            publish: Called with each chunk of content text and each completed
+                ToolCall, in stream order
+
+        Returns:
+            Tuple[Any, float]: (assembled message, cost)
+
+        Raises:
+            ToolCallStreamInterrupted: If the stream fails after a tool call was
+                handed over, since retrying would run the same tools twice
+        """
+        assembler = ToolCallAssembler()
+        dispatched = 0
+        cost = 0.0
+        try:
+            async for chunk in await self._hedged_call(
+                **params,
+                stream=True,
+                stream_options={"include_usage": True},
+            ):
+                if getattr(chunk, "usage", None):
+                    cost = self._calculate_and_track_cost(chunk)
+                    self.update_token_count(chunk)
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta
+                if getattr(delta, "content", None):
+                    publish(delta.content)
+                for tool_call in assembler.feed(delta):
+                    dispatched += 1
+                    publish(tool_call)
+
+            for tool_call in assembler.finish():
+                dispatched += 1
+                publish(tool_call)
+        except Exception as e:
+            if dispatched:
+                raise ToolCallStreamInterrupted(
+                    f"Tool call stream failed after {dispatched} tool call(s) were dispatched: {e}"
+                ) from e
+            raise
+
+        tool_calls = [call.model_dump() for call in assembler.tool_calls()]
+        message = litellm.Message(
+            role="assistant",
+            content=assembler.content or None,
+            tool_calls=tool_calls or None,
+        )
+        return message, cost
+
+    async def _complete_tool(
+        self, params: Dict[str, Any], cache_key: Optional[str]
+    ) -> Any:
+        """Make one non-streaming tool request and cache its message."""
+        response = await self._hedged_call(**params)
+
+        # Calculate and track cost
+        cost = self._calculate_and_track_cost(response)
+        self.update_token_count(response)
+
+        # Check if response is valid
+        if not response.choices or not response.choices[0].message:
+            print(response)
+            raise ValueError("Invalid or empty response from LLM")
+
+        message = response.choices[0].message
+        await self._cache_store(
+            cache_key, {"message": message.model_dump(), "cost": cost}
+        )
+        return message
+
+    async def _complete_tool_stream(
+        self, params: Dict[str, Any], cache_key: Optional[str], publish: Publish
+    ) -> Any:
+        """Make one streaming tool request and cache its assembled message."""
+        message, cost = await self._stream_tool_calls(params, publish)
+        await self._cache_store(
+            cache_key, {"message": message.model_dump(), "cost": cost}
+        )
+        return message
+
     @retry(
         wait=wait_random_exponential(min=1, max=60),
-        stop=stop_after_attempt(6),
+        stop=stop_after_attempt(6) | _single_attempt_requested,
+        retry=retry_if_not_exception_type(
+            (
+                TokenLimitExceeded,
+                ToolCallStreamInterrupted,
+                CassetteMiss,
+                BudgetExceeded,
+            )
+        ),
+        before=_note_attempt,
     )
     async def ask_tool(
         self,
         messages: List[Union[dict, Message]],
         system_msgs: Optional[List[Union[dict, Message]]] = None,
         timeout: int = 120,
-        tools: Optional[List[dict]] = None,
+        tools: Optional[Union[List[dict], ToolParams]] = None,
         tool_choice: Literal["none", "auto", "required"] = "auto",
         temperature: Optional[float] = None,
+        on_tool_call: Optional[Callable[[ToolCall], Awaitable[None]]] = None,
         **kwargs,
     ):
         """
         Ask LLM using functions/tools and return the response.
 
+        With `hedge_with` configured, a request that is slow to answer is also
+        sent to that endpoint and the faster answer is used.
+
         Args:
             messages: List of conversation messages
             system_msgs: Optional system messages to prepend
             timeout: Request timeout in seconds
-            tools: List of tools to use
+            tools: List of tools to use, e.g. ToolCollection.to_params()
             tool_choice: Tool choice strategy
             temperature: Sampling temperature for the response
+            on_tool_call: If given, the response is streamed and this callback is
+                awaited with each ToolCall as soon as its arguments are complete;
+                the model's text goes to the current token sink as it arrives
             **kwargs: Additional completion arguments
 
         Returns:
             The model's response
 
         Raises:
+            TokenLimitExceeded: If token limits are exceeded
+            ToolCallStreamInterrupted: If a stream fails after tool calls were dispatched
             ValueError: If tools, tool_choice, or messages are invalid
             Exception: For unexpected errors
         """
@@ -413,46 +1193,91 @@ class LLM:
             if tool_choice not in ["none", "auto", "required"]:
                 raise ValueError(f"Invalid tool_choice: {tool_choice}")
 
+            input_tokens = self._prompt_tokens(messages, system_msgs)
+            self._ensure_token_limit(input_tokens)
+
             # Format messages
-            if system_msgs:
-                system_msgs = self.format_messages(system_msgs)
-                messages = system_msgs + self.format_messages(messages)
-            else:
-                messages = self.format_messages(messages)
+            messages = self._format_prompt(messages, system_msgs)
 
             # Validate tools if provided
             if tools:
                 for tool in tools:
-                    if not isinstance(tool, dict) or "type" not in tool:
+                    if not isinstance(tool, Mapping) or "type" not in tool:
                         raise ValueError("Each tool must be a dict with 'type' field")
 
-            model_name = self.model
-            if self.api_type == "azure":
-                # For Azure, litellm expects model name in format: azure/<deployment_name>
-                model_name = f"azure/{self.model}"
+            model_name = self._model_name()
 
-            # Set up the completion request
-            response = await litellm.acompletion(
-                model=model_name,
+            request_key = self._request_key(
+                "ask_tool",
                 messages=messages,
-                temperature=temperature or self.temperature,
                 max_tokens=self.max_tokens,
-                tools=tools,
+                temperature=temperature or self.temperature,
+                # Shared schemas come serialized already
+                tools=tools.json if isinstance(tools, ToolParams) else tools,
                 tool_choice=tool_choice,
-                timeout=timeout,
+                extra=kwargs,
+            )
+            cache_key = self._cache_key(request_key)
+            cached = await self._cache_lookup(cache_key)
+            if cached is not None:
+                message = litellm.Message(**cached["message"])
+                if on_tool_call is not None:
+                    for tool_call in message.tool_calls or []:
+                        await on_tool_call(
+                            ToolCall(
+                                id=tool_call.id,
+                                function=Function(
+                                    name=tool_call.function.name,
+                                    arguments=tool_call.function.arguments,
+                                ),
+                            )
+                        )
+                return message
+
+            params = {
+                "model": model_name,
+                "messages": messages,
+                "temperature": temperature or self.temperature,
+                "max_tokens": self.max_tokens,
+                "tools": tools.to_list() if isinstance(tools, ToolParams) else tools,
+                "tool_choice": tool_choice,
+                "timeout": timeout,
+                "prompt_tokens": input_tokens,
                 **kwargs,
+            }
+
+            if on_tool_call is not None:
+                # The model's text goes to this caller's token sink as it streams
+                sink = current_token_sink()
+
+                async def on_item(item: Union[str, ToolCall]) -> None:
+                    if isinstance(item, ToolCall):
+                        await on_tool_call(item)
+                    elif sink is not None:
+                        await sink.on_token(item)
+
+                message = await self._coalesce(
+                    f"{request_key}:stream",
+                    lambda publish: self._complete_tool_stream(
+                        params, cache_key, publish
+                    ),
+                    on_item=on_item,
+                )
+                if sink is not None and message.content:
+                    await sink.on_end()
+                return message
+            return await self._coalesce(
+                request_key, lambda publish: self._complete_tool(params, cache_key)
             )
 
-            # Calculate and track cost
-            self._calculate_and_track_cost(response)
-
-            # Check if response is valid
-            if not response.choices or not response.choices[0].message:
-                print(response)
-                raise ValueError("Invalid or empty response from LLM")
-
-            return response.choices[0].message
-
+        except (
+            TokenLimitExceeded,
+            ToolCallStreamInterrupted,
+            CassetteMiss,
+            BudgetExceeded,
+        ):
+            # Re-raise non-retryable errors without logging
+            raise
         except ValueError as ve:
             logger.error(f"Validation error: {ve}")
             raise
@@ -488,7 +1313,7 @@ class LLM:
         Returns:
             int: Token count
         """
-        return litellm.token_counter(model=self.model, messages=messages)
+        return self.count_message_tokens(messages)
 
     def __str__(self):
         return f"LLM(model={self.model}, base_url={self.base_url})"
@@ -504,22 +1329,27 @@ if __name__ == "__main__":
 
     load_dotenv()
 
-    # Create LLM instance
-    llm = LLM()
-
-    # Test text completion
-    messages = llm.prepare_messages("Hello, how are you?")
-    response, cost, total_cost = llm.do_completion(messages=messages)
-    print(f"Response: {response['choices'][0]['message']['content']}")
-    print(f"Cost: ${cost:.6f}, Total cost: ${total_cost:.6f}")
+    async def main():
+        # Create LLM instance
+        llm = LLM()
+
+        # Test text completion
+        messages = llm.prepare_messages("Hello, how are you?")
+        response, cost, total_cost = await llm.ado_completion(messages=messages)
+        print(f"Response: {response['choices'][0]['message']['content']}")
+        print(f"Cost: ${cost:.6f}, Total cost: ${total_cost:.6f}")
+
+        # Test multimodal if image path is available
+        image_path = os.getenv("TEST_IMAGE_PATH")
+        if image_path and os.path.exists(image_path):
+            (
+                multimodal_response,
+                mm_cost,
+                mm_total_cost,
+            ) = await llm.ado_multimodal_completion("What's in this image?", image_path)
+            print(
+                f"Multimodal response: {multimodal_response['choices'][0]['message']['content']}"
+            )
+            print(f"Cost: ${mm_cost:.6f}, Total cost: ${mm_total_cost:.6f}")
 
-    # Test multimodal if image path is available
-    image_path = os.getenv("TEST_IMAGE_PATH")
-    if image_path and os.path.exists(image_path):
-        multimodal_response, mm_cost, mm_total_cost = llm.do_multimodal_completion(
-            "What's in this image?", image_path
-        )
-        print(
-            f"Multimodal response: {multimodal_response['choices'][0]['message']['content']}"
-        )
-        print(f"Cost: ${mm_cost:.6f}, Total cost: ${mm_total_cost:.6f}")
+    asyncio.run(main())
@@ -0,0 +1,144 @@
+import asyncio
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+
+class TokenBucket:
+    """
+    Token bucket that refills continuously up to its capacity.
+
+    Callers reserve their amount up front and then sleep off any deficit, so
+    waiters are admitted in arrival order without holding a lock across awaits.
+    """
+
+    def __init__(self, capacity: float, refill_per_second: float):
+        self.capacity = float(capacity)
+        self.refill_per_second = float(refill_per_second)
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated_at
+        self._updated_at = now
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.refill_per_second)
+
+    def reserve(self, amount: float) -> float:
+        """
+        Take `amount` from the bucket, going into debt if needed.
+
+        Returns:
+            float: Seconds to wait before the reservation is covered
+        """
+        amount = min(amount, self.capacity)
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens -= amount
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.refill_per_second
+
+    def adjust(self, amount: float) -> None:
+        """Give back (positive) or take (negative) tokens after the fact."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self.capacity, self._tokens + amount)
+
+    @property
+    def available(self) -> float:
+        with self._lock:
+            self._refill(time.monotonic())
+            return self._tokens
+
+
+class RateLimiter:
+    """
+    Requests-per-minute and tokens-per-minute admission control for one model.
+
+    Limiters are shared per model across the process, so every agent and LLM
+    instance using the model draws from the same budgets.
+    """
+
+    _limiters: Dict[Tuple[str, Optional[int], Optional[int]], "RateLimiter"] = {}
+    _limiters_lock = threading.Lock()
+
+    def __init__(self, rpm: Optional[int] = None, tpm: Optional[int] = None):
+        self.requests = TokenBucket(rpm, rpm / 60) if rpm else None
+        self.tokens = TokenBucket(tpm, tpm / 60) if tpm else None
+
+    @classmethod
+    def for_model(
+        cls, model: str, rpm: Optional[int] = None, tpm: Optional[int] = None
+    ) -> Optional["RateLimiter"]:
+        """Return the shared limiter for a model, or None if it has no limits."""
+        if not rpm and not tpm:
+            return None
+        key = (model, rpm, tpm)
+        with cls._limiters_lock:
+            limiter = cls._limiters.get(key)
+            if limiter is None:
+                limiter = cls._limiters[key] = cls(rpm, tpm)
+        return limiter
+
+    @property
+    def limits_tokens(self) -> bool:
+        return self.tokens is not None
+
+    async def acquire(self, tokens: int = 0) -> int:
+        """
+        Wait until one request using `tokens` tokens fits in both budgets.
+
+        Returns:
+            int: The number of tokens reserved, to be passed to `settle`
+        """
+        # The bucket takes at most its capacity; settle and release refund only that
+        reserved = 0
+        if self.tokens is not None:
+            reserved = min(int(tokens), int(self.tokens.capacity))
+        wait = 0.0
+        if self.requests is not None:
+            wait = max(wait, self.requests.reserve(1))
+        if self.tokens is not None:
+            wait = max(wait, self.tokens.reserve(reserved))
+
+        if wait > 0:
+            try:
+                await asyncio.sleep(wait)
+            except asyncio.CancelledError:
+                # The request is never sent, so its reservation is returned
+                self.release(reserved)
+                raise
+        return reserved
+
+    def headroom_wait(self, tokens: int = 0) -> float:
+        """Seconds until one request using `tokens` tokens would go out at once"""
+        wait = 0.0
+        if self.requests is not None:
+            wait = max(wait, (1 - self.requests.available) / self.requests.refill_per_second)
+        if self.tokens is not None:
+            needed = min(tokens, self.tokens.capacity)
+            wait = max(wait, (needed - self.tokens.available) / self.tokens.refill_per_second)
+        return wait
+
+    async def wait_for_headroom(self, tokens: int = 0) -> None:
+        """
+        Wait until one request using `tokens` tokens fits, without reserving it.
+
+        For admission control: work that is about to start sending requests
+        holds back while the budgets are spent by the work already running.
+        """
+        while (wait := self.headroom_wait(tokens)) > 0:
+            await asyncio.sleep(wait)
+
+    def settle(self, reserved: int, used: int) -> None:
+        """Correct a token reservation once the actual usage is known."""
+        if self.tokens is not None:
+            self.tokens.adjust(reserved - used)
+
+    def release(self, reserved: int) -> None:
+        """Return a reservation for a request that was not sent."""
+        if self.requests is not None:
+            self.requests.adjust(1)
+        if self.tokens is not None:
+            self.tokens.adjust(reserved)
@@ -0,0 +1,198 @@
+import json
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Union,
+)
+
+from app.config import LLMRoutingSettings, config
+from app.llm.inference import LLM, single_attempt
+from app.logger import logger
+from app.schema import Function, Message, ToolCall, ToolParams
+
+
+# Call sites that can be routed from [llm_routing.routes]
+PLANNING_FLOW_FINALIZE = "planning_flow.finalize"
+PLANNING_AGENT_INITIAL_PLAN = "planning_agent.initial_plan"
+BROWSER_EXTRACT_CONTENT = "browser.extract_content"
+AGENT_COMPACT_MEMORY = "agent.compact_memory"
+
+
+class CascadeLLM:
+    """
+    Try a cheaper model first and escalate to the primary model when it fails.
+
+    A cheap attempt fails when it raises, returns an empty answer, a text answer
+    shorter than `min_response_chars`, or tool calls that are missing, unknown or
+    whose arguments are not a JSON object. The cheap model gets one attempt
+    without retries, so an unavailable or rate-limited cheap model escalates
+    at once instead of stalling the call in backoff.
+    """
+
+    def __init__(
+        self,
+        call_site: str,
+        cheap: LLM,
+        primary: LLM,
+        min_response_chars: int = 1,
+    ):
+        self.call_site = call_site
+        self.cheap = cheap
+        self.primary = primary
+        self.min_response_chars = min_response_chars
+
+    def _escalate(self, reason: str) -> None:
+        logger.info(
+            f"Escalating '{self.call_site}' from {self.cheap.model} to "
+            f"{self.primary.model}: {reason}"
+        )
+
+    async def ask(
+        self,
+        messages: List[Union[dict, Message]],
+        system_msgs: Optional[List[Union[dict, Message]]] = None,
+        stream: bool = True,
+        temperature: Optional[float] = None,
+    ) -> str:
+        """Same as `LLM.ask`, answered by the cheap model when its answer is usable."""
+        try:
+            # Streaming would print an answer that may be thrown away
+            with single_attempt():
+                response = await self.cheap.ask(
+                    messages,
+                    system_msgs=system_msgs,
+                    stream=False,
+                    temperature=temperature,
+                )
+        except Exception as e:
+            self._escalate(f"error: {e}")
+        else:
+            if len(response.strip()) >= self.min_response_chars:
+                return response
+            self._escalate("empty or too short answer")
+
+        return await self.primary.ask(
+            messages, system_msgs=system_msgs, stream=stream, temperature=temperature
+        )
+
+    async def ask_tool(
+        self,
+        messages: List[Union[dict, Message]],
+        system_msgs: Optional[List[Union[dict, Message]]] = None,
+        timeout: int = 120,
+        tools: Optional[Union[List[dict], ToolParams]] = None,
+        tool_choice: str = "auto",
+        temperature: Optional[float] = None,
+        on_tool_call: Optional[Callable[[ToolCall], Awaitable[None]]] = None,
+        **kwargs,
+    ):
+        """Same as `LLM.ask_tool`, answered by the cheap model when its tool calls are valid."""
+        try:
+            # Tool calls are only handed over once the whole response is validated
+            with single_attempt():
+                response = await self.cheap.ask_tool(
+                    messages,
+                    system_msgs=system_msgs,
+                    timeout=timeout,
+                    tools=tools,
+                    tool_choice=tool_choice,
+                    temperature=temperature,
+                    **kwargs,
+                )
+        except Exception as e:
+            self._escalate(f"error: {e}")
+        else:
+            problem = self._tool_response_problem(response, tools, tool_choice)
+            if problem is None:
+                if on_tool_call is not None:
+                    for tool_call in response.tool_calls or []:
+                        await on_tool_call(
+                            ToolCall(
+                                id=tool_call.id,
+                                function=Function(
+                                    name=tool_call.function.name,
+                                    arguments=tool_call.function.arguments,
+                                ),
+                            )
+                        )
+                return response
+            self._escalate(problem)
+
+        return await self.primary.ask_tool(
+            messages,
+            system_msgs=system_msgs,
+            timeout=timeout,
+            tools=tools,
+            tool_choice=tool_choice,
+            temperature=temperature,
+            on_tool_call=on_tool_call,
+            **kwargs,
+        )
+
+    def _tool_response_problem(
+        self, response: Any, tools: Optional[Sequence[Mapping]], tool_choice: str
+    ) -> Optional[str]:
+        """Return why a tool response is unusable, or None if it is fine"""
+        if response is None:
+            return "no response"
+
+        tool_calls = response.tool_calls or []
+        if not tool_calls:
+            if tool_choice == "required":
+                return "no tool call although one is required"
+            if len((response.content or "").strip()) < self.min_response_chars:
+                return "empty response"
+            return None
+
+        tool_names = {
+            tool["function"]["name"]
+            for tool in tools or []
+            if isinstance(tool.get("function"), Mapping)
+        }
+        for tool_call in tool_calls:
+            if tool_names and tool_call.function.name not in tool_names:
+                return f"unknown tool '{tool_call.function.name}'"
+            try:
+                arguments = json.loads(tool_call.function.arguments or "{}")
+            except json.JSONDecodeError:
+                return f"invalid JSON arguments for '{tool_call.function.name}'"
+            if not isinstance(arguments, dict):
+                return f"arguments for '{tool_call.function.name}' are not an object"
+        return None
+
+
+def route(
+    call_site: str,
+    primary: LLM,
+    settings: Optional[LLMRoutingSettings] = None,
+) -> Union[LLM, CascadeLLM]:
+    """
+    Return the LLM to use at a call site.
+
+    Without a route for the call site this is `primary` itself; otherwise a
+    CascadeLLM that tries the routed config first.
+    """
+    settings = settings or config.llm_routing
+    if not settings or not settings.enabled:
+        return primary
+
+    config_name = settings.routes.get(call_site)
+    if not config_name:
+        return primary
+    if config_name not in config.llm:
+        logger.warning(
+            f"LLM route for '{call_site}' names unknown config '{config_name}'"
+        )
+        return primary
+
+    cheap = LLM(config_name=config_name)
+    if cheap is primary or cheap.model == primary.model:
+        return primary
+    return CascadeLLM(
+        call_site, cheap, primary, min_response_chars=settings.min_response_chars
+    )
@@ -0,0 +1,108 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+
+# Marks the end of a flight's published items
+_DONE = object()
+
+Publish = Callable[[Any], None]
+
+
+class _Flight:
+    """One shared in-flight call and the callers waiting on it."""
+
+    def __init__(self):
+        self.task: Optional[asyncio.Task] = None
+        self.waiters = 0
+        self.items: List[Any] = []
+        self.subscribers: List[asyncio.Queue] = []
+        self.finished = False
+
+    def publish(self, item: Any) -> None:
+        self.items.append(item)
+        for queue in self.subscribers:
+            queue.put_nowait(item)
+
+    def subscribe(self) -> asyncio.Queue:
+        """Return a queue that replays everything published so far, then follows."""
+        queue: asyncio.Queue = asyncio.Queue()
+        for item in self.items:
+            queue.put_nowait(item)
+        if self.finished:
+            queue.put_nowait(_DONE)
+        else:
+            self.subscribers.append(queue)
+        return queue
+
+    def finish(self) -> None:
+        self.finished = True
+        for queue in self.subscribers:
+            queue.put_nowait(_DONE)
+        self.subscribers.clear()
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls that share a key into one underlying call.
+
+    The first caller for a key starts the call in a shared task; callers that
+    arrive while it is in flight await the same task. Items the call publishes
+    while running (stream chunks, tool calls) are replayed to every caller that
+    asked for them, including late joiners. Cancelling one caller only cancels
+    the shared call once no other caller is waiting on it.
+    """
+
+    def __init__(self):
+        self._flights: Dict[str, _Flight] = {}
+
+    def in_flight(self, key: str) -> bool:
+        return key in self._flights
+
+    async def do(
+        self,
+        key: str,
+        fn: Callable[[Publish], Awaitable[Any]],
+        on_item: Optional[Callable[[Any], Awaitable[None]]] = None,
+    ) -> Any:
+        """
+        Run `fn` once for all concurrent callers with the same key.
+
+        Args:
+            key: Identifies calls that are interchangeable
+            fn: Started with a `publish` callable if no call for the key is in flight
+            on_item: Awaited with each published item, in publish order
+
+        Returns:
+            The shared call's result; its exception is raised to every caller
+        """
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight()
+            self._flights[key] = flight
+            flight.task = asyncio.create_task(self._run(key, flight, fn))
+
+        flight.waiters += 1
+        try:
+            if on_item is not None:
+                queue = flight.subscribe()
+                while True:
+                    item = await queue.get()
+                    if item is _DONE:
+                        break
+                    await on_item(item)
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                # Nobody is left to use the result
+                flight.task.cancel()
+
+    async def _run(
+        self, key: str, flight: _Flight, fn: Callable[[Publish], Awaitable[Any]]
+    ) -> Any:
+        try:
+            return await fn(flight.publish)
+        finally:
+            flight.finish()
+            if self._flights.get(key) is flight:
+                del self._flights[key]
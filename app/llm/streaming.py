@@ -0,0 +1,136 @@
+from typing import Any, Dict, List, Optional
+
+from app.schema import Function, ToolCall
+
+
+class _PartialToolCall:
+    """A tool call whose arguments are still being streamed."""
+
+    def __init__(self, index: int):
+        self.index = index
+        self.id: Optional[str] = None
+        self.name = ""
+        self.arguments: List[str] = []
+        self.done = False
+
+        # Incremental JSON scanner state
+        self._depth = 0
+        self._started = False
+        self._in_string = False
+        self._escaped = False
+
+    def feed(self, fragment: str) -> bool:
+        """
+        Append an arguments fragment.
+
+        Returns:
+            bool: True once the top-level JSON object of the arguments has closed
+        """
+        self.arguments.append(fragment)
+        for char in fragment:
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._depth += 1
+                self._started = True
+            elif char in "}]":
+                self._depth -= 1
+        return self._started and self._depth == 0
+
+    def to_tool_call(self) -> ToolCall:
+        return ToolCall(
+            id=self.id or f"call_{self.index}",
+            function=Function(name=self.name, arguments="".join(self.arguments)),
+        )
+
+
+class ToolCallAssembler:
+    """
+    Assemble streamed tool-call deltas into complete ToolCalls.
+
+    A tool call is reported complete as soon as its arguments JSON closes,
+    when a delta for a later tool call arrives, or when the stream ends.
+    Each call is reported exactly once, in index order.
+    """
+
+    def __init__(self):
+        self._calls: Dict[int, _PartialToolCall] = {}
+        self._content: List[str] = []
+
+    @property
+    def content(self) -> str:
+        return "".join(self._content)
+
+    def feed(self, delta: Any) -> List[ToolCall]:
+        """
+        Consume one streamed delta.
+
+        Args:
+            delta: The `choices[0].delta` of a streamed chunk
+
+        Returns:
+            List[ToolCall]: Tool calls completed by this delta
+        """
+        if delta is None:
+            return []
+        if getattr(delta, "content", None):
+            self._content.append(delta.content)
+
+        completed = []
+        for tool_delta in getattr(delta, "tool_calls", None) or []:
+            index = getattr(tool_delta, "index", None)
+            if index is None:
+                # Providers without indices start a new call with a new id
+                last = max(self._calls, default=None)
+                if last is None:
+                    index = 0
+                elif tool_delta.id and tool_delta.id != self._calls[last].id:
+                    index = last + 1
+                else:
+                    index = last
+
+            # A new call means every earlier call has been fully streamed
+            if index not in self._calls:
+                completed.extend(self._complete_before(index))
+                self._calls[index] = _PartialToolCall(index)
+
+            partial = self._calls[index]
+            if tool_delta.id:
+                partial.id = tool_delta.id
+            function = getattr(tool_delta, "function", None)
+            if function is not None:
+                if function.name:
+                    partial.name += function.name
+                if (
+                    function.arguments
+                    and partial.feed(function.arguments)
+                    and not partial.done
+                ):
+                    completed.extend(self._complete_before(index))
+                    partial.done = True
+                    completed.append(partial.to_tool_call())
+        return completed
+
+    def _complete_before(self, index: int) -> List[ToolCall]:
+        completed = []
+        for i in sorted(self._calls):
+            partial = self._calls[i]
+            if i < index and not partial.done:
+                partial.done = True
+                completed.append(partial.to_tool_call())
+        return completed
+
+    def finish(self) -> List[ToolCall]:
+        """Report every tool call that has not been completed yet."""
+        return self._complete_before(max(self._calls, default=-1) + 1)
+
+    def tool_calls(self) -> List[ToolCall]:
+        """Return all tool calls seen so far, in index order."""
+        return [self._calls[i].to_tool_call() for i in sorted(self._calls)]
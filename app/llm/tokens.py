@@ -0,0 +1,283 @@
+import math
+import os
+import shutil
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+import tiktoken
+
+from app.config import PROJECT_ROOT, config
+from app.logger import logger
+
+
+DEFAULT_ENCODING = "cl100k_base"
+ENCODING_CACHE_DIR = PROJECT_ROOT / ".cache" / "tiktoken"
+
+# Below this many texts, encoding one by one beats spinning up encode_batch threads
+BATCH_MIN_TEXTS = 16
+
+
+class TokenCounter:
+    # Token constants
+    BASE_MESSAGE_TOKENS = 4
+    FORMAT_TOKENS = 2
+    LOW_DETAIL_IMAGE_TOKENS = 85
+    HIGH_DETAIL_TILE_TOKENS = 170
+
+    # Image processing constants
+    MAX_SIZE = 2048
+    HIGH_DETAIL_TARGET_SHORT_SIDE = 768
+    TILE_SIZE = 512
+
+    def __init__(self, tokenizer):
+        self.tokenizer = tokenizer
+
+    def count_text(self, text: str) -> int:
+        """Calculate tokens for a text string"""
+        return 0 if not text else len(self.tokenizer.encode(text))
+
+    def encode_batch(self, texts: List[str]) -> List[List[int]]:
+        """Encode many texts, in parallel threads when there are enough of them"""
+        if len(texts) < BATCH_MIN_TEXTS:
+            return [self.tokenizer.encode(text) for text in texts]
+        return self.tokenizer.encode_batch(texts)
+
+    def count_texts(self, texts: List[str]) -> List[int]:
+        """Calculate tokens for each of many text strings"""
+        non_empty = [text for text in texts if text]
+        counts = iter(len(tokens) for tokens in self.encode_batch(non_empty))
+        return [next(counts) if text else 0 for text in texts]
+
+    def count_image(self, image_item: dict) -> int:
+        """
+        Calculate tokens for an image based on detail level and dimensions
+
+        For "low" detail: fixed 85 tokens
+        For "high" detail:
+        1. Scale to fit in 2048x2048 square
+        2. Scale down so the shortest side is at most 768px
+        3. Count 512px tiles (170 tokens each)
+        4. Add 85 tokens
+        """
+        detail = image_item.get("detail", "medium")
+
+        # For low detail, always return fixed token count
+        if detail == "low":
+            return self.LOW_DETAIL_IMAGE_TOKENS
+
+        # For high or medium detail, calculate based on dimensions if available
+        if detail in ("high", "medium") and "dimensions" in image_item:
+            width, height = image_item["dimensions"]
+            return self._calculate_high_detail_tokens(width, height)
+
+        if detail == "high":
+            # Default to a 1024x1024 image calculation for high detail
+            return self._calculate_high_detail_tokens(1024, 1024)  # 765 tokens
+        # Medium or unknown detail level
+        return 1024
+
+    def high_detail_tiles(self, width: int, height: int) -> int:
+        """Number of 512px tiles a high detail image is billed for"""
+        # Step 1: Scale to fit in MAX_SIZE x MAX_SIZE square
+        if width > self.MAX_SIZE or height > self.MAX_SIZE:
+            scale = self.MAX_SIZE / max(width, height)
+            width = int(width * scale)
+            height = int(height * scale)
+
+        # Step 2: Scale down so shortest side is at most HIGH_DETAIL_TARGET_SHORT_SIDE;
+        # smaller images are not scaled up
+        scale = min(1.0, self.HIGH_DETAIL_TARGET_SHORT_SIDE / min(width, height))
+        scaled_width = int(width * scale)
+        scaled_height = int(height * scale)
+
+        # Step 3: Count number of 512px tiles
+        tiles_x = math.ceil(scaled_width / self.TILE_SIZE)
+        tiles_y = math.ceil(scaled_height / self.TILE_SIZE)
+        return tiles_x * tiles_y
+
+    def _calculate_high_detail_tokens(self, width: int, height: int) -> int:
+        """Calculate tokens for high detail images based on dimensions"""
+        # Step 4: Calculate final token count
+        return (
+            self.high_detail_tiles(width, height) * self.HIGH_DETAIL_TILE_TOKENS
+        ) + self.LOW_DETAIL_IMAGE_TOKENS
+
+    def _content_parts(
+        self, content: Union[str, List[Union[str, dict]]]
+    ) -> Tuple[List[str], int]:
+        """Text parts of message content and the tokens of its images"""
+        if not content:
+            return [], 0
+
+        if isinstance(content, str):
+            return [content], 0
+
+        texts, image_tokens = [], 0
+        for item in content:
+            if isinstance(item, str):
+                texts.append(item)
+            elif isinstance(item, dict):
+                if "text" in item:
+                    texts.append(item["text"])
+                elif "image_url" in item:
+                    image_tokens += self.count_image(item)
+        return texts, image_tokens
+
+    def count_content(self, content: Union[str, List[Union[str, dict]]]) -> int:
+        """Calculate tokens for message content"""
+        texts, image_tokens = self._content_parts(content)
+        return sum(self.count_texts(texts)) + image_tokens
+
+    @staticmethod
+    def _tool_call_texts(tool_calls: List[dict]) -> List[str]:
+        texts = []
+        for tool_call in tool_calls:
+            if "function" in tool_call:
+                function = tool_call["function"]
+                texts.append(function.get("name", ""))
+                texts.append(function.get("arguments", ""))
+        return texts
+
+    def count_tool_calls(self, tool_calls: List[dict]) -> int:
+        """Calculate tokens for tool calls"""
+        return sum(self.count_texts(self._tool_call_texts(tool_calls)))
+
+    def _message_parts(self, message: dict) -> Tuple[List[str], int]:
+        """Texts to encode for a message and the tokens it costs besides them"""
+        tokens = self.BASE_MESSAGE_TOKENS  # Base tokens per message
+
+        # Role, content, tool calls, name and tool_call_id texts
+        texts = [message.get("role", "")]
+        if "content" in message:
+            content_texts, image_tokens = self._content_parts(message["content"])
+            texts += content_texts
+            tokens += image_tokens
+        if message.get("tool_calls"):
+            texts += self._tool_call_texts(message["tool_calls"])
+        texts.append(message.get("name") or "")
+        texts.append(message.get("tool_call_id") or "")
+
+        # Attached screenshots are sent as high detail images
+        if message.get("base64_image"):
+            tokens += self.count_image({"detail": "high"})
+
+        return texts, tokens
+
+    def count_single_message(self, message: dict) -> int:
+        """Calculate tokens for one message, excluding list format tokens"""
+        texts, tokens = self._message_parts(message)
+        return tokens + sum(self.count_texts(texts))
+
+    def count_messages(self, messages: List[dict]) -> List[int]:
+        """Calculate tokens for each of many messages, encoding them as one batch"""
+        parts = [self._message_parts(message) for message in messages]
+        counts = iter(self.count_texts([text for texts, _ in parts for text in texts]))
+        return [
+            tokens + sum(next(counts) for _ in texts) for texts, tokens in parts
+        ]
+
+    def count_message_tokens(self, messages: List[dict]) -> int:
+        """Calculate the total number of tokens in a message list"""
+        return self.FORMAT_TOKENS + sum(self.count_messages(messages))
+
+
+_counters: Dict[str, TokenCounter] = {}
+_counters_lock = threading.Lock()
+
+
+_disk_cache_ready = False
+
+
+def _use_disk_cache() -> None:
+    """
+    Point tiktoken at the project's encoding cache.
+
+    Encodings downloaded once are then loaded from disk on later, possibly
+    offline, starts. The cache is seeded with the files of the cache dir in
+    use before (litellm ships the common OpenAI encodings), so nothing that
+    was available offline has to be downloaded. An explicit
+    CUSTOM_TIKTOKEN_CACHE_DIR is left alone.
+    """
+    global _disk_cache_ready
+    if _disk_cache_ready:
+        return
+    _disk_cache_ready = True
+    if os.environ.get("CUSTOM_TIKTOKEN_CACHE_DIR"):
+        return
+
+    previous = os.environ.get("TIKTOKEN_CACHE_DIR")
+    try:
+        ENCODING_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        if previous and os.path.isdir(previous):
+            for name in os.listdir(previous):
+                source = os.path.join(previous, name)
+                target = ENCODING_CACHE_DIR / name
+                # Cache entries are named by the SHA-1 of their URL
+                if len(name) == 40 and os.path.isfile(source) and not target.exists():
+                    shutil.copyfile(source, target)
+    except OSError as e:
+        logger.warning(f"Tokenizer disk cache unavailable, using {previous}: {e}")
+        return
+    os.environ["TIKTOKEN_CACHE_DIR"] = str(ENCODING_CACHE_DIR)
+
+
+def _load_encoding(model: Optional[str]):
+    _use_disk_cache()
+    if model:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            # If the model is not in tiktoken's presets, use the default encoding
+            pass
+        except Exception as e:
+            # E.g. offline with the model's encoding not cached yet
+            logger.warning(
+                f"Could not load tokenizer for '{model}', using {DEFAULT_ENCODING}: {e}"
+            )
+    return tiktoken.get_encoding(DEFAULT_ENCODING)
+
+
+def get_token_counter(model: Optional[str] = None) -> TokenCounter:
+    """
+    Return a shared TokenCounter for a model.
+
+    Counters are cached per model, so the tokenizer is loaded once per process.
+    A caller asking for a tokenizer that `prewarm_tokenizers` is still loading
+    waits for that load instead of starting another.
+    """
+    key = model or ""
+    counter = _counters.get(key)
+    if counter is None:
+        with _counters_lock:
+            counter = _counters.get(key)
+            if counter is None:
+                logger.debug(f"Loading tokenizer for model '{model or DEFAULT_ENCODING}'")
+                counter = TokenCounter(_load_encoding(model))
+                _counters[key] = counter
+    return counter
+
+
+def prewarm_tokenizers(models: Optional[Iterable[Optional[str]]] = None) -> threading.Thread:
+    """
+    Load tokenizers in a background thread.
+
+    Call at startup so the first token count does not pay for loading (or
+    downloading) the encoding. Defaults to the models of every [llm] config.
+
+    Returns:
+        threading.Thread: The daemon thread doing the loading
+    """
+    if models is None:
+        models = [settings.model for settings in config.llm.values()]
+    models = list(dict.fromkeys(models))
+
+    def load() -> None:
+        for model in models:
+            try:
+                get_token_counter(model)
+            except Exception as e:
+                logger.warning(f"Could not pre-load tokenizer for '{model}': {e}")
+
+    thread = threading.Thread(target=load, name="tokenizer-prewarm", daemon=True)
+    thread.start()
+    return thread
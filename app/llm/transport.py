@@ -0,0 +1,174 @@
+import asyncio
+import weakref
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+import litellm
+from openai import AsyncAzureOpenAI, AsyncOpenAI
+
+from app.config import LLMSettings, config
+from app.logger import logger
+
+
+# Providers litellm calls through the OpenAI SDK, which accepts our HTTP client
+SDK_PROVIDERS = ("openai", "azure")
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class PerHostTransport(httpx.AsyncBaseTransport):
+    """
+    Connection-pooling transport with a separate pool for every host.
+
+    Each pool is bounded by its own `httpx.Limits`, so one busy provider cannot
+    take every connection away from the others.
+    """
+
+    def __init__(self, limits: httpx.Limits, http2: bool = False, verify=True):
+        self._limits = limits
+        self._http2 = http2
+        self._verify = verify
+        self._transports: Dict[
+            Tuple[bytes, bytes, Optional[int]], httpx.AsyncHTTPTransport
+        ] = {}
+
+    def _transport_for(self, url: httpx.URL) -> httpx.AsyncHTTPTransport:
+        key = (url.raw_scheme, url.raw_host, url.port)
+        transport = self._transports.get(key)
+        if transport is None:
+            transport = httpx.AsyncHTTPTransport(
+                limits=self._limits, http2=self._http2, verify=self._verify
+            )
+            self._transports[key] = transport
+        return transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        return await self._transport_for(request.url).handle_async_request(request)
+
+    async def aclose(self) -> None:
+        for transport in self._transports.values():
+            await transport.aclose()
+        self._transports.clear()
+
+
+def build_async_client(settings: LLMSettings) -> httpx.AsyncClient:
+    """Build a pooled async HTTP client from the connection settings of an LLM config."""
+    http2 = settings.http2
+    if http2 and not _http2_available():
+        logger.warning(
+            "HTTP/2 requested but the h2 package is not installed, using HTTP/1.1"
+        )
+        http2 = False
+
+    if settings.http_max_connections_per_host:
+        max_connections = min(
+            settings.http_max_connections, settings.http_max_connections_per_host
+        )
+        transport = PerHostTransport(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=min(
+                    settings.http_max_keepalive_connections, max_connections
+                ),
+                keepalive_expiry=settings.http_keepalive_expiry,
+            ),
+            http2=http2,
+            verify=litellm.ssl_verify,
+        )
+    else:
+        transport = httpx.AsyncHTTPTransport(
+            limits=httpx.Limits(
+                max_connections=settings.http_max_connections,
+                max_keepalive_connections=settings.http_max_keepalive_connections,
+                keepalive_expiry=settings.http_keepalive_expiry,
+            ),
+            http2=http2,
+            verify=litellm.ssl_verify,
+        )
+
+    return httpx.AsyncClient(
+        transport=transport,
+        timeout=httpx.Timeout(settings.timeout),
+        verify=litellm.ssl_verify,
+    )
+
+
+# Connections belong to the event loop that opened them, so every loop gets its
+# own client; entries go away with their loop
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = (
+    weakref.WeakKeyDictionary()
+)
+_sdk_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[tuple, Any]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_async_client(settings: Optional[LLMSettings] = None) -> httpx.AsyncClient:
+    """
+    Return the pooled HTTP client shared by all LLM instances on the running loop.
+
+    The client is built on first use from `settings`, or from the default LLM
+    config. Must be called from inside a running event loop.
+    """
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None or client.is_closed:
+        client = build_async_client(settings or config.llm["default"])
+        _clients[loop] = client
+        _sdk_clients.pop(loop, None)
+    return client
+
+
+def get_sdk_client(
+    provider: Optional[str],
+    api_key: Optional[str],
+    base_url: Optional[str],
+    api_version: Optional[str] = None,
+) -> Optional[Any]:
+    """
+    Return an OpenAI SDK client that sends its requests through the shared pool.
+
+    litellm accepts such a client for OpenAI and Azure requests. Other providers
+    use litellm's own HTTP handlers, so None is returned for them.
+    """
+    if provider not in SDK_PROVIDERS:
+        return None
+
+    http_client = get_async_client()
+    clients = _sdk_clients.setdefault(asyncio.get_running_loop(), {})
+    key = (provider, api_key, base_url, api_version)
+    client = clients.get(key)
+    if client is None:
+        if provider == "azure":
+            params = {
+                "api_key": api_key,
+                "api_version": api_version or None,
+                "http_client": http_client,
+            }
+            # A deployment URL is a base_url, a bare resource URL an endpoint
+            if base_url and "/openai/deployments" in base_url:
+                params["base_url"] = base_url
+            else:
+                params["azure_endpoint"] = base_url
+            client = AsyncAzureOpenAI(**params)
+        else:
+            client = AsyncOpenAI(
+                api_key=api_key, base_url=base_url or None, http_client=http_client
+            )
+        clients[key] = client
+    return client
+
+
+async def aclose_async_client() -> None:
+    """Close the running loop's shared HTTP client and its pooled connections."""
+    loop = asyncio.get_running_loop()
+    _sdk_clients.pop(loop, None)
+    client = _clients.pop(loop, None)
+    if client is not None:
+        await client.aclose()
@@ -55,6 +55,10 @@ class MCPServer(BaseModel):
     disabled: bool = False
     autoApprove: List[str] = Field(default_factory=list)
     agents: List[str] = Field(default_factory=lambda: ["all"])
+    # Tools whose calls are idempotent, so their results may be reused. Only
+    # tools listed here are memoized: a readOnlyHint alone does not say that
+    # a query or status tool keeps giving the same answer
+    readOnly: List[str] = Field(default_factory=list)
     
     process: Optional[subprocess.Popen] = None
     tools: List[MCPToolSchema] = Field(default_factory=list)
@@ -139,6 +143,7 @@ class MCPClient:
                         disabled=server_config.get("disabled", False),
                         autoApprove=auto_approve,
                         agents=agents,
+                        readOnly=server_config.get("readOnly", []),
                     )
                     
                     self.servers[server_name] = server
@@ -14,6 +14,8 @@ class MCPTool(BaseTool):
     
     server_name: str = ""
     tool_name: str = ""
+    # Listed in the server's "readOnly" config, see memo_fingerprint
+    read_only: bool = False
     
     def __init__(
         self,
@@ -82,6 +84,11 @@ class MCPTool(BaseTool):
         # Set server and tool names after initialization
         self.server_name = server_name
         self.tool_name = tool_name
+        self.read_only = tool_name in server.readOnly
+
+    async def memo_fingerprint(self, **kwargs) -> Optional[str]:
+        """A tool listed as readOnly gives the same result for the same arguments"""
+        return "" if self.read_only else None
     
     async def execute(self, **kwargs) -> ToolResult:
         """Execute the MCP tool."""
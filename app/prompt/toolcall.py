@@ -21,3 +21,8 @@ Execute one tool at a time and carefully evaluate the results before proceeding.
 
 If you want to stop interaction, use `terminate` tool/function call.
 """
+
+COMPACTION_PROMPT = """Summarize the earlier part of an agent run so the agent can continue the task from the summary alone. Keep the task, decisions made, facts and results found (URLs, file paths, values, errors), and what remains to be done. Be concise and do not invent anything.
+
+Earlier steps:
+{transcript}"""
@@ -0,0 +1,239 @@
+import asyncio
+import json
+import time
+import uuid
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import (
+    AsyncIterable,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    Literal,
+    Optional,
+    Union,
+)
+
+from pydantic import BaseModel, Field
+
+from app.agent.base import BaseAgent
+from app.config import RunnerSettings, config
+from app.llm.inference import LLM
+from app.logger import logger
+from app.sandbox.client import sandbox_session
+
+
+AgentFactory = Callable[[], Awaitable[BaseAgent]]
+
+# Put on the result queue once every task has been started
+_ADMITTED_ALL = object()
+
+
+class AgentTask(BaseModel):
+    """One prompt to run with a fresh agent."""
+
+    id: str = Field(default_factory=lambda: uuid.uuid4().hex)
+    prompt: str
+    agent: str = Field("manus", description="Key of the agent factory to use")
+
+
+class TaskResult(BaseModel):
+    """Outcome of an AgentTask."""
+
+    id: str
+    status: Literal["completed", "failed"]
+    result: Optional[str] = None
+    error: Optional[str] = None
+    elapsed: float = Field(..., description="Seconds from start to finish")
+
+
+def default_agent_factories() -> Dict[str, AgentFactory]:
+    """Factories for the built-in agents, each building an agent with its own tools"""
+    from app.agent.manus import Manus
+    from app.agent.swe import SWEAgent
+
+    return {"manus": Manus.create, "swe": SWEAgent.create}
+
+
+async def read_tasks(path: Union[str, Path]) -> AsyncIterator[AgentTask]:
+    """
+    Read tasks from a JSONL file, one line at a time.
+
+    A line is either a JSON object with the AgentTask fields or a JSON
+    string holding just the prompt. Blank lines are skipped.
+    """
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            data = json.loads(line)
+            if isinstance(data, str):
+                data = {"prompt": data}
+            data.setdefault("id", f"{Path(path).stem}-{number}")
+            yield AgentTask(**data)
+
+
+async def _iterate(
+    tasks: Union[Iterable[AgentTask], AsyncIterable[AgentTask]]
+) -> AsyncIterator[AgentTask]:
+    if isinstance(tasks, AsyncIterable):
+        async for task in tasks:
+            yield task
+    else:
+        for task in tasks:
+            yield task
+
+
+class AgentRunner:
+    """
+    Runs independent agent tasks concurrently, at most `max_concurrency` at once.
+
+    Every task gets a fresh agent from its factory, so its tools (including
+    the browser) are its own, and a sandbox session of its own. A task is
+    only admitted while the rate limits of the admission LLM have headroom,
+    so queued tasks wait instead of adding requests that would be throttled.
+    """
+
+    def __init__(
+        self,
+        agents: Optional[Dict[str, AgentFactory]] = None,
+        settings: Optional[RunnerSettings] = None,
+        max_concurrency: Optional[int] = None,
+    ):
+        self.settings = settings or config.runner
+        self.max_concurrency = max_concurrency or self.settings.max_concurrency
+        self._agents = agents
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+        self._admission_llm: Optional[LLM] = None
+
+    @property
+    def agents(self) -> Dict[str, AgentFactory]:
+        if self._agents is None:
+            self._agents = default_agent_factories()
+        return self._agents
+
+    @property
+    def admission_llm(self) -> LLM:
+        if self._admission_llm is None:
+            self._admission_llm = LLM(self.settings.admission_llm)
+        return self._admission_llm
+
+    def _admission_tokens(self) -> int:
+        """Free TPM budget a new task waits for"""
+        if self.settings.admission_tokens is not None:
+            return self.settings.admission_tokens
+        llm = self.admission_llm
+        median = llm.cost_tracker.recent_percentile(llm.model, "prompt_tokens", 50)
+        return int(median or 0)
+
+    async def _acquire_slot(self) -> None:
+        """Take a run slot once the admission LLM's rate limits have headroom"""
+        await self._slots.acquire()
+        try:
+            limiter = self.admission_llm.rate_limiter
+            if limiter is not None:
+                await limiter.wait_for_headroom(self._admission_tokens())
+        except BaseException:
+            self._slots.release()
+            raise
+
+    @asynccontextmanager
+    async def admission(self) -> AsyncIterator[None]:
+        """Hold a run slot for the block, for tasks started outside of `run`"""
+        await self._acquire_slot()
+        try:
+            yield
+        finally:
+            self._slots.release()
+
+    async def run_task(self, task: AgentTask) -> TaskResult:
+        """Run one task with a fresh agent, without holding a run slot"""
+        started = time.perf_counter()
+        try:
+            factory = self.agents.get(task.agent)
+            if factory is None:
+                raise ValueError(f"Unknown agent: {task.agent}")
+            async with sandbox_session():
+                agent = await factory()
+                try:
+                    result = await agent.run(task.prompt)
+                finally:
+                    await self._cleanup(agent)
+        except Exception as e:
+            logger.error(f"Task {task.id} failed: {e}")
+            return TaskResult(
+                id=task.id,
+                status="failed",
+                error=str(e),
+                elapsed=time.perf_counter() - started,
+            )
+        return TaskResult(
+            id=task.id,
+            status="completed",
+            result=result,
+            elapsed=time.perf_counter() - started,
+        )
+
+    async def run(
+        self, tasks: Union[Iterable[AgentTask], AsyncIterable[AgentTask]]
+    ) -> AsyncIterator[TaskResult]:
+        """
+        Run tasks concurrently, yielding each result as soon as it is ready.
+
+        Tasks are pulled from `tasks` only as run slots free up, so a large
+        JSONL file is never loaded whole. Closing the iterator early cancels
+        the tasks still running.
+        """
+        results: asyncio.Queue = asyncio.Queue()
+        running = set()
+        started = finished = 0
+        admitted_all = False
+
+        async def start(task: AgentTask) -> None:
+            try:
+                results.put_nowait(await self.run_task(task))
+            finally:
+                self._slots.release()
+
+        async def admit() -> None:
+            nonlocal started
+            try:
+                async for task in _iterate(tasks):
+                    await self._acquire_slot()
+                    logger.info(f"Starting task {task.id}")
+                    started += 1
+                    runner_task = asyncio.create_task(start(task))
+                    running.add(runner_task)
+                    runner_task.add_done_callback(running.discard)
+            finally:
+                results.put_nowait(_ADMITTED_ALL)
+
+        feeder = asyncio.create_task(admit())
+        try:
+            while not admitted_all or finished < started:
+                result = await results.get()
+                if result is _ADMITTED_ALL:
+                    admitted_all = True
+                    continue
+                finished += 1
+                yield result
+            feeder.result()  # Surface errors reading the tasks
+        finally:
+            feeder.cancel()
+            for runner_task in list(running):
+                runner_task.cancel()
+            await asyncio.gather(feeder, *running, return_exceptions=True)
+
+    @staticmethod
+    async def _cleanup(agent: BaseAgent) -> None:
+        """Close what the agent's tools hold open, e.g. its browser"""
+        for tool in getattr(agent, "available_tools", None) or []:
+            cleanup = getattr(tool, "cleanup", None)
+            if cleanup is None:
+                continue
+            try:
+                await cleanup()
+            except Exception as e:
+                logger.warning(f"Could not clean up tool '{tool.name}': {e}")
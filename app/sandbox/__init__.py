@@ -8,6 +8,8 @@ from app.sandbox.client import (
     BaseSandboxClient,
     LocalSandboxClient,
     create_sandbox_client,
+    current_sandbox_client,
+    sandbox_session,
 )
 from app.sandbox.core.exceptions import (
     SandboxError,
@@ -24,6 +26,8 @@ __all__ = [
     "BaseSandboxClient",
     "LocalSandboxClient",
     "create_sandbox_client",
+    "current_sandbox_client",
+    "sandbox_session",
     "SandboxError",
     "SandboxTimeoutError",
     "SandboxResourceError",
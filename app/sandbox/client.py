@@ -1,6 +1,9 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Optional, Protocol
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Dict, Optional, Protocol
 
+from app.budget import budget_timeout
 from app.config import SandboxSettings
 from app.sandbox.core.sandbox import DockerSandbox
 
@@ -122,6 +125,8 @@ class LocalSandboxClient(BaseSandboxClient):
         """
         if not self.sandbox:
             raise RuntimeError("Sandbox not initialized")
+        # Wait no longer than the current run has left
+        timeout = budget_timeout(timeout or self.sandbox.config.timeout)
         return await self.sandbox.run_command(command, timeout)
 
     async def copy_from(self, container_path: str, local_path: str) -> None:
@@ -199,3 +204,26 @@ def create_sandbox_client() -> LocalSandboxClient:
 
 
 SANDBOX_CLIENT = create_sandbox_client()
+
+
+# Sandbox of the running task; the process-wide client unless a session is open
+_sandbox_client: ContextVar[Optional[BaseSandboxClient]] = ContextVar(
+    "sandbox_client", default=None
+)
+
+
+def current_sandbox_client() -> BaseSandboxClient:
+    """Return the sandbox client of the running task."""
+    return _sandbox_client.get() or SANDBOX_CLIENT
+
+
+@asynccontextmanager
+async def sandbox_session() -> AsyncIterator[BaseSandboxClient]:
+    """Give the code run inside the block a sandbox of its own, removed on exit."""
+    client = create_sandbox_client()
+    token = _sandbox_client.set(client)
+    try:
+        yield client
+    finally:
+        _sandbox_client.reset(token)
+        await client.cleanup()
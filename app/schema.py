@@ -1,7 +1,11 @@
+import json
 from enum import Enum
-from typing import Any, List, Literal, Optional, Union
+from types import MappingProxyType
+from typing import Any, ClassVar, Dict, List, Literal, Optional, Union
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
+
+from app.config import config
 
 
 class Role(str, Enum):
@@ -51,8 +55,49 @@ class ToolCall(BaseModel):
     function: Function
 
 
+
+def _freeze(value: Any) -> Any:
+    """Read-only view of a JSON value: dicts become mapping proxies, lists tuples"""
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+class ToolParams(tuple):
+    """
+    Read-only function schemas of a set of tools, serialized once.
+
+    Shared by every request made with the same tools, so nothing can change
+    them in place. `json` is their canonical serialization, reused for
+    request keys; `to_list` gives a fresh, mutable copy to send.
+    """
+
+    def __new__(cls, params: List[Dict[str, Any]]) -> "ToolParams":
+        self = super().__new__(cls, (_freeze(param) for param in params))
+        self.json = json.dumps(params, sort_keys=True, ensure_ascii=False)
+        return self
+
+    def to_list(self) -> List[Dict[str, Any]]:
+        """Plain copy of the schemas, e.g. for a provider that edits them"""
+        return json.loads(self.json)
+
+def _count_message_tokens(message: dict) -> int:
+    """Count tokens of a formatted message with the default model's tokenizer"""
+    from app.llm.tokens import get_token_counter
+
+    default_llm = config.llm.get("default")
+    model = default_llm.model if default_llm else None
+    return get_token_counter(model).count_single_message(message)
+
+
 class Message(BaseModel):
-    """Represents a chat message in the conversation"""
+    """Represents a chat message in the conversation
+
+    The formatted dict and the token count are computed once and cached;
+    assigning any field invalidates both.
+    """
 
     role: ROLE_TYPE = Field(...)  # type: ignore
     content: Optional[str] = Field(default=None)
@@ -61,6 +106,15 @@ class Message(BaseModel):
     tool_call_id: Optional[str] = Field(default=None)
     base64_image: Optional[str] = Field(default=None)
 
+    _formatted: Optional[dict] = PrivateAttr(default=None)
+    _token_count: Optional[int] = PrivateAttr(default=None)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        super().__setattr__(name, value)
+        if name in type(self).model_fields:
+            self._formatted = None
+            self._token_count = None
+
     def __add__(self, other) -> List["Message"]:
         """支持 Message + list 或 Message + Message 的操作"""
         if isinstance(other, list):
@@ -83,18 +137,30 @@ class Message(BaseModel):
 
     def to_dict(self) -> dict:
         """Convert message to dictionary format"""
-        message = {"role": self.role}
-        if self.content is not None:
-            message["content"] = self.content
-        if self.tool_calls is not None:
-            message["tool_calls"] = [tool_call.dict() for tool_call in self.tool_calls]
-        if self.name is not None:
-            message["name"] = self.name
-        if self.tool_call_id is not None:
-            message["tool_call_id"] = self.tool_call_id
-        if self.base64_image is not None:
-            message["base64_image"] = self.base64_image
-        return message
+        if self._formatted is None:
+            message = {"role": self.role}
+            if self.content is not None:
+                message["content"] = self.content
+            if self.tool_calls is not None:
+                message["tool_calls"] = [
+                    tool_call.model_dump() for tool_call in self.tool_calls
+                ]
+            if self.name is not None:
+                message["name"] = self.name
+            if self.tool_call_id is not None:
+                message["tool_call_id"] = self.tool_call_id
+            if self.base64_image is not None:
+                message["base64_image"] = self.base64_image
+            self._formatted = message
+        # Shallow copy so callers can't mutate the cached dict
+        return dict(self._formatted)
+
+    @property
+    def token_count(self) -> int:
+        """Number of prompt tokens this message costs (cached)"""
+        if self._token_count is None:
+            self._token_count = _count_message_tokens(self.to_dict())
+        return self._token_count
 
     @classmethod
     def user_message(
@@ -157,23 +223,117 @@ class Message(BaseModel):
 
 
 class Memory(BaseModel):
+    """
+    The agent's conversation history, bounded by message count and tokens.
+
+    When `max_messages` or `max_tokens` is exceeded, the oldest messages are
+    evicted. The leading system messages and the task (the first user
+    message) stay pinned, as do later system messages. An assistant message
+    with tool calls is evicted together with its tool results, so no tool
+    result is left without its call. Eviction frees `EVICTION_SLACK` of the
+    budget beyond the limit, so the list is only rebuilt once every many
+    additions.
+    """
+
+    EVICTION_SLACK: ClassVar[float] = 0.1
+
     messages: List[Message] = Field(default_factory=list)
     max_messages: int = Field(default=100)
+    max_tokens: Optional[int] = Field(
+        default=None, description="Token budget of all messages (None for unlimited)"
+    )
+
+    # Running token total of `messages`, kept in sync on add and evict, and
+    # the messages it counts
+    _token_total: int = PrivateAttr(default=0)
+    _counted: List[Message] = PrivateAttr(default_factory=list)
+
+    def _sync_token_total(self) -> None:
+        """
+        Recount from cached per-message counts if `messages` was changed
+        directly: replaced, resized, a message swapped in place or edited.
+        """
+        counted = self._counted
+        if len(counted) == len(self.messages) and all(
+            old is new and new._token_count is not None
+            for old, new in zip(counted, self.messages)
+        ):
+            return
+        self._token_total = sum(msg.token_count for msg in self.messages)
+        self._counted = list(self.messages)
 
     def add_message(self, message: Message) -> None:
         """Add a message to memory"""
-        self.messages.append(message)
-        # Optional: Implement message limit
-        if len(self.messages) > self.max_messages:
-            self.messages = self.messages[-self.max_messages :]
+        self.add_messages([message])
 
     def add_messages(self, messages: List[Message]) -> None:
         """Add multiple messages to memory"""
+        self._sync_token_total()
         self.messages.extend(messages)
+        self._token_total += sum(msg.token_count for msg in messages)
+        self._counted.extend(messages)
+        self._evict()
+
+    def _pinned_prefix(self) -> int:
+        """Number of leading messages never evicted: system prompts and the task"""
+        start = 0
+        while start < len(self.messages) and self.messages[start].role == Role.SYSTEM:
+            start += 1
+        if start < len(self.messages) and self.messages[start].role == Role.USER:
+            start += 1
+        return start
+
+    def _evict(self) -> None:
+        """Drop the oldest tool-call groups while over a limit"""
+        count, tokens = len(self.messages), self._token_total
+        over_count = count > self.max_messages
+        over_tokens = self.max_tokens is not None and tokens > self.max_tokens
+        if not over_count and not over_tokens:
+            return
+
+        max_count = self.max_messages
+        if over_count:
+            max_count -= int(self.max_messages * self.EVICTION_SLACK)
+        max_tokens = self.max_tokens
+        if over_tokens:
+            max_tokens -= int(self.max_tokens * self.EVICTION_SLACK)
+        start = end = self._pinned_prefix()
+        kept: List[Message] = []
+        while count > max_count or (max_tokens is not None and tokens > max_tokens):
+            # A group is a message and the tool results that follow it
+            group_end = end + 1
+            while (
+                group_end < len(self.messages)
+                and self.messages[group_end].role == Role.TOOL
+            ):
+                group_end += 1
+            if group_end >= len(self.messages):
+                break  # The newest group always stays
+            for msg in self.messages[end:group_end]:
+                if msg.role == Role.SYSTEM:
+                    kept.append(msg)
+                else:
+                    count -= 1
+                    tokens -= msg.token_count
+            end = group_end
+
+        if end == start:
+            return
+        self.messages = self.messages[:start] + kept + self.messages[end:]
+        self._token_total = tokens
+        self._counted = list(self.messages)
 
     def clear(self) -> None:
         """Clear all messages"""
         self.messages.clear()
+        self._token_total = 0
+        self._counted = []
+
+    @property
+    def token_count(self) -> int:
+        """Total prompt tokens of all messages in memory"""
+        self._sync_token_total()
+        return self._token_total
 
     def get_recent_messages(self, n: int) -> List[Message]:
         """Get n most recent messages"""
@@ -1,4 +1,5 @@
 from app.tool.aider_tool import AiderTool
+from app.tool.artifact import ReadArtifact
 from app.tool.base import BaseTool
 from app.tool.bash import Bash
 from app.tool.code_editor import FileEditor
@@ -23,4 +24,5 @@ __all__ = [
     "ToolCollection",
     "CreateChatCompletion",
     "PlanningTool",
+    "ReadArtifact",
 ]
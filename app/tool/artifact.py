@@ -0,0 +1,124 @@
+import hashlib
+import re
+from pathlib import Path
+from typing import Optional, Union
+
+from pydantic import Field
+
+from app.config import PROJECT_ROOT, config
+from app.exceptions import ToolError
+from app.tool.base import BaseTool, ToolResult
+
+
+ARTIFACT_DIR = PROJECT_ROOT / ".cache" / "artifacts"
+
+# Handles are the first hex digits of the SHA-256 of the content
+HANDLE_LENGTH = 16
+_HANDLE = re.compile(rf"^[0-9a-f]{{{HANDLE_LENGTH}}}$")
+
+READ_ARTIFACT = "read_artifact"
+
+
+class ArtifactStore:
+    """
+    Content-addressed store for full tool outputs.
+
+    Each output is saved once under a short handle derived from its content,
+    so storing the same output again costs nothing.
+    """
+
+    def __init__(self, directory: Optional[Union[str, Path]] = None):
+        self.directory = Path(
+            directory or config.observation.artifact_dir or ARTIFACT_DIR
+        )
+
+    def put(self, text: str) -> str:
+        """Save a text, returning its handle"""
+        handle = hashlib.sha256(text.encode("utf-8")).hexdigest()[:HANDLE_LENGTH]
+        path = self.directory / f"{handle}.txt"
+        if not path.exists():
+            self.directory.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_name(f".{path.name}.tmp")
+            tmp.write_text(text, encoding="utf-8")
+            tmp.replace(path)
+        return handle
+
+    def get(self, handle: str) -> str:
+        """Return the text saved under a handle"""
+        handle = handle.strip().removeprefix("artifact:")
+        path = self.directory / f"{handle}.txt"
+        if not _HANDLE.match(handle) or not path.exists():
+            raise ToolError(f"No artifact with handle: {handle}")
+        return path.read_text(encoding="utf-8")
+
+
+_READ_ARTIFACT_DESCRIPTION = """Read the full output of an earlier tool call that was shortened in the conversation.
+Shortened outputs name their artifact handle, e.g. `artifact:1a2b3c4d5e6f7a8b`. Read it a page of lines at a time, optionally only the lines matching a regular expression."""
+
+
+class ReadArtifact(BaseTool):
+    """Pages through tool outputs saved in the artifact store"""
+
+    name: str = READ_ARTIFACT
+    description: str = _READ_ARTIFACT_DESCRIPTION
+    parameters: dict = {
+        "type": "object",
+        "properties": {
+            "handle": {
+                "type": "string",
+                "description": "Handle of the artifact, as given in the shortened output.",
+            },
+            "start_line": {
+                "type": "integer",
+                "description": "First line to read, 1-based. Defaults to 1.",
+            },
+            "line_count": {
+                "type": "integer",
+                "description": "Number of lines to read. Defaults to 200.",
+            },
+            "pattern": {
+                "type": "string",
+                "description": "Only read lines matching this regular expression.",
+            },
+        },
+        "required": ["handle"],
+    }
+    parallel_safe: bool = True
+
+    store: ArtifactStore = Field(default_factory=ArtifactStore, exclude=True)
+    max_page_chars: int = 8000
+
+    async def execute(
+        self,
+        handle: str,
+        start_line: int = 1,
+        line_count: int = 200,
+        pattern: Optional[str] = None,
+        **kwargs,
+    ) -> ToolResult:
+        lines = self.store.get(handle).splitlines()
+        numbered = list(enumerate(lines, start=1))
+        if pattern:
+            try:
+                regex = re.compile(pattern)
+            except re.error as e:
+                raise ToolError(f"Invalid pattern {pattern!r}: {e}")
+            numbered = [(i, line) for i, line in numbered if regex.search(line)]
+
+        page = [(i, line) for i, line in numbered if i >= max(start_line, 1)]
+        page = page[: max(line_count, 1)]
+        if not page:
+            return ToolResult(output=f"No lines from line {start_line} ({len(lines)} lines in total)")
+
+        output, size = [], 0
+        for i, line in page:
+            entry = f"{i:6}\t{line}"
+            if size + len(entry) > self.max_page_chars and output:
+                break
+            output.append(entry[: self.max_page_chars])
+            size += len(entry) + 1
+        last = page[len(output) - 1][0]
+        header = f"Lines {page[0][0]}-{last} of {len(lines)}"
+        if pattern:
+            header += f" matching {pattern!r}"
+        return ToolResult(output=header + ":\n" + "\n".join(output))
@@ -9,6 +9,14 @@ class BaseTool(ABC, BaseModel):
     description: str
     parameters: Optional[dict] = None
 
+    # Calls of a parallel-safe tool may run alongside the other parallel-safe
+    # calls of the same step; other tools run alone, in call order. At most
+    # `max_concurrency` calls of the tool run at once, and tools that share an
+    # `exclusive_resource` (e.g. "browser") never run at the same time.
+    parallel_safe: bool = False
+    max_concurrency: Optional[int] = None
+    exclusive_resource: Optional[str] = None
+
     class Config:
         arbitrary_types_allowed = True
 
@@ -20,6 +28,22 @@ class BaseTool(ABC, BaseModel):
     async def execute(self, **kwargs) -> Any:
         """Execute the tool with given parameters."""
 
+    async def memo_fingerprint(self, **kwargs) -> Optional[str]:
+        """
+        State the result of an idempotent call depends on besides its
+        arguments, e.g. a file's modification time; None if the result of the
+        call must not be reused. Calls with the same arguments and fingerprint
+        are answered from the memo of the ToolCollection.
+        """
+        return None
+
+    async def save_state(self) -> Optional[dict]:
+        """State the tool keeps between calls, for agent checkpoints; None if stateless"""
+        return None
+
+    async def restore_state(self, state: dict) -> None:
+        """Restore the state returned by `save_state`"""
+
     def to_param(self) -> Dict:
         """Convert tool to function call format."""
         if not isinstance(self.parameters, dict):
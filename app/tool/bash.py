@@ -1,7 +1,9 @@
 import asyncio
 import os
+import shlex
 from typing import Optional
 
+from app.budget import budget_timeout
 from app.exceptions import ToolError
 from app.tool.base import BaseTool, CLIResult, ToolResult
 
@@ -71,6 +73,9 @@ class _BashSession:
         assert self._process.stdout
         assert self._process.stderr
 
+        # wait for the output at most until the run's deadline
+        timeout = budget_timeout(self._timeout)
+
         # send command to the process
         self._process.stdin.write(
             command.encode() + f"; echo '{self._sentinel}'\n".encode()
@@ -79,7 +84,7 @@ class _BashSession:
 
         # read output from the process, until the sentinel is found
         try:
-            async with asyncio.timeout(self._timeout):
+            async with asyncio.timeout(timeout):
                 while True:
                     await asyncio.sleep(self._output_delay)
                     # if we read directly from stdout/stderr, it will wait forever for
@@ -94,7 +99,7 @@ class _BashSession:
         except asyncio.TimeoutError:
             self._timed_out = True
             raise ToolError(
-                f"timed out: bash has not returned in {self._timeout} seconds and must be restarted",
+                f"timed out: bash has not returned in {timeout:g} seconds and must be restarted",
             ) from None
 
         if output.endswith("\n"):
@@ -151,6 +156,27 @@ class Bash(BaseTool):
 
         raise ToolError("no command provided.")
 
+    async def save_state(self) -> Optional[dict]:
+        """The working directory of the shell"""
+        if self._session is None:
+            return None
+        try:
+            result = await self._session.run("pwd")
+        except ToolError:
+            return None  # A timed out shell has to be restarted anyway
+        if result.error or not result.output:
+            return None
+        return {"cwd": result.output.strip()}
+
+    async def restore_state(self, state: dict) -> None:
+        """Start a shell in the saved working directory"""
+        if not state.get("cwd"):
+            return
+        if self._session is None:
+            self._session = _BashSession()
+            await self._session.start()
+        await self._session.run(f"cd {shlex.quote(state['cwd'])}")
+
 
 if __name__ == "__main__":
     bash = Bash()
@@ -1,5 +1,5 @@
 import asyncio
-import base64
+import hashlib
 import json
 from typing import Generic, Optional, TypeVar
 
@@ -10,8 +10,10 @@ from browser_use.dom.service import DomService
 from pydantic import Field, field_validator
 from pydantic_core.core_schema import ValidationInfo
 
-from app.config import config
+from app.config import BrowserSettings, config
 from app.llm import LLM
+from app.llm.images import prepare_screenshot
+from app.llm.router import BROWSER_EXTRACT_CONTENT, route
 from app.tool.base import BaseTool, ToolResult
 from app.tool.web_search import WebSearch
 
@@ -134,6 +136,10 @@ class BrowserUseTool(BaseTool, Generic[Context]):
         },
     }
 
+    # Browser actions run one at a time, but alongside other tools
+    parallel_safe: bool = True
+    exclusive_resource: Optional[str] = "browser"
+
     lock: asyncio.Lock = Field(default_factory=asyncio.Lock)
     browser: Optional[BrowserUseBrowser] = Field(default=None, exclude=True)
     context: Optional[BrowserContext] = Field(default=None, exclude=True)
@@ -456,7 +462,9 @@ Page content:
                         }
 
                         # Use LLM to extract content with required function calling
-                        response = await self.llm.ask_tool(
+                        response = await route(
+                            BROWSER_EXTRACT_CONTENT, self.llm
+                        ).ask_tool(
                             messages,
                             tools=[extraction_function],
                             tool_choice="required",
@@ -530,6 +538,15 @@ Page content:
             except Exception as e:
                 return ToolResult(error=f"Browser action '{action}' failed: {str(e)}")
 
+    async def memo_fingerprint(self, action: str = "", **kwargs) -> Optional[str]:
+        """Extracting from a page that has not changed gives the same content"""
+        if action != "extract_content" or self.context is None:
+            return None
+        async with self.lock:
+            page = await self.context.get_current_page()
+            html = await page.content()
+        return hashlib.sha256(f"{page.url}\n{html}".encode("utf-8")).hexdigest()
+
     async def get_current_state(
         self, context: Optional[BrowserContext] = None
     ) -> ToolResult:
@@ -562,7 +579,15 @@ Page content:
                 full_page=True, animations="disabled", type="jpeg", quality=100
             )
 
-            screenshot = base64.b64encode(screenshot).decode("utf-8")
+            # Downscale and recompress to what the model is billed for
+            settings = config.browser_config or BrowserSettings()
+            screenshot = await asyncio.to_thread(
+                prepare_screenshot,
+                screenshot,
+                settings.screenshot_max_tiles,
+                settings.screenshot_quality,
+                settings.screenshot_crop,
+            )
 
             # Build the state info with all required fields
             state_info = {
@@ -592,6 +617,19 @@ Page content:
         except Exception as e:
             return ToolResult(error=f"Failed to get browser state: {str(e)}")
 
+    async def save_state(self) -> Optional[dict]:
+        """The URL of the current page"""
+        if self.context is None:
+            return None
+        async with self.lock:
+            page = await self.context.get_current_page()
+            return {"url": page.url} if page.url.startswith("http") else None
+
+    async def restore_state(self, state: dict) -> None:
+        """Reopen the saved page"""
+        if state.get("url"):
+            await self.execute(action="go_to_url", url=state["url"])
+
     async def cleanup(self):
         """Clean up browser resources."""
         async with self.lock:
@@ -4,9 +4,10 @@ import asyncio
 from pathlib import Path
 from typing import Optional, Protocol, Tuple, Union, runtime_checkable
 
+from app.budget import budget_timeout
 from app.config import SandboxSettings
 from app.exceptions import ToolError
-from app.sandbox.client import SANDBOX_CLIENT
+from app.sandbox.client import current_sandbox_client
 
 
 PathLike = Union[str, Path]
@@ -32,6 +33,10 @@ class FileOperator(Protocol):
         """Check if path exists."""
         ...
 
+    async def fingerprint(self, path: PathLike) -> Optional[str]:
+        """Value that changes whenever a view of path would, None if unknown."""
+        ...
+
     async def run_command(
         self, cmd: str, timeout: Optional[float] = 120.0
     ) -> Tuple[int, str, str]:
@@ -66,10 +71,23 @@ class LocalFileOperator(FileOperator):
         """Check if path exists."""
         return Path(path).exists()
 
+    async def fingerprint(self, path: PathLike) -> Optional[str]:
+        """Size and modification time of a file, or a directory and its subdirs."""
+        path = Path(path)
+        if not path.exists():
+            return None
+        # A directory view lists two levels, so a change in a subdirectory counts
+        paths = [path]
+        if path.is_dir():
+            paths += sorted(p for p in path.iterdir() if p.is_dir())
+        stats = [(p, p.stat()) for p in paths]
+        return ";".join(f"{p}:{s.st_size}:{s.st_mtime_ns}" for p, s in stats)
+
     async def run_command(
         self, cmd: str, timeout: Optional[float] = 120.0
     ) -> Tuple[int, str, str]:
         """Run a shell command locally."""
+        timeout = budget_timeout(timeout)
         process = await asyncio.create_subprocess_shell(
             cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
         )
@@ -96,8 +114,10 @@ class LocalFileOperator(FileOperator):
 class SandboxFileOperator(FileOperator):
     """File operations implementation for sandbox environment."""
 
-    def __init__(self):
-        self.sandbox_client = SANDBOX_CLIENT
+    @property
+    def sandbox_client(self):
+        """Sandbox of the running task, see `sandbox_session`"""
+        return current_sandbox_client()
 
     async def _ensure_sandbox_initialized(self):
         """Ensure sandbox is initialized."""
@@ -136,6 +156,10 @@ class SandboxFileOperator(FileOperator):
         )
         return result.strip() == "true"
 
+    async def fingerprint(self, path: PathLike) -> Optional[str]:
+        """Not tracked: checking the sandbox costs as much as viewing the path."""
+        return None
+
     async def run_command(
         self, cmd: str, timeout: Optional[float] = 120.0
     ) -> Tuple[int, str, str]:
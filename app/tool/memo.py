@@ -0,0 +1,58 @@
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from app.config import ToolMemoSettings, config
+
+
+class ToolMemo:
+    """
+    LRU map of the results of idempotent tool calls.
+
+    A result is keyed by the tool, its arguments and the fingerprint of the
+    state it depends on (see BaseTool.memo_fingerprint), so a changed file or
+    page makes a new key rather than a stale hit. Results expire after the
+    configured TTL.
+    """
+
+    def __init__(self, settings: Optional[ToolMemoSettings] = None):
+        self.settings = settings or config.tool_memo or ToolMemoSettings()
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(
+        name: str, tool_input: Optional[Dict[str, Any]], fingerprint: str
+    ) -> str:
+        """Key of a call; arguments left at None do not count"""
+        args = {k: v for k, v in (tool_input or {}).items() if v is not None}
+        payload = json.dumps(
+            [name, args, fingerprint], sort_keys=True, default=str, ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _is_expired(self, created_at: float) -> bool:
+        return self.settings.ttl > 0 and time.monotonic() - created_at > self.settings.ttl
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the result saved under `key`, None if there is none or it expired"""
+        entry = self._entries.get(key)
+        if entry is not None and self._is_expired(entry[0]):
+            del self._entries[key]
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key: str, result: Any) -> None:
+        """Save a result, evicting the least recently used beyond max_entries"""
+        self._entries[key] = (time.monotonic(), result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.settings.max_entries:
+            self._entries.popitem(last=False)
@@ -69,6 +69,17 @@ class PlanningTool(BaseTool):
     plans: dict = {}  # Dictionary to store plans by plan_id
     _current_plan_id: Optional[str] = None  # Track the current active plan
 
+    async def save_state(self) -> Optional[dict]:
+        """The plans and which one is active"""
+        if not self.plans:
+            return None
+        return {"plans": self.plans, "current_plan_id": self._current_plan_id}
+
+    async def restore_state(self, state: dict) -> None:
+        """Restore the plans saved by `save_state`"""
+        self.plans = state.get("plans", {})
+        self._current_plan_id = state.get("current_plan_id")
+
     async def execute(
         self,
         *,
@@ -1,8 +1,10 @@
+import asyncio
 import multiprocessing
 import sys
 from io import StringIO
 from typing import Dict
 
+from app.budget import budget_timeout
 from app.tool.base import BaseTool
 
 
@@ -21,6 +23,8 @@ class PythonExecute(BaseTool):
         },
         "required": ["code"],
     }
+    # Every call runs in its own process
+    parallel_safe: bool = True
 
     def _run_code(self, code: str, result_dict: dict, safe_globals: dict) -> None:
         original_stdout = sys.stdout
@@ -51,7 +55,12 @@ class PythonExecute(BaseTool):
         Returns:
             Dict: Contains 'output' with execution output or error message and 'success' status.
         """
+        # The process cannot be cancelled, so it must end by the run's deadline
+        timeout = budget_timeout(timeout)
+        # Waiting on the process blocks, keep it off the event loop
+        return await asyncio.to_thread(self._execute, code, timeout)
 
+    def _execute(self, code: str, timeout: int) -> Dict:
         with multiprocessing.Manager() as manager:
             result = manager.dict({"observation": "", "success": False})
             if isinstance(__builtins__, dict):
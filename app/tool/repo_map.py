@@ -1,5 +1,6 @@
+import asyncio
+import hashlib
 import os
-from datetime import datetime
 from pathlib import Path
 from typing import Dict, List, Optional, Set
 
@@ -8,6 +9,10 @@ from pydantic import BaseModel, Field
 from app.tool.base import BaseTool
 
 
+DEFAULT_INCLUDE_PATTERNS = ["*.py", "*.js", "*.ts", "*.html", "*.css", "*.md"]
+DEFAULT_EXCLUDE_PATTERNS = ["**/node_modules/**", "**/__pycache__/**", "**/.git/**"]
+
+
 class RepoMapTool(BaseTool):
     """Tool for generating and managing repository maps"""
     
@@ -43,9 +48,37 @@ class RepoMapTool(BaseTool):
         "required": ["root_path"]
     }
     
-    # Cache for repository maps
-    _repo_maps: Dict[str, Dict] = {}
-    
+    async def memo_fingerprint(
+        self,
+        root_path: str,
+        max_files: int = 100,
+        include_patterns: Optional[List[str]] = None,
+        exclude_patterns: Optional[List[str]] = None,
+        force_refresh: bool = False,
+        **kwargs,
+    ) -> Optional[str]:
+        """The map is reused until a mapped file changes, unless force_refresh"""
+        if force_refresh:
+            return None
+        return await asyncio.to_thread(
+            self._files_fingerprint,
+            os.path.abspath(root_path),
+            include_patterns or DEFAULT_INCLUDE_PATTERNS,
+            exclude_patterns or DEFAULT_EXCLUDE_PATTERNS,
+        )
+
+    def _files_fingerprint(
+        self, root_path: str, include_patterns: List[str], exclude_patterns: List[str]
+    ) -> str:
+        """Hash of the path, size and modification time of every matching file"""
+        digest = hashlib.sha256()
+        for file_path in sorted(
+            self._get_matching_files(root_path, include_patterns, exclude_patterns)
+        ):
+            stat = os.stat(file_path)
+            digest.update(f"{file_path}:{stat.st_size}:{stat.st_mtime_ns}\n".encode())
+        return digest.hexdigest()
+
     async def execute(
         self, 
         root_path: str, 
@@ -59,28 +92,14 @@ class RepoMapTool(BaseTool):
             # Normalize path
             root_path = os.path.abspath(root_path)
             
-            # Check if we have a cached map
-            cache_key = f"{root_path}:{max_files}:{include_patterns}:{exclude_patterns}"
-            if not force_refresh and cache_key in self._repo_maps:
-                cached_map = self._repo_maps[cache_key]
-                if (datetime.now() - cached_map["timestamp"]).total_seconds() < 300:  # 5 minutes
-                    return cached_map["content"]
-            
-            # Generate the map
-            repo_map = await self._generate_map(
+            # Generate the map; ToolCollection reuses it while no mapped file
+            # changes, see memo_fingerprint
+            return await self._generate_map(
                 root_path, 
                 max_files,
-                include_patterns or ["*.py", "*.js", "*.ts", "*.html", "*.css", "*.md"],
-                exclude_patterns or ["**/node_modules/**", "**/__pycache__/**", "**/.git/**"]
+                include_patterns or DEFAULT_INCLUDE_PATTERNS,
+                exclude_patterns or DEFAULT_EXCLUDE_PATTERNS,
             )
-            
-            # Cache the map
-            self._repo_maps[cache_key] = {
-                "content": repo_map,
-                "timestamp": datetime.now()
-            }
-            
-            return repo_map
         except Exception as e:
             return f"Error generating repository map: {str(e)}"
     
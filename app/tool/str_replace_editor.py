@@ -111,6 +111,14 @@ class StrReplaceEditor(BaseTool):
             else self._local_operator
         )
 
+    async def memo_fingerprint(
+        self, command: str = "", path: str = "", **kwargs
+    ) -> Optional[str]:
+        """A view is reused until the file or directory changes"""
+        if command != "view":
+            return None
+        return await self._get_operator().fingerprint(path)
+
     async def execute(
         self,
         *,
@@ -1,22 +1,48 @@
 """Collection classes for managing multiple tools."""
-from typing import Any, Dict, List
+import asyncio
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional
 
-from app.exceptions import ToolError
+from app.budget import current_budget
+from app.exceptions import BudgetExceeded, ToolError
+from app.llm.cost import call_site
+from app.logger import logger
+from app.schema import ToolParams
 from app.tool.base import BaseTool, ToolFailure, ToolResult
+from app.tool.memo import ToolMemo
+from app.tracing import payload_size, span
 
 
 class ToolCollection:
-    """A collection of defined tools."""
+    """
+    A collection of defined tools.
+
+    The function schemas sent to the LLM are built and serialized once and
+    reused, read-only, until a tool is added, so every request carries the
+    same tools block and provider prompt caches can match it. `version`
+    counts those changes.
+
+    Results of idempotent calls are kept in `memo` and reused for repeated
+    calls while the state they depend on is unchanged.
+    """
 
     def __init__(self, *tools: BaseTool):
         self.tools = tools
         self.tool_map = {tool.name: tool for tool in tools}
+        self.version = 0
+        self._params: Optional[ToolParams] = None
+        self.memo = ToolMemo()
+        self._tool_slots: Dict[str, asyncio.Semaphore] = {}
+        self._resource_locks: Dict[str, asyncio.Lock] = {}
 
     def __iter__(self):
         return iter(self.tools)
 
-    def to_params(self) -> List[Dict[str, Any]]:
-        return [tool.to_param() for tool in self.tools]
+    def to_params(self) -> ToolParams:
+        """Read-only function schemas of the tools, built once per version"""
+        if self._params is None:
+            self._params = ToolParams([tool.to_param() for tool in self.tools])
+        return self._params
 
     async def execute(
         self, *, name: str, tool_input: Dict[str, Any] = None
@@ -24,11 +50,71 @@ class ToolCollection:
         tool = self.tool_map.get(name)
         if not tool:
             return ToolFailure(error=f"Tool {name} is invalid")
-        try:
-            result = await tool(**tool_input)
+        memo_key = await self._memo_key(tool, tool_input)
+        if memo_key is not None:
+            result = self.memo.get(memo_key)
+            if result is not None:
+                with span(name, "tool", memoized=True):
+                    return result
+        with span(name, "tool", input_size=payload_size(tool_input)) as tool_span:
+            try:
+                async with self._concurrency_limits(tool):
+                    if tool_span:
+                        # Time spent waiting for a concurrency slot
+                        tool_span.set(queued_ms=round(tool_span.wall * 1000, 3))
+                    with call_site(name):
+                        result = await self._execute_within_budget(tool, tool_input)
+            except ToolError as e:
+                result = ToolFailure(error=e.message)
+            except BudgetExceeded as e:
+                result = ToolFailure(error=f"Run budget exhausted: {e}")
+            tool_span.set(output_size=payload_size(getattr(result, "output", result)))
+            # Empty results and failures may be transient, so they are not reused
+            if memo_key is not None and result and not getattr(result, "error", None):
+                self.memo.put(memo_key, result)
             return result
-        except ToolError as e:
-            return ToolFailure(error=e.message)
+
+    async def _memo_key(
+        self, tool: BaseTool, tool_input: Optional[Dict[str, Any]]
+    ) -> Optional[str]:
+        """Memo key of a call, None if its result is not to be reused"""
+        if not self.memo.settings.enabled:
+            return None
+        try:
+            fingerprint = await tool.memo_fingerprint(**(tool_input or {}))
+        except Exception as e:
+            logger.warning(f"Could not fingerprint a call of tool '{tool.name}': {e}")
+            return None
+        if fingerprint is None:
+            return None
+        return self.memo.make_key(tool.name, tool_input, fingerprint)
+
+    @staticmethod
+    async def _execute_within_budget(
+        tool: BaseTool, tool_input: Dict[str, Any]
+    ) -> ToolResult:
+        """Run a tool until the run's deadline at most, charging its time to the run"""
+        budget = current_budget()
+        if budget is None:
+            return await tool(**tool_input)
+        async with budget.enforce(tool_time=True):
+            return await tool(**tool_input)
+
+    @asynccontextmanager
+    async def _concurrency_limits(self, tool: BaseTool) -> AsyncIterator[None]:
+        """Hold a concurrency slot of the tool and its exclusive resource, if any"""
+        async with AsyncExitStack() as stack:
+            if tool.max_concurrency:
+                slots = self._tool_slots.setdefault(
+                    tool.name, asyncio.Semaphore(tool.max_concurrency)
+                )
+                await stack.enter_async_context(slots)
+            if tool.exclusive_resource:
+                lock = self._resource_locks.setdefault(
+                    tool.exclusive_resource, asyncio.Lock()
+                )
+                await stack.enter_async_context(lock)
+            yield
 
     async def execute_all(self) -> List[ToolResult]:
         """Execute all tools in the collection sequentially."""
@@ -45,8 +131,13 @@ class ToolCollection:
         return self.tool_map.get(name)
 
     def add_tool(self, tool: BaseTool):
+        if tool.name in self.tool_map:
+            # Replace the tool of the same name rather than listing it twice
+            self.tools = tuple(t for t in self.tools if t.name != tool.name)
         self.tools += (tool,)
         self.tool_map[tool.name] = tool
+        self.version += 1
+        self._params = None
         return self
 
     def add_tools(self, *tools: BaseTool):
@@ -1,5 +1,5 @@
 import asyncio
-from typing import List
+from typing import List, Optional
 
 from tenacity import retry, stop_after_attempt, wait_exponential
 
@@ -34,6 +34,8 @@ class WebSearch(BaseTool):
         },
         "required": ["query"],
     }
+    parallel_safe: bool = True
+    max_concurrency: Optional[int] = 4
     _search_engine: dict[str, WebSearchEngine] = {
         "google": GoogleSearchEngine(),
         "baidu": BaiduSearchEngine(),
@@ -41,6 +43,11 @@ class WebSearch(BaseTool):
         "bing": BingSearchEngine(),
     }
 
+    async def memo_fingerprint(self, **kwargs) -> Optional[str]:
+        """Repeated searches reuse their results only if [tool_memo] web_search is set"""
+        settings = config.tool_memo
+        return "" if settings and settings.web_search else None
+
     async def execute(self, query: str, num_results: int = 10) -> List[str]:
         """
         Execute a Web search and return a list of URLs.
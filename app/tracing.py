@@ -0,0 +1,187 @@
+import asyncio
+import json
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+
+class Span:
+    """
+    A timed section of a run: an agent step, a tool call, an LLM request.
+
+    Records wall time and the share of it spent awaiting rather than running
+    Python code on this thread. Await time is wall time minus the thread's CPU
+    time, so code of other tasks that ran in the meantime counts as CPU time;
+    for spans that mostly wait on I/O it is a lower bound.
+    """
+
+    __slots__ = ("name", "category", "args", "track", "start", "end", "_cpu_start", "cpu")
+
+    def __init__(self, name: str, category: str, track: int, args: Dict[str, Any]):
+        self.name = name
+        self.category = category
+        self.args = args
+        self.track = track
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+        self._cpu_start = time.thread_time()
+        self.cpu = 0.0
+
+    def set(self, **args: Any) -> None:
+        """Attach details, e.g. token counts or payload sizes"""
+        self.args.update(args)
+
+    def finish(self, **args: Any) -> None:
+        """End the span; later calls are ignored"""
+        if self.end is not None:
+            return
+        self.end = time.perf_counter()
+        self.cpu = time.thread_time() - self._cpu_start
+        self.args.update(args)
+
+    @property
+    def wall(self) -> float:
+        return (self.end or time.perf_counter()) - self.start
+
+    @property
+    def awaited(self) -> float:
+        return max(self.wall - self.cpu, 0.0)
+
+
+class _NullSpan:
+    """Stands in for a span while nothing is traced; every call is a no-op"""
+
+    def set(self, **args: Any) -> None:
+        pass
+
+    def finish(self, **args: Any) -> None:
+        pass
+
+    def __bool__(self) -> bool:
+        return False
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Tracer:
+    """
+    Collects the spans of a run for export as a Chrome trace.
+
+    Each asyncio task gets its own track, so tool calls running concurrently
+    show up side by side. Load the saved file in chrome://tracing or
+    https://ui.perfetto.dev.
+    """
+
+    def __init__(self):
+        self.spans: List[Span] = []
+        self._origin = time.perf_counter()
+        self._tracks: Dict[int, int] = {}
+        self._track_names: Dict[int, str] = {}
+
+    def _track(self) -> int:
+        """Track of the running asyncio task, the main thread outside of one"""
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            task = None
+        key = id(task)
+        track = self._tracks.get(key)
+        if track is None:
+            track = self._tracks[key] = len(self._tracks) + 1
+            self._track_names[track] = task.get_name() if task else "main"
+        return track
+
+    def begin(self, name: str, category: str = "", **args: Any) -> Span:
+        """Start a span; it is exported once `finish` is called on it"""
+        span = Span(name, category, self._track(), args)
+        self.spans.append(span)
+        return span
+
+    def to_chrome_trace(self) -> dict:
+        """The finished spans in Chrome's trace event format"""
+        pid = os.getpid()
+        events: List[dict] = [
+            {"name": "thread_name", "ph": "M", "pid": pid, "tid": track, "args": {"name": name}}
+            for track, name in self._track_names.items()
+        ]
+        for span in self.spans:
+            if span.end is None:
+                continue
+            events.append(
+                {
+                    "name": span.name,
+                    "cat": span.category,
+                    "ph": "X",
+                    "ts": round((span.start - self._origin) * 1e6),
+                    "dur": round(span.wall * 1e6),
+                    "pid": pid,
+                    "tid": span.track,
+                    "args": {
+                        **span.args,
+                        "await_ms": round(span.awaited * 1000, 3),
+                    },
+                }
+            )
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def save(self, path: Union[str, Path]) -> None:
+        """Write the trace as JSON"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.to_chrome_trace(), default=str), encoding="utf-8")
+
+
+# The tracer spans are recorded to; nothing is recorded unless an entry point sets one
+_tracer: ContextVar[Optional[Tracer]] = ContextVar("tracer", default=None)
+
+
+def current_tracer() -> Optional[Tracer]:
+    """Return the tracer spans are currently recorded to."""
+    return _tracer.get()
+
+
+@contextmanager
+def tracing(tracer: Optional[Tracer]) -> Iterator[None]:
+    """Record the spans of the code run inside the block to `tracer`."""
+    token = _tracer.set(tracer)
+    try:
+        yield
+    finally:
+        _tracer.reset(token)
+
+
+def begin_span(name: str, category: str = "", **args: Any) -> Union[Span, _NullSpan]:
+    """Start a span that ends with its `finish` call, for spans that end elsewhere."""
+    tracer = _tracer.get()
+    if tracer is None:
+        return NULL_SPAN
+    return tracer.begin(name, category, **args)
+
+
+@contextmanager
+def span(name: str, category: str = "", **args: Any) -> Iterator[Union[Span, _NullSpan]]:
+    """Record the block as a span; details can be added with `set` on the result."""
+    current = begin_span(name, category, **args)
+    try:
+        yield current
+    except BaseException as e:
+        current.set(error=type(e).__name__)
+        raise
+    finally:
+        current.finish()
+
+
+def payload_size(value: Any) -> int:
+    """Size in characters of a payload as it would be sent or logged"""
+    if value is None:
+        return 0
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    try:
+        return len(json.dumps(value, default=str))
+    except (TypeError, ValueError):
+        return len(str(value))
@@ -2,14 +2,27 @@ import asyncio
 import argparse
 
 from app.agent.manus import Manus
+from app.budget import RunBudget
+from app.config import config
+from app.llm.events import ConsoleTokenSink, token_sink
+from app.llm.tokens import prewarm_tokenizers
 from app.logger import logger
+from app.tracing import Tracer, tracing
 
 
 async def main():
     """Main entry point for the OpenManus CLI."""
+    # Load tokenizers while the agent and its tools start up
+    prewarm_tokenizers()
+
     # Parse command-line arguments
     parser = argparse.ArgumentParser(description="OpenManus CLI")
     parser.add_argument("--prompt", "-p", type=str, help="Input prompt to process")
+    parser.add_argument(
+        "--trace",
+        type=str,
+        help="Save a Chrome trace of the run to this file (open in ui.perfetto.dev)",
+    )
     args = parser.parse_args()
     
     # Create the agent
@@ -28,7 +41,14 @@ async def main():
 
         # Process the request
         logger.warning("Processing your request...")
-        await agent.run(prompt)
+        tracer = Tracer() if args.trace else None
+        try:
+            with token_sink(ConsoleTokenSink()), tracing(tracer):
+                await agent.run(prompt, budget=RunBudget.from_settings(config.budget))
+        finally:
+            if tracer is not None:
+                tracer.save(args.trace)
+                logger.info(f"Trace saved to {args.trace}")
         logger.info("Request processing completed.")
     except KeyboardInterrupt:
         logger.warning("Operation interrupted.")
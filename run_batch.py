@@ -0,0 +1,51 @@
+import argparse
+import asyncio
+import time
+
+from app.llm.tokens import prewarm_tokenizers
+from app.logger import logger
+from app.runner import AgentRunner, read_tasks
+
+
+async def run_batch(input_path: str, output_path: str, concurrency=None):
+    # Load tokenizers while the first agents and their tools start up
+    prewarm_tokenizers()
+
+    runner = AgentRunner(max_concurrency=concurrency)
+    logger.info(f"Running tasks from {input_path}, {runner.max_concurrency} at a time")
+
+    start_time = time.time()
+    completed = failed = 0
+    with open(output_path, "a", encoding="utf-8") as output:
+        async for result in runner.run(read_tasks(input_path)):
+            # Results are written as they finish, so a crash keeps the finished ones
+            output.write(result.model_dump_json() + "\n")
+            output.flush()
+            if result.status == "completed":
+                completed += 1
+            else:
+                failed += 1
+            logger.info(f"Task {result.id} {result.status} in {result.elapsed:.1f}s")
+
+    elapsed_time = time.time() - start_time
+    logger.info(
+        f"{completed} tasks completed, {failed} failed in {elapsed_time:.2f} seconds"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a JSONL file of prompts")
+    parser.add_argument(
+        "input", help='JSONL file of tasks: {"id", "prompt", "agent"} or a prompt string'
+    )
+    parser.add_argument(
+        "--output", "-o", default="results.jsonl", help="JSONL file results are appended to"
+    )
+    parser.add_argument(
+        "--concurrency", "-c", type=int, help="Tasks running at the same time ([runner] max_concurrency)"
+    )
+    args = parser.parse_args()
+    try:
+        asyncio.run(run_batch(args.input, args.output, args.concurrency))
+    except KeyboardInterrupt:
+        logger.warning("Batch interrupted.")
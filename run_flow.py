@@ -4,14 +4,21 @@ import time
 
 from app.agent.manus import Manus
 from app.agent.swe import SWEAgent
+from app.budget import RunBudget
+from app.config import config
 from app.flow.base import FlowType
 from app.flow.flow_factory import FlowFactory
+from app.llm.events import ConsoleTokenSink, token_sink
+from app.llm.tokens import prewarm_tokenizers
 from app.logger import logger
+from app.tracing import Tracer, tracing
 
 
 
-async def run_flow():
-    
+async def run_flow(checkpoint_dir=None, resume=False, trace=None):
+    # Load tokenizers while the agents and their tools start up
+    prewarm_tokenizers()
+
     # Create and initialize all available agents
     manus_agent = await Manus.create()
     swe_agent = await SWEAgent().create()
@@ -28,32 +35,41 @@ async def run_flow():
     agents = all_agents
 
     try:
-        prompt = input("Enter your prompt: ")
+        prompt = "" if resume else input("Enter your prompt: ")
 
-        if prompt.strip().isspace() or not prompt:
+        if not resume and (prompt.strip().isspace() or not prompt):
             logger.warning("Empty prompt provided.")
             return
 
         flow = FlowFactory.create_flow(
             flow_type=FlowType.PLANNING,
             agents=agents,
+            checkpoint_dir=checkpoint_dir,
         )
         logger.warning("Processing your request...")
 
+        start_time = time.time()
+        # Deadline and limits of the whole execution, see [budget] in the config
+        budget = RunBudget.from_settings(config.budget)
+        tracer = Tracer() if trace else None
         try:
-            start_time = time.time()
-            result = await asyncio.wait_for(
-                flow.execute(prompt),
-                timeout=3600,  # 60 minute timeout for the entire execution
-            )
-            elapsed_time = time.time() - start_time
-            logger.info(f"Request processed in {elapsed_time:.2f} seconds")
-            logger.info(result)
-        except asyncio.TimeoutError:
-            logger.error("Request processing timed out after 1 hour")
-            logger.info(
-                "Operation terminated due to timeout. Please try a simpler request."
-            )
+            with token_sink(ConsoleTokenSink()), tracing(tracer):
+                if resume:
+                    result = await flow.resume(budget=budget)
+                else:
+                    result = await flow.execute(prompt, budget=budget)
+        finally:
+            if tracer is not None:
+                tracer.save(trace)
+                logger.info(f"Trace saved to {trace}")
+        elapsed_time = time.time() - start_time
+        logger.info(f"Request processed in {elapsed_time:.2f} seconds")
+        logger.info(result)
+        reason = budget.exceeded()
+        if reason:
+            logger.error(f"Request stopped early: run budget exhausted ({reason})")
+            if checkpoint_dir:
+                logger.info("Continue it with --resume to run the remaining steps")
 
     except KeyboardInterrupt:
         logger.info("Operation cancelled by user.")
@@ -62,8 +78,25 @@ async def run_flow():
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a planning flow")
+    parser.add_argument(
+        "--checkpoint-dir",
+        help="Directory to save progress to after every step",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue the interrupted run saved in --checkpoint-dir",
+    )
+    parser.add_argument(
+        "--trace",
+        help="Save a Chrome trace of the run to this file (open in ui.perfetto.dev)",
+    )
+    args = parser.parse_args()
+    if args.resume and not args.checkpoint_dir:
+        parser.error("--resume requires --checkpoint-dir")
     try:
-        asyncio.run(run_flow())
+        asyncio.run(run_flow(args.checkpoint_dir, args.resume, args.trace))
     except RuntimeError as e:
         # Ignore known MCP SDK errors during shutdown
         if any(err_text in str(e) for err_text in [
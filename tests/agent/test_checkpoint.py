@@ -0,0 +1,122 @@
+"""Tests for agent checkpoints and resuming from them."""
+import asyncio
+import os
+import tempfile
+import unittest
+
+from app.agent.base import BaseAgent
+from app.agent.checkpoint import Checkpoint
+from app.schema import AgentState, Message
+from app.tool import Bash, PlanningTool
+
+
+def async_test(coro):
+    """Decorator for async test methods."""
+    def wrapper(*args, **kwargs):
+        loop = asyncio.get_event_loop()
+        return loop.run_until_complete(coro(*args, **kwargs))
+    return wrapper
+
+
+class CountingAgent(BaseAgent):
+    """Agent that records its steps and can crash at a given step."""
+
+    name: str = "counting"
+    max_steps: int = 5
+    crash_at: int = 0
+    steps_run: int = 0
+
+    async def step(self) -> str:
+        if self.current_step == self.crash_at:
+            raise RuntimeError("process killed")
+        self.steps_run += 1
+        self.memory.add_message(Message.assistant_message(f"did step {self.current_step}"))
+        return f"done {self.current_step}"
+
+
+class TestAgentCheckpoint(unittest.TestCase):
+    """Test saving an agent after each step and resuming it."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "agent.json")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    @async_test
+    async def test_resume_continues_after_the_last_completed_step(self):
+        """Steps completed before a crash are not run again."""
+        agent = CountingAgent(checkpoint_path=self.path, crash_at=3)
+        with self.assertRaises(RuntimeError):
+            await agent.run("count")
+
+        checkpoint = Checkpoint.load(self.path)
+        self.assertEqual(checkpoint.current_step, 2)
+        self.assertEqual(
+            [msg.content for msg in checkpoint.messages],
+            ["count", "did step 1", "did step 2"],
+        )
+
+        resumed = CountingAgent()
+        result = await resumed.resume(self.path)
+        self.assertEqual(resumed.steps_run, 3)
+        self.assertIn("Step 3: done 3", result)
+        self.assertNotIn("Step 2", result)
+        self.assertEqual(resumed.memory.messages[0].content, "count")
+        self.assertEqual(len(resumed.memory.messages), 6)
+
+    @async_test
+    async def test_finished_checkpoint_does_not_run(self):
+        """Resuming a finished run returns without running steps."""
+        agent = CountingAgent()
+        checkpoint = Checkpoint(
+            agent="counting", current_step=4, state=AgentState.FINISHED
+        )
+        result = await agent.resume(checkpoint)
+        self.assertEqual(agent.steps_run, 0)
+        self.assertIn("step 4", result)
+
+    @async_test
+    async def test_checkpoint_of_another_agent_is_rejected(self):
+        """A checkpoint only restores the agent it was taken of."""
+        checkpoint = Checkpoint(agent="other", current_step=1, state=AgentState.RUNNING)
+        with self.assertRaises(ValueError):
+            await CountingAgent().resume(checkpoint)
+
+
+class TestToolState(unittest.TestCase):
+    """Test saving and restoring the state tools keep between calls."""
+
+    @async_test
+    async def test_bash_keeps_its_working_directory(self):
+        """A restored shell starts in the saved working directory."""
+        with tempfile.TemporaryDirectory() as tmp:
+            cwd = os.path.realpath(tmp)
+            bash = Bash()
+            await bash.execute(f"cd {cwd}")
+            state = await bash.save_state()
+            bash._session.stop()
+            self.assertEqual(state, {"cwd": cwd})
+
+            restored = Bash()
+            await restored.restore_state(state)
+            result = await restored.execute("pwd")
+            restored._session.stop()
+            self.assertEqual(result.output, cwd)
+
+    @async_test
+    async def test_planning_tool_keeps_its_plans(self):
+        """Plans and the active plan survive a restore."""
+        tool = PlanningTool()
+        await tool.execute(command="create", plan_id="p", title="Plan", steps=["a", "b"])
+        await tool.execute(command="mark_step", plan_id="p", step_index=0, step_status="completed")
+
+        restored = PlanningTool()
+        await restored.restore_state(await tool.save_state())
+        self.assertEqual(restored.plans["p"]["step_statuses"], ["completed", "not_started"])
+        self.assertEqual(restored._current_plan_id, "p")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+"""Tests for token-aware memory compaction."""
+import asyncio
+import unittest
+from unittest.mock import AsyncMock, patch
+
+import litellm
+
+from app.agent.compaction import SUMMARY_PREFIX, compact_memory, split_for_compaction
+from app.agent.toolcall import ToolCallAgent
+from app.llm.inference import LLM
+from app.schema import Function, Memory, Message, Role, ToolCall
+
+
+def async_test(coro):
+    """Decorator for async test methods."""
+    def wrapper(*args, **kwargs):
+        loop = asyncio.get_event_loop()
+        return loop.run_until_complete(coro(*args, **kwargs))
+    return wrapper
+
+
+def tool_turn(index: int, image: str = None):
+    """An assistant tool call and its result."""
+    call = ToolCall(
+        id=f"call_{index}",
+        function=Function(name="python_execute", arguments='{"code": "print(1)"}'),
+    )
+    return [
+        Message.from_tool_calls(tool_calls=[call], content=f"step {index}"),
+        Message.tool_message(
+            content=f"output {index} " + "x" * 400,
+            name="python_execute",
+            tool_call_id=call.id,
+            base64_image=image,
+        ),
+    ]
+
+
+def long_run(turns: int, image_at: int = None):
+    """A system prompt, a task and `turns` tool turns."""
+    messages = [Message.system_message("system"), Message.user_message("the task")]
+    for index in range(turns):
+        messages += tool_turn(index, "shot" if index == image_at else None)
+    return messages
+
+
+class TestSplit(unittest.TestCase):
+    """Test choosing what to fold."""
+
+    def test_task_is_kept_and_tool_pairs_stay_together(self):
+        """The task stays in the head and recent never starts with a tool result."""
+        messages = long_run(10)
+        keep = messages[-1].token_count + 1
+        head, folded, recent = split_for_compaction(messages, keep_tokens=keep)
+
+        self.assertEqual([msg.content for msg in head], ["system", "the task"])
+        self.assertEqual(recent[0].role, Role.ASSISTANT)
+        self.assertEqual(recent[1].tool_call_id, recent[0].tool_calls[0].id)
+        self.assertEqual(head + folded + recent, messages)
+
+    def test_short_history_is_not_folded(self):
+        """Nothing is folded when too few messages are old."""
+        self.assertIsNone(split_for_compaction(long_run(1), keep_tokens=1))
+
+
+class TestCompactMemory(unittest.TestCase):
+    """Test folding memory into a summary."""
+
+    @async_test
+    async def test_extractive_summary_keeps_latest_screenshot(self):
+        """Without an LLM an extract is used and the last screenshot survives."""
+        memory = Memory(messages=long_run(10, image_at=2))
+        before = memory.token_count
+
+        self.assertTrue(await compact_memory(memory, keep_tokens=300))
+
+        summary = memory.messages[2]
+        self.assertTrue(summary.content.startswith(SUMMARY_PREFIX))
+        self.assertIn("python_execute", summary.content)
+        self.assertEqual(memory.messages[3].base64_image, "shot")
+        self.assertLess(memory.token_count, before)
+
+    @async_test
+    async def test_llm_summary_with_fallback(self):
+        """The model summary is used, and an extract when the call fails."""
+        llm = LLM()
+        with patch.object(llm, "ask", new=AsyncMock(return_value="did 10 steps")):
+            memory = Memory(messages=long_run(10))
+            await compact_memory(memory, keep_tokens=300, llm=llm)
+        self.assertEqual(memory.messages[2].content, SUMMARY_PREFIX + "did 10 steps")
+
+        with patch.object(llm, "ask", new=AsyncMock(side_effect=RuntimeError("down"))):
+            memory = Memory(messages=long_run(10))
+            await compact_memory(memory, keep_tokens=300, llm=llm)
+        self.assertIn("[tool python_execute]", memory.messages[2].content)
+
+
+class TestAgentCompaction(unittest.TestCase):
+    """Test compaction before an agent step."""
+
+    @async_test
+    async def test_think_compacts_a_large_prompt(self):
+        """A prompt past the threshold is compacted before the request."""
+        agent = ToolCallAgent(compaction_threshold=1000, compaction_keep_tokens=300)
+        agent.memory = Memory(messages=long_run(10)[1:])
+        response = litellm.Message(role="assistant", content="done")
+
+        with patch.object(agent.llm, "ask", new=AsyncMock(return_value="summary")), patch.object(
+            agent.llm, "ask_tool", new=AsyncMock(return_value=response)
+        ) as ask_tool:
+            await agent.think()
+
+        sent = ask_tool.await_args.kwargs["messages"]
+        self.assertEqual(sent[1].content, SUMMARY_PREFIX + "summary")
+        self.assertLess(sum(msg.token_count for msg in sent), 1000)
+
+
+if __name__ == "__main__":
+    unittest.main()
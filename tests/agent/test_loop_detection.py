@@ -0,0 +1,116 @@
+"""Tests for stuck-loop detection."""
+import asyncio
+import unittest
+from typing import List
+from unittest.mock import AsyncMock
+
+from app.agent.base import BaseAgent
+from app.agent.loop_detection import LoopDetector
+from app.schema import Function, Message, ToolCall
+
+
+def async_test(coro):
+    """Decorator for async test methods."""
+    def wrapper(*args, **kwargs):
+        loop = asyncio.get_event_loop()
+        return loop.run_until_complete(coro(*args, **kwargs))
+    return wrapper
+
+
+def tool_response(name: str, arguments: str, content: str = "") -> Message:
+    """An assistant message with one tool call."""
+    call = ToolCall(id="call", function=Function(name=name, arguments=arguments))
+    return Message.from_tool_calls(tool_calls=[call], content=content)
+
+
+class ScriptedAgent(BaseAgent):
+    """Agent whose steps add scripted responses."""
+
+    name: str = "scripted"
+    responses: List[Message] = []
+
+    async def step(self) -> str:
+        response = self.responses[(self.current_step - 1) % len(self.responses)]
+        self.memory.add_message(response.model_copy())
+        self.memory.add_message(Message.tool_message("ok", name="tool", tool_call_id="call"))
+        return response.content or "called a tool"
+
+
+class TestLoopDetector(unittest.TestCase):
+    """Test the rolling response index."""
+
+    def test_exact_repeats_with_reordered_arguments(self):
+        """Tool calls with the same arguments in another order are duplicates."""
+        detector = LoopDetector(window=10, threshold=2)
+        self.assertIsNone(detector.observe(tool_response("search", '{"q": "a", "n": 5}')))
+        self.assertIsNone(detector.observe(tool_response("search", '{"n": 5, "q": "a"}')))
+        loop = detector.observe(tool_response("search", '{"q":"a","n":5}'))
+        self.assertEqual((loop.kind, loop.repeats), ("exact", 2))
+
+    def test_near_repeats_differ_only_in_numbers(self):
+        """Responses whose text only differs in numbers are near duplicates."""
+        detector = LoopDetector(window=10, threshold=2)
+        for seconds in (3, 4):
+            detector.observe(Message.assistant_message(f"Waiting {seconds}s for the page"))
+        loop = detector.observe(Message.assistant_message("waiting 5s  for the page"))
+        self.assertEqual(loop.kind, "near")
+        self.assertIsNone(detector.observe(tool_response("search", '{"q": "other"}')))
+
+    def test_progress_through_numeric_arguments_is_not_a_loop(self):
+        """Paging through a file or marking successive steps is not stuck."""
+        detector = LoopDetector(window=10, threshold=2)
+        for start in (1, 51, 101, 151):
+            response = tool_response(
+                "str_replace_editor",
+                f'{{"command": "view", "path": "a.py", "view_range": [{start}, {start + 49}]}}',
+            )
+            self.assertIsNone(detector.observe(response))
+        for index in range(4):
+            response = tool_response(
+                "planning",
+                f'{{"command": "mark_step", "step_index": {index}, "step_status": "completed"}}',
+            )
+            self.assertIsNone(detector.observe(response))
+
+    def test_old_responses_leave_the_window(self):
+        """Repeats older than the window do not count."""
+        detector = LoopDetector(window=2, threshold=1)
+        detector.observe(Message.assistant_message("same"))
+        detector.observe(Message.assistant_message("one"))
+        detector.observe(Message.assistant_message("two"))
+        self.assertIsNone(detector.observe(Message.assistant_message("same")))
+
+
+class TestAgentStuck(unittest.TestCase):
+    """Test stuck detection in the agent loop."""
+
+    @async_test
+    async def test_on_stuck_ends_the_run_early(self):
+        """A callback returning True stops the run before max_steps."""
+        on_stuck = AsyncMock(return_value=True)
+        agent = ScriptedAgent(
+            responses=[tool_response("search", '{"q": "same"}')],
+            max_steps=20,
+            on_stuck=on_stuck,
+        )
+
+        result = await agent.run("loop")
+
+        self.assertEqual(agent.current_step, 3)
+        self.assertEqual(on_stuck.await_args.args[0].kind, "exact")
+        self.assertIn("Stopped: repeated the same response 3 times", result)
+
+    @async_test
+    async def test_stuck_prompt_without_callback(self):
+        """Without a callback the agent is nudged to change strategy once per repeat."""
+        agent = ScriptedAgent(
+            responses=[Message.assistant_message("thinking")], max_steps=3
+        )
+        await agent.run("loop")
+
+        self.assertTrue(agent.is_stuck())
+        self.assertEqual(agent.next_step_prompt.count("Observed duplicate responses"), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,160 @@
+"""Tests for condensing tool outputs and the artifact store."""
+import asyncio
+import re
+import tempfile
+import unittest
+
+from app.agent.observation import (
+    ObservationPipeline,
+    collapse_repeats,
+    head_and_tail,
+    strip_ansi,
+)
+from app.agent.toolcall import ToolCallAgent
+from app.config import ObservationSettings
+from app.exceptions import ToolError
+from app.schema import Function, ToolCall
+from app.tool import ToolCollection
+from app.tool.artifact import ArtifactStore, ReadArtifact
+from app.tool.base import BaseTool
+
+
+def async_test(coro):
+    """Decorator for async test methods."""
+    def wrapper(*args, **kwargs):
+        loop = asyncio.get_event_loop()
+        return loop.run_until_complete(coro(*args, **kwargs))
+    return wrapper
+
+
+class LogTool(BaseTool):
+    """Prints a long log ending in an error."""
+
+    name: str = "build"
+    description: str = "Run the build"
+    parameters: dict = {"type": "object", "properties": {}}
+
+    async def execute(self):
+        lines = [f"\x1b[32mcompiling module {i}\x1b[0m" for i in range(500)]
+        return "\n".join(lines + ["Error: undefined symbol 'main'"])
+
+
+class TestCondensing(unittest.TestCase):
+    """Test the individual condensing steps."""
+
+    def test_strip_ansi_drops_colors_and_overwritten_progress(self):
+        """Escape codes go, and only the last state of a progress line stays."""
+        text = "\x1b[1;31mfailed\x1b[0m\n10%\r50%\r100%\r\ndone"
+        self.assertEqual(strip_ansi(text), "failed\n100%\ndone")
+
+    def test_collapse_repeats_keeps_short_runs(self):
+        """Only runs of at least min_run identical lines are collapsed."""
+        text = "\n".join(["a", "a", "b", "b", "b", "b", "c"])
+        self.assertEqual(
+            collapse_repeats(text, 3),
+            "a\na\nb\n[... previous line repeated 3 more times]\nc",
+        )
+
+    def test_head_and_tail_cuts_at_line_boundaries(self):
+        """The kept ends are whole lines and the marker counts the rest."""
+        text = "\n".join(f"line {i:03}" for i in range(100))
+        condensed = head_and_tail(text, 200, 0.5, "[{lines} lines elided]")
+        head, elided, tail = condensed.split("\n")[10:13]
+        self.assertEqual((head, tail), ("line 010", "line 089"))
+        self.assertEqual(elided, "[78 lines elided]")
+        self.assertTrue(condensed.endswith("line 099"))
+        self.assertLess(len(condensed), 250)
+
+
+class TestObservationPipeline(unittest.TestCase):
+    """Test the pipeline and the artifact store together."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = ArtifactStore(self.tmp.name)
+        self.settings = ObservationSettings(max_chars=1000)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_short_outputs_are_only_cleaned(self):
+        """Nothing is spilled when the cleaned output fits."""
+        pipeline = ObservationPipeline(self.settings, store=self.store)
+        output = "\n".join(["retrying"] * 50 + ["ok"])
+        self.assertEqual(
+            pipeline(output), "retrying\n[... previous line repeated 49 more times]\nok"
+        )
+        self.assertEqual(list(self.store.directory.iterdir()), [])
+
+    @async_test
+    async def test_long_output_keeps_the_error_and_spills_the_rest(self):
+        """The tail stays inline and the full output can be paged through."""
+        pipeline = ObservationPipeline(self.settings, store=self.store)
+        output = "\n".join(f"step {i} ok" for i in range(1000)) + "\nTraceback: boom"
+        condensed = pipeline(output)
+
+        self.assertLessEqual(len(condensed), 1200)
+        self.assertTrue(condensed.endswith("Traceback: boom"))
+        handle = re.search(r'handle="(artifact:[0-9a-f]+)"', condensed).group(1)
+
+        reader = ReadArtifact(store=self.store)
+        page = await reader.execute(handle=handle, start_line=500, line_count=2)
+        self.assertEqual(
+            page.output, "Lines 500-501 of 1001:\n   500\tstep 499 ok\n   501\tstep 500 ok"
+        )
+        matches = await reader.execute(handle=handle, pattern="Traceback")
+        self.assertIn("1001\tTraceback: boom", matches.output)
+
+    def test_store_is_content_addressed(self):
+        """Saving the same output twice gives the same handle."""
+        self.assertEqual(self.store.put("same"), self.store.put("same"))
+        self.assertNotEqual(self.store.put("same"), self.store.put("other"))
+        with self.assertRaises(ToolError):
+            self.store.get("../../etc/passwd")
+
+    @async_test
+    async def test_agent_condenses_tool_results(self):
+        """act() adds condensed results to memory instead of slicing them."""
+        agent = ToolCallAgent(available_tools=ToolCollection(LogTool()), max_observe=2000)
+        agent._observation = ObservationPipeline(
+            self.settings, max_chars=2000, store=self.store
+        )
+        agent.tool_calls = [
+            ToolCall(id="call_1", function=Function(name="build", arguments="{}"))
+        ]
+        await agent.act()
+
+        content = agent.memory.messages[-1].content
+        self.assertNotIn("\x1b", content)
+        self.assertTrue(content.endswith("Error: undefined symbol 'main'"))
+        self.assertIn("read_artifact", content)
+        self.assertIn("read_artifact", agent.available_tools.tool_map)
+
+
+    @async_test
+    async def test_full_artifact_page_is_not_cut_again(self):
+        """A page read back through the agent keeps all of its lines."""
+        handle = self.store.put(
+            "\n".join(f"log line {i:04} " + "x" * 40 for i in range(2000))
+        )
+        reader = ReadArtifact(store=self.store)
+        agent = ToolCallAgent(available_tools=ToolCollection(reader))
+        agent._observation = ObservationPipeline(
+            ObservationSettings(max_chars=6000), store=self.store
+        )
+        agent.tool_calls = [
+            ToolCall(
+                id="call_1",
+                function=Function(name="read_artifact", arguments=f'{{"handle": "{handle}"}}'),
+            )
+        ]
+        await agent.act()
+
+        content = agent.memory.messages[-1].content
+        self.assertGreater(len(content), 6000)
+        self.assertNotIn("elided", content)
+        last = int(re.search(r"Lines 1-(\d+) of 2000", content).group(1))
+        self.assertIn(f"log line {last - 1:04}", content)
+
+if __name__ == "__main__":
+    unittest.main()
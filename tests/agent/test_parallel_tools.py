@@ -0,0 +1,151 @@
+"""Tests for concurrent execution of independent tool calls."""
+import asyncio
+import json
+import time
+import unittest
+from typing import List, Optional
+
+from pydantic import Field
+
+from app.agent.toolcall import ToolCallAgent
+from app.schema import Function, ToolCall
+from app.tool import Terminate, ToolCollection
+from app.tool.base import BaseTool
+
+
+def async_test(coro):
+    """Decorator for async test methods."""
+    def wrapper(*args, **kwargs):
+        loop = asyncio.get_event_loop()
+        return loop.run_until_complete(coro(*args, **kwargs))
+    return wrapper
+
+
+class SleepTool(BaseTool):
+    """Sleeps, recording when each call starts and ends."""
+
+    name: str = "sleep"
+    description: str = "Sleep for a while"
+    parameters: dict = {"type": "object", "properties": {}}
+    events: List[str] = Field(default_factory=list)
+    running: int = 0
+    peak: int = 0
+
+    async def execute(self, label: str, delay: float = 0.05):
+        self.events.append(f"start {label}")
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        await asyncio.sleep(delay)
+        self.running -= 1
+        self.events.append(f"end {label}")
+        return f"slept {label}"
+
+
+def sleep_tool(
+    name: str,
+    parallel_safe: bool = True,
+    max_concurrency: Optional[int] = None,
+    exclusive_resource: Optional[str] = None,
+    events: Optional[List[str]] = None,
+) -> SleepTool:
+    """Build a SleepTool with the given concurrency declaration."""
+    tool = SleepTool(
+        name=name,
+        parallel_safe=parallel_safe,
+        max_concurrency=max_concurrency,
+        exclusive_resource=exclusive_resource,
+    )
+    if events is not None:
+        tool.events = events
+    return tool
+
+
+def call(call_id: str, name: str, **arguments) -> ToolCall:
+    """Build a ToolCall."""
+    return ToolCall(
+        id=call_id, function=Function(name=name, arguments=json.dumps(arguments))
+    )
+
+
+class TestParallelToolCalls(unittest.TestCase):
+    """Test act() with parallel-safe and exclusive tools."""
+
+    def agent_with(self, *tools: BaseTool) -> ToolCallAgent:
+        agent = ToolCallAgent(available_tools=ToolCollection(*tools, Terminate()))
+        agent._cancel_pending_tools()
+        return agent
+
+    async def act(self, agent: ToolCallAgent, calls: List[ToolCall]) -> float:
+        agent.tool_calls = calls
+        started = time.perf_counter()
+        await agent.act()
+        return time.perf_counter() - started
+
+    @async_test
+    async def test_independent_calls_take_as_long_as_the_slowest(self):
+        """Parallel-safe calls overlap and results keep the call order."""
+        search = sleep_tool("search")
+        python = sleep_tool("python")
+        agent = self.agent_with(search, python)
+        calls = [
+            call("call_1", "search", label="a", delay=0.2),
+            call("call_2", "search", label="b", delay=0.05),
+            call("call_3", "search", label="c", delay=0.05),
+            call("call_4", "python", label="d", delay=0.1),
+        ]
+
+        elapsed = await self.act(agent, calls)
+
+        self.assertLess(elapsed, 0.35)
+        self.assertEqual(search.peak, 3)
+        tool_messages = [msg for msg in agent.memory.messages if msg.role == "tool"]
+        self.assertEqual(
+            [msg.tool_call_id for msg in tool_messages],
+            ["call_1", "call_2", "call_3", "call_4"],
+        )
+        self.assertIn("slept a", tool_messages[0].content)
+
+    @async_test
+    async def test_unsafe_tool_runs_alone(self):
+        """A tool that is not parallel-safe waits for earlier calls and blocks later ones."""
+        events: List[str] = []
+        search = sleep_tool("search", events=events)
+        edit = sleep_tool("edit", parallel_safe=False, events=events)
+        agent = self.agent_with(search, edit)
+
+        await self.act(
+            agent,
+            [
+                call("call_1", "search", label="a", delay=0.05),
+                call("call_2", "edit", label="b", delay=0.01),
+                call("call_3", "search", label="c", delay=0.01),
+            ],
+        )
+
+        self.assertEqual(
+            events, ["start a", "end a", "start b", "end b", "start c", "end c"]
+        )
+
+    @async_test
+    async def test_concurrency_limits(self):
+        """max_concurrency caps a tool and an exclusive resource is held by one call."""
+        limited = sleep_tool("limited", max_concurrency=2)
+        page_a = sleep_tool("page_a", exclusive_resource="browser")
+        page_b = sleep_tool("page_b", exclusive_resource="browser", events=page_a.events)
+        agent = self.agent_with(limited, page_a, page_b)
+
+        await self.act(
+            agent,
+            [call(f"call_{i}", "limited", label=str(i), delay=0.02) for i in range(5)]
+            + [
+                call("call_a", "page_a", label="a", delay=0.02),
+                call("call_b", "page_b", label="b", delay=0.02),
+            ],
+        )
+
+        self.assertEqual(limited.peak, 2)
+        self.assertEqual(page_a.events, ["start a", "end a", "start b", "end b"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,158 @@
+"""Tests for early tool dispatch in ToolCallAgent."""
+import asyncio
+import json
+import unittest
+from typing import List
+from unittest.mock import patch
+
+from pydantic import Field
+
+from app.agent.toolcall import ToolCallAgent
+from app.exceptions import ToolCallStreamInterrupted
+from app.schema import Function, ToolCall
+from app.tool import Terminate, ToolCollection
+from app.tool.base import BaseTool, ToolResult
+
+
+def async_test(coro):
+    """Decorator for async test methods."""
+    def wrapper(*args, **kwargs):
+        loop = asyncio.get_event_loop()
+        return loop.run_until_complete(coro(*args, **kwargs))
+    return wrapper
+
+
+class RecordTool(BaseTool):
+    """Records the order in which it runs."""
+
+    name: str = "record"
+    description: str = "Record a label"
+    parameters: dict = {"type": "object", "properties": {}}
+    log: List[str] = Field(default_factory=list)
+    release: asyncio.Event = Field(default_factory=asyncio.Event)
+
+    async def execute(self, label: str, delay: float = 0, block: bool = False):
+        if block:
+            await self.release.wait()
+        await asyncio.sleep(delay)
+        self.log.append(label)
+        return f"recorded {label}"
+
+
+class SnapTool(BaseTool):
+    """Returns a screenshot named after its label."""
+
+    name: str = "snap"
+    description: str = "Take a screenshot"
+    parameters: dict = {"type": "object", "properties": {}}
+
+    async def execute(self, label: str, delay: float = 0):
+        await asyncio.sleep(delay)
+        return ToolResult(output=f"shot {label}", base64_image=label)
+
+
+def call(call_id: str, name: str, **arguments) -> ToolCall:
+    """Build a ToolCall."""
+    return ToolCall(
+        id=call_id, function=Function(name=name, arguments=json.dumps(arguments))
+    )
+
+
+class TestToolCallDispatch(unittest.TestCase):
+    """Test tools started while the response streams."""
+
+    def setUp(self):
+        """Create an agent with recording tools."""
+        self.record = RecordTool()
+        self.agent = ToolCallAgent(
+            available_tools=ToolCollection(self.record, SnapTool(), Terminate()),
+            stream_tool_calls=True,
+        )
+        self.agent._cancel_pending_tools()
+
+    async def dispatch_and_act(self, calls: List[ToolCall]) -> None:
+        for tool_call in calls:
+            await self.agent._dispatch_tool_call(tool_call)
+        self.agent.tool_calls = calls
+        await self.agent.act()
+
+    def tool_messages(self):
+        return [msg for msg in self.agent.memory.messages if msg.role == "tool"]
+
+    @async_test
+    async def test_dispatched_tools_run_in_call_order(self):
+        """A slow earlier call finishes before a later call starts."""
+        calls = [
+            call("call_1", "record", label="a", delay=0.02),
+            call("call_2", "record", label="b"),
+            call("call_3", "record", label="c"),
+        ]
+        await self.dispatch_and_act(calls)
+
+        self.assertEqual(self.record.log, ["a", "b", "c"])
+        self.assertEqual(
+            [msg.tool_call_id for msg in self.tool_messages()],
+            ["call_1", "call_2", "call_3"],
+        )
+
+    @async_test
+    async def test_results_and_images_go_to_their_tool_message(self):
+        """Each tool message carries its own result and screenshot."""
+        calls = [
+            call("call_1", "snap", label="first", delay=0.01),
+            call("call_2", "record", label="b"),
+            call("call_3", "snap", label="second"),
+        ]
+        await self.dispatch_and_act(calls)
+
+        messages = self.tool_messages()
+        self.assertEqual([msg.base64_image for msg in messages], ["first", None, "second"])
+        self.assertIn("shot first", messages[0].content)
+        self.assertIn("recorded b", messages[1].content)
+        self.assertIn("shot second", messages[2].content)
+
+    @async_test
+    async def test_special_tools_and_later_calls_wait_for_act(self):
+        """Nothing from a special tool onwards is started early."""
+        calls = [
+            call("call_1", "record", label="a"),
+            call("call_2", "terminate", status="success"),
+            call("call_3", "record", label="b"),
+        ]
+        for tool_call in calls:
+            await self.agent._dispatch_tool_call(tool_call)
+
+        self.assertEqual(list(self.agent._pending_tool_tasks), ["call_1"])
+        await asyncio.sleep(0.01)
+        self.assertEqual(self.record.log, ["a"])
+
+        self.agent.tool_calls = calls
+        await self.agent.act()
+        self.assertEqual(self.record.log, ["a", "b"])
+        self.assertEqual(
+            [msg.name for msg in self.tool_messages()], ["record", "terminate", "record"]
+        )
+
+    @async_test
+    async def test_pending_tools_are_cancelled_when_think_fails(self):
+        """A failed response cancels the tools it already started."""
+        started = {}
+
+        async def failing_ask_tool(*args, on_tool_call=None, **kwargs):
+            await on_tool_call(call("call_1", "record", label="a", block=True))
+            started.update(self.agent._pending_tool_tasks)
+            raise ToolCallStreamInterrupted("stream dropped")
+
+        with patch.object(self.agent.llm, "ask_tool", side_effect=failing_ask_tool):
+            with self.assertRaises(ToolCallStreamInterrupted):
+                await self.agent.think()
+
+        task = started["call_1"]
+        await asyncio.sleep(0)
+        self.assertTrue(task.cancelled())
+        self.assertEqual(self.agent._pending_tool_tasks, {})
+        self.assertEqual(self.record.log, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
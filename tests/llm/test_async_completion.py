@@ -0,0 +1,98 @@
+"""Tests for the async completion path of the LLM class."""
+import asyncio
+import threading
+import unittest
+from unittest.mock import AsyncMock, patch
+
+import litellm
+
+from app.llm.inference import LLM
+
+
+def async_test(coro):
+    """Decorator for async test methods."""
+    def wrapper(*args, **kwargs):
+        loop = asyncio.get_event_loop()
+        return loop.run_until_complete(coro(*args, **kwargs))
+    return wrapper
+
+
+def make_response(content: str) -> litellm.ModelResponse:
+    return litellm.ModelResponse(
+        choices=[
+            {
+                "index": 0,
+                "finish_reason": "stop",
+                "message": {"role": "assistant", "content": content},
+            }
+        ]
+    )
+
+
+class TestAsyncCompletion(unittest.TestCase):
+    """Test ado_completion and the shared request choke point."""
+
+    def setUp(self):
+        """Use the default LLM singleton."""
+        self.llm = LLM()
+
+    @async_test
+    async def test_ado_completion_injects_defaults(self):
+        """Defaults and credentials are filled in for the async request."""
+        with patch(
+            "app.llm.inference.litellm.acompletion",
+            new=AsyncMock(return_value=make_response("hi")),
+        ) as mock_acompletion:
+            response, _, _ = await self.llm.ado_completion(
+                messages=[{"role": "user", "content": "hello"}]
+            )
+
+        self.assertEqual(response.choices[0].message.content, "hi")
+        kwargs = mock_acompletion.await_args.kwargs
+        self.assertEqual(kwargs["max_tokens"], self.llm.max_tokens)
+        self.assertEqual(kwargs["top_p"], self.llm.top_p)
+        self.assertEqual(kwargs["api_key"], self.llm.api_key)
+        self.assertEqual(kwargs["model"], self.llm._model_name())
+
+    @async_test
+    async def test_ado_completion_in_thread_keeps_the_loop_free(self):
+        """The sync path runs in a worker thread, not on the event loop."""
+        loop_thread = threading.get_ident()
+        call_threads = []
+
+        def blocking_completion(**kwargs):
+            call_threads.append(threading.get_ident())
+            return make_response("sync")
+
+        with patch(
+            "app.llm.inference.completion", side_effect=blocking_completion
+        ) as mock_completion:
+            response, _, _ = await self.llm.ado_completion_in_thread(
+                messages=[{"role": "user", "content": "hello"}]
+            )
+
+        self.assertEqual(response.choices[0].message.content, "sync")
+        self.assertEqual(mock_completion.call_args.kwargs["top_p"], self.llm.top_p)
+        self.assertEqual(len(call_threads), 1)
+        self.assertNotEqual(call_threads[0], loop_thread)
+
+    @async_test
+    async def test_explicit_params_are_kept(self):
+        """Caller-provided values are not overwritten by the defaults."""
+        with patch(
+            "app.llm.inference.litellm.acompletion",
+            new=AsyncMock(return_value=make_response("ok")),
+        ) as mock_acompletion:
+            await self.llm.ado_completion(
+                messages=[{"role": "user", "content": "hello"}],
+                temperature=0.42,
+                api_key="override",
+            )
+
+        kwargs = mock_acompletion.await_args.kwargs
+        self.assertEqual(kwargs["temperature"], 0.42)
+        self.assertEqual(kwargs["api_key"], "override")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,144 @@
+"""Tests for the record/replay LLM backend."""
+import asyncio
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import AsyncMock, patch
+
+import litellm
+from litellm.types.utils import Delta, ModelResponseStream
+
+from app.config import LLMBackendSettings
+from app.exceptions import CassetteMiss
+from app.llm.backend import RecordBackend, ReplayBackend, get_backend
+from app.llm.inference import LLM
+from app.schema import Message
+
+
+def async_test(coro):
+    """Decorator for async test methods."""
+    def wrapper(*args, **kwargs):
+        loop = asyncio.get_event_loop()
+        return loop.run_until_complete(coro(*args, **kwargs))
+    return wrapper
+
+
+def text_response(content: str) -> litellm.ModelResponse:
+    """Build a non-streamed response."""
+    return litellm.ModelResponse(
+        choices=[
+            {
+                "index": 0,
+                "finish_reason": "stop",
+                "message": {"role": "assistant", "content": content},
+            }
+        ],
+        usage={"prompt_tokens": 10, "completion_tokens": 2, "total_tokens": 12},
+    )
+
+
+def text_stream(*parts: str):
+    """Build a streamed response of text deltas."""
+    async def stream():
+        for part in parts:
+            yield ModelResponseStream(
+                choices=[{"index": 0, "delta": Delta(content=part).model_dump()}]
+            )
+    return stream()
+
+
+class TestRecordReplay(unittest.TestCase):
+    """Test recording provider traffic and replaying it offline."""
+
+    def setUp(self):
+        """Point the default LLM at a temporary cassette."""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / "cassette.jsonl"
+        self.llm = LLM()
+        self.previous = (self.llm.backend, self.llm.response_cache, self.llm.single_flight)
+        self.llm.response_cache = None
+        self.llm.single_flight = None
+
+    def tearDown(self):
+        """Restore the LLM singleton."""
+        self.llm.backend, self.llm.response_cache, self.llm.single_flight = self.previous
+        self.tmp.cleanup()
+
+    @async_test
+    async def test_replay_serves_recorded_responses_without_network(self):
+        """Recorded text and streamed answers come back in replay."""
+        messages = [Message.user_message("hello")]
+        self.llm.backend = RecordBackend(self.path)
+        with patch(
+            "app.llm.inference.litellm.acompletion",
+            new=AsyncMock(side_effect=[text_response("hi"), text_stream("str", "eamed")]),
+        ):
+            self.assertEqual(await self.llm.ask(messages, stream=False), "hi")
+            self.assertEqual(await self.llm.ask(messages, stream=True), "streamed")
+
+        self.llm.backend = ReplayBackend(self.path)
+        offline = AsyncMock(side_effect=AssertionError("network used"))
+        with patch("app.llm.inference.litellm.acompletion", new=offline):
+            self.assertEqual(await self.llm.ask(messages, stream=False), "hi")
+            self.assertEqual(await self.llm.ask(messages, stream=True), "streamed")
+        offline.assert_not_awaited()
+
+    @async_test
+    async def test_identical_requests_replay_in_recorded_order(self):
+        """Repeated requests get their recorded answers in turn, then the last."""
+        messages = [Message.user_message("again")]
+        self.llm.backend = RecordBackend(self.path)
+        with patch(
+            "app.llm.inference.litellm.acompletion",
+            new=AsyncMock(side_effect=[text_response("one"), text_response("two")]),
+        ):
+            await self.llm.ask(messages, stream=False)
+            await self.llm.ask(messages, stream=False)
+
+        self.llm.backend = ReplayBackend(self.path)
+        answers = [await self.llm.ask(messages, stream=False) for _ in range(3)]
+        self.assertEqual(answers, ["one", "two", "two"])
+
+    @async_test
+    async def test_unrecorded_request_fails_without_retries(self):
+        """A replay miss raises immediately."""
+        self.llm.backend = ReplayBackend(self.path)
+        with self.assertRaises(CassetteMiss):
+            await self.llm.ask([Message.user_message("never recorded")], stream=False)
+
+    @async_test
+    async def test_simulated_latency_uses_recorded_timing(self):
+        """Replay sleeps for the scaled recorded latency."""
+        self.path.write_text(
+            '{"key": "k", "stream": false, "elapsed": 2.0, '
+            '"response": ' + text_response("slow").model_dump_json() + "}\n"
+        )
+        backend = ReplayBackend(self.path, simulate_latency=True, latency_scale=0.5)
+        with patch("app.llm.backend.request_key", return_value="k"), patch(
+            "app.llm.backend.asyncio.sleep", new=AsyncMock()
+        ) as sleep:
+            response = await backend.acompletion(None, model="m", messages=[])
+        sleep.assert_awaited_once_with(1.0)
+        self.assertEqual(response.choices[0].message.content, "slow")
+
+
+class TestGetBackend(unittest.TestCase):
+    """Test backend selection from settings."""
+
+    def test_live_mode_has_no_backend(self):
+        """Live mode calls litellm directly."""
+        self.assertIsNone(get_backend(LLMBackendSettings()))
+
+    def test_backends_are_shared_per_cassette(self):
+        """The same settings give the same backend."""
+        with tempfile.TemporaryDirectory() as tmp:
+            settings = LLMBackendSettings(
+                mode="record", cassette_path=str(Path(tmp) / "c.jsonl")
+            )
+            backend = get_backend(settings)
+            self.assertIsInstance(backend, RecordBackend)
+            self.assertIs(get_backend(settings), backend)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,163 @@
+"""Tests for per-call latency and throughput telemetry."""
+import asyncio
+import unittest
+from unittest.mock import AsyncMock, patch
+
+import litellm
+from litellm.types.utils import Delta, ModelResponseStream
+
+from app.llm.cost import Cost, RollingWindow, call_site
+from app.llm.inference import LLM
+from app.schema import Message
+from app.tracing import Tracer, tracing
+
+
+def async_test(coro):
+    """Decorator for async test methods."""
+    def wrapper(*args, **kwargs):
+        loop = asyncio.get_event_loop()
+        return loop.run_until_complete(coro(*args, **kwargs))
+    return wrapper
+
+
+class TestRollingWindow(unittest.TestCase):
+    """Test RollingWindow."""
+
+    def test_percentiles_use_nearest_rank(self):
+        """p50/p95/p99 pick samples by nearest rank."""
+        window = RollingWindow(100)
+        for value in range(1, 101):
+            window.add(value)
+        self.assertEqual(window.summary(), {"p50": 50, "p95": 95, "p99": 99})
+
+    def test_only_recent_samples_are_kept(self):
+        """Old samples fall out of the window."""
+        window = RollingWindow(3)
+        for value in (100, 1, 2, 3):
+            window.add(value)
+        self.assertEqual(len(window), 3)
+        self.assertEqual(window.percentile(100), 3)
+
+    def test_empty_window_has_no_percentiles(self):
+        """An empty window reports None."""
+        self.assertIsNone(RollingWindow(5).percentile(50))
+
+
+class TestCost(unittest.TestCase):
+    """Test call telemetry in Cost."""
+
+    def test_costs_are_bounded(self):
+        """Only the most recent costs are kept, the total keeps counting."""
+        cost = Cost(window_size=2)
+        for value in (1.0, 2.0, 3.0):
+            cost.add_cost(value)
+        self.assertEqual(cost.costs, [2.0, 3.0])
+        self.assertEqual(cost.accumulated_cost, 6.0)
+
+    def test_calls_are_grouped_by_model_and_call_site(self):
+        """Each call counts towards its model and its call site."""
+        cost = Cost()
+        cost.add_call("gpt", latency=2.0, ttft=0.5, completion_tokens=30, call_site="manus")
+        cost.add_call("gpt", latency=1.0, retries=2, call_site="browser_use")
+
+        by_model = cost.get()["calls_by_model"]["gpt"]
+        self.assertEqual(by_model["calls"], 2)
+        self.assertEqual(by_model["latency"]["p99"], 2.0)
+        self.assertEqual(by_model["tokens_per_second"]["p50"], 20.0)
+        self.assertEqual(by_model["retries"]["p99"], 2)
+        self.assertEqual(set(cost.calls_by_call_site), {"manus", "browser_use"})
+        self.assertIsNone(cost.calls_by_call_site["browser_use"]["ttft"]["p50"])
+
+
+class TestLLMCallTelemetry(unittest.TestCase):
+    """Test telemetry recorded around provider calls."""
+
+    def setUp(self):
+        """Use the default LLM with a fresh tracker and no cache."""
+        self.llm = LLM()
+        self.previous = (self.llm.cost_tracker, self.llm.response_cache)
+        self.llm.cost_tracker = Cost()
+        self.llm.response_cache = None
+
+    def tearDown(self):
+        """Restore the LLM singleton."""
+        self.llm.cost_tracker, self.llm.response_cache = self.previous
+
+    @async_test
+    async def test_non_streaming_call_records_usage_and_call_site(self):
+        """A completed call is attributed to the active call site."""
+        response = litellm.ModelResponse(
+            choices=[
+                {
+                    "index": 0,
+                    "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": "ok"},
+                }
+            ],
+            usage={"prompt_tokens": 20, "completion_tokens": 5, "total_tokens": 25},
+        )
+        with call_site("planner"), patch(
+            "app.llm.inference.litellm.acompletion",
+            new=AsyncMock(return_value=response),
+        ):
+            await self.llm.ask([Message.user_message("time me")], stream=False)
+
+        stats = self.llm.cost_tracker.calls_by_call_site["planner"]
+        self.assertEqual(stats["calls"], 1)
+        self.assertEqual(stats["prompt_tokens"]["p50"], 20)
+        self.assertEqual(stats["completion_tokens"]["p50"], 5)
+        self.assertEqual(stats["retries"]["p50"], 0)
+
+    @async_test
+    async def test_traced_call_records_a_request_span(self):
+        """Under a tracer, each provider request is a span with its usage."""
+        response = litellm.ModelResponse(
+            choices=[
+                {
+                    "index": 0,
+                    "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": "ok"},
+                }
+            ],
+            usage={"prompt_tokens": 20, "completion_tokens": 5, "total_tokens": 25},
+        )
+        tracer = Tracer()
+        with tracing(tracer), call_site("planner"), patch(
+            "app.llm.inference.litellm.acompletion",
+            new=AsyncMock(return_value=response),
+        ):
+            await self.llm.ask([Message.user_message("trace me")], stream=False)
+
+        (request,) = [s for s in tracer.spans if s.name == "llm.request"]
+        self.assertEqual(request.category, "llm")
+        self.assertEqual(request.args["call_site"], "planner")
+        self.assertEqual(request.args["prompt_tokens"], 20)
+        self.assertEqual(request.args["completion_tokens"], 5)
+        self.assertGreater(request.args["request_size"], 0)
+        self.assertIsNotNone(request.end)
+
+    @async_test
+    async def test_streaming_call_records_ttft(self):
+        """A streamed call records the time to its first chunk."""
+
+        async def stream():
+            for text in ("Hel", "lo"):
+                await asyncio.sleep(0.01)
+                yield ModelResponseStream(
+                    choices=[{"index": 0, "delta": Delta(content=text).model_dump()}]
+                )
+
+        with patch(
+            "app.llm.inference.litellm.acompletion",
+            new=AsyncMock(return_value=stream()),
+        ):
+            await self.llm.ask([Message.user_message("stream me")], stream=True)
+
+        (stats,) = self.llm.cost_tracker.calls_by_model.values()
+        ttft, latency = stats["ttft"]["p50"], stats["latency"]["p50"]
+        self.assertGreater(ttft, 0)
+        self.assertGreaterEqual(latency, ttft + 0.005)
+
+
+if __name__ == "__main__":
+    unittest.main()
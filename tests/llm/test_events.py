@@ -0,0 +1,104 @@
+"""Tests for delivering streamed text to token sinks."""
+import asyncio
+import contextlib
+import io
+import unittest
+from unittest.mock import AsyncMock, patch
+
+from litellm.types.utils import Delta, ModelResponseStream
+
+from app.llm.events import QueueTokenSink, token_sink
+from app.llm.inference import LLM
+from app.schema import Message
+
+
+def async_test(coro):
+    """Decorator for async test methods."""
+    def wrapper(*args, **kwargs):
+        loop = asyncio.get_event_loop()
+        return loop.run_until_complete(coro(*args, **kwargs))
+    return wrapper
+
+
+def text_stream(*texts):
+    """Build an async stream of content chunks."""
+    async def stream():
+        for text in texts:
+            yield ModelResponseStream(
+                choices=[{"index": 0, "delta": Delta(content=text).model_dump()}]
+            )
+    return stream()
+
+
+def drain(queue: asyncio.Queue) -> list:
+    """Everything put on a queue so far."""
+    items = []
+    while not queue.empty():
+        items.append(queue.get_nowait())
+    return items
+
+
+class TestTokenSink(unittest.TestCase):
+    """Test where streamed text goes."""
+
+    def setUp(self):
+        """Use the default LLM without a response cache."""
+        self.llm = LLM()
+        self.previous_cache = self.llm.response_cache
+        self.llm.response_cache = None
+
+    def tearDown(self):
+        """Restore the LLM singleton."""
+        self.llm.response_cache = self.previous_cache
+
+    def provider(self, *texts):
+        return patch(
+            "app.llm.inference.litellm.acompletion",
+            new=AsyncMock(return_value=text_stream(*texts)),
+        )
+
+    @async_test
+    async def test_chunks_go_to_the_current_sink(self):
+        """The caller's sink gets each chunk and the end of the response."""
+        sink = QueueTokenSink()
+        with self.provider("Hel", "lo"), token_sink(sink):
+            result = await self.llm.ask([Message.user_message("sink me")])
+        self.assertEqual(result, "Hello")
+        self.assertEqual(drain(sink.queue), ["Hel", "lo", QueueTokenSink.END])
+
+    @async_test
+    async def test_silent_without_a_sink(self):
+        """Nothing is written to stdout by default."""
+        stdout = io.StringIO()
+        with self.provider("quiet"), contextlib.redirect_stdout(stdout):
+            self.assertEqual(
+                await self.llm.ask([Message.user_message("be quiet")]), "quiet"
+            )
+        self.assertEqual(stdout.getvalue(), "")
+
+    @async_test
+    async def test_ask_stream_yields_chunks(self):
+        """ask_stream hands the chunks to the caller as they arrive."""
+        with self.provider("a", "b", "c"):
+            chunks = [
+                chunk
+                async for chunk in self.llm.ask_stream([Message.user_message("iterate")])
+            ]
+        self.assertEqual(chunks, ["a", "b", "c"])
+
+    @async_test
+    async def test_tool_call_thoughts_go_to_the_sink(self):
+        """Text streamed before tool calls reaches the sink too."""
+        sink = QueueTokenSink()
+        with self.provider("Let me ", "think."), token_sink(sink):
+            message = await self.llm.ask_tool(
+                [Message.user_message("think aloud")], on_tool_call=AsyncMock()
+            )
+        self.assertEqual(message.content, "Let me think.")
+        self.assertEqual(
+            drain(sink.queue), ["Let me ", "think.", QueueTokenSink.END]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,175 @@
+"""Tests for hedged tool requests."""
+import asyncio
+import unittest
+from unittest.mock import patch
+
+from litellm.types.utils import ModelResponse, ModelResponseStream
+
+from app.llm.hedging import HEDGE_MIN_SAMPLES, hedge
+from app.llm.inference import LLM
+from app.schema import Message
+
+
+def async_test(coro):
+    """Decorator for async test methods."""
+    def wrapper(*args, **kwargs):
+        loop = asyncio.get_event_loop()
+        return loop.run_until_complete(coro(*args, **kwargs))
+    return wrapper
+
+
+def response(content: str):
+    """Build a non-streaming response with one message."""
+    return ModelResponse(
+        choices=[{"index": 0, "message": {"role": "assistant", "content": content}}]
+    )
+
+
+class FakeStream:
+    """Async stream that waits before its first chunk and records closing."""
+
+    def __init__(self, texts, delay: float = 0):
+        self.texts = texts
+        self.delay = delay
+        self.closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+            self.delay = 0
+        if not self.texts:
+            raise StopAsyncIteration
+        text = self.texts.pop(0)
+        return ModelResponseStream(
+            choices=[{"index": 0, "delta": {"content": text}}]
+        )
+
+    async def aclose(self):
+        self.closed = True
+
+
+class TestHedge(unittest.TestCase):
+    """Test racing a request against its duplicate."""
+
+    @async_test
+    async def test_fast_primary_is_not_hedged(self):
+        """No duplicate is sent when the primary answers in time."""
+        sent = []
+
+        async def primary():
+            return "primary"
+
+        async def backup():
+            sent.append("backup")
+            return "backup"
+
+        result = await hedge(primary, backup, delay=1)
+        self.assertEqual(result, ("primary", False))
+        self.assertEqual(sent, [])
+
+    @async_test
+    async def test_stalled_primary_loses_and_is_cancelled(self):
+        """The duplicate answers first and the stalled request is cancelled."""
+        cancelled = asyncio.Event()
+
+        async def primary():
+            try:
+                await asyncio.sleep(60)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        async def backup():
+            return "backup"
+
+        hedged = []
+        result = await hedge(primary, backup, delay=0.01, on_hedge=lambda: hedged.append(1))
+        self.assertEqual(result, ("backup", True))
+        self.assertEqual(hedged, [1])
+        self.assertTrue(cancelled.is_set())
+
+    @async_test
+    async def test_failed_duplicate_does_not_win(self):
+        """A failing duplicate waits for the primary instead of raising."""
+        async def primary():
+            await asyncio.sleep(0.05)
+            return "primary"
+
+        async def backup():
+            raise ConnectionError("down")
+
+        self.assertEqual(await hedge(primary, backup, delay=0.01), ("primary", False))
+
+    @async_test
+    async def test_streams_race_to_their_first_chunk(self):
+        """The stream with the first chunk wins and the other is closed."""
+        slow = FakeStream(["slow"], delay=60)
+        fast = FakeStream(["a", "b"])
+
+        async def primary():
+            return slow
+
+        async def backup():
+            return fast
+
+        stream, backup_won = await hedge(primary, backup, delay=0.01, stream=True)
+        texts = [chunk.choices[0].delta.content async for chunk in stream]
+        self.assertTrue(backup_won)
+        self.assertEqual(texts, ["a", "b"])
+        self.assertTrue(slow.closed)
+
+
+class TestAskToolHedging(unittest.TestCase):
+    """Test hedging in LLM.ask_tool."""
+
+    def setUp(self):
+        """Hedge the default LLM to a second instance, without a cache."""
+        self.llm = LLM()
+        self.backup = LLM("hedge-test-backup")
+        self.previous = (self.llm.hedge_with, self.llm.response_cache)
+        self.llm.hedge_with = "hedge-test-backup"
+        self.llm.response_cache = None
+
+    def tearDown(self):
+        """Restore the LLM singleton."""
+        self.llm.hedge_with, self.llm.response_cache = self.previous
+        LLM._instances.pop("hedge-test-backup", None)
+
+    @async_test
+    async def test_stalled_request_is_answered_by_the_backup(self):
+        """A stalled provider call is answered by the hedge endpoint."""
+        async def stalled(**kwargs):
+            await asyncio.sleep(60)
+
+        async def answered(**kwargs):
+            self.assertNotIn("model", kwargs)
+            return response("from backup")
+
+        with patch.object(self.llm, "_acompletion_call", new=stalled), patch.object(
+            self.backup, "_acompletion_call", new=answered
+        ), patch.object(self.llm, "_hedge_delay", return_value=0.01), patch.object(
+            self.llm, "_calculate_and_track_cost", return_value=0.0
+        ), patch.object(self.llm, "update_token_count"):
+            hedged, wins = self.llm.cost_tracker.hedged_requests, self.llm.cost_tracker.hedge_wins
+            message = await self.llm.ask_tool([Message.user_message("hedged request")])
+
+        self.assertEqual(message.content, "from backup")
+        self.assertEqual(self.llm.cost_tracker.hedged_requests, hedged + 1)
+        self.assertEqual(self.llm.cost_tracker.hedge_wins, wins + 1)
+
+    def test_delay_follows_recent_latency(self):
+        """The delay is a fixed start value, then the percentile of recent calls."""
+        self.llm.cost_tracker = type(self.llm.cost_tracker)()
+        self.assertEqual(self.llm._hedge_delay(stream=False), self.llm.hedge_initial_delay)
+
+        for _ in range(HEDGE_MIN_SAMPLES):
+            self.llm.cost_tracker.add_call(self.llm._model_name(), latency=4.0, ttft=2.0)
+        self.assertEqual(self.llm._hedge_delay(stream=False), 4.0)
+        self.assertEqual(self.llm._hedge_delay(stream=True), 2.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
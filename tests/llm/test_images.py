@@ -0,0 +1,150 @@
+"""Tests for the screenshot pipeline."""
+import asyncio
+import base64
+import io
+import unittest
+
+from PIL import Image, ImageDraw
+
+from app.agent.browser import BrowserAgent
+from app.llm.images import (
+    attach_images,
+    fingerprint_distance,
+    fit_tile_budget,
+    image_fingerprint,
+    prepare_screenshot,
+)
+from app.llm.tokens import get_token_counter
+
+
+def async_test(coro):
+    """Decorator for async test methods."""
+    def wrapper(*args, **kwargs):
+        loop = asyncio.get_event_loop()
+        return loop.run_until_complete(coro(*args, **kwargs))
+    return wrapper
+
+
+def screenshot(width: int, height: int, text: str = "page") -> bytes:
+    """Render a JPEG with some text on it."""
+    image = Image.new("RGB", (width, height), "white")
+    draw = ImageDraw.Draw(image)
+    for y in range(0, height, 40):
+        draw.text((10, y), f"{text} {y}", fill="black")
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=100)
+    return buffer.getvalue()
+
+
+def decode(base64_image: str) -> Image.Image:
+    """Open a base64 encoded image."""
+    return Image.open(io.BytesIO(base64.b64decode(base64_image)))
+
+
+class TestPrepareScreenshot(unittest.TestCase):
+    """Test downscaling, cropping and recompression."""
+
+    def test_full_page_is_downscaled_to_the_tile_budget(self):
+        """A long page keeps its aspect ratio and shrinks until it fits the budget."""
+        counter = get_token_counter()
+        self.assertGreater(counter.high_detail_tiles(2560, 8000), 6)
+
+        width, height = fit_tile_budget(2560, 8000, max_tiles=6)
+        self.assertLess(height, 8000)
+        self.assertAlmostEqual(width / height, 2560 / 8000, places=2)
+        self.assertLessEqual(counter.high_detail_tiles(width, height), 6)
+        larger = int(width * 1.1), int(height * 1.1)
+        self.assertGreater(counter.high_detail_tiles(*larger), 6)
+
+    def test_crop_keeps_the_top_at_full_resolution(self):
+        """With crop, a long page is cut to the top part that fits the budget."""
+        width, height = fit_tile_budget(2560, 8000, max_tiles=6, crop=True)
+        self.assertEqual(width, 2560)
+        self.assertLess(height, 8000)
+        self.assertLessEqual(get_token_counter().high_detail_tiles(width, height), 6)
+
+    def test_bottom_of_the_page_is_not_dropped(self):
+        """The prepared screenshot still shows the end of a long page."""
+        image = Image.new("RGB", (2560, 8000), "white")
+        ImageDraw.Draw(image).rectangle((0, 7600, 2560, 8000), fill="black")
+        buffer = io.BytesIO()
+        image.save(buffer, format="PNG")
+
+        prepared = decode(prepare_screenshot(buffer.getvalue(), max_tiles=6, quality=90))
+        self.assertAlmostEqual(prepared.width / prepared.height, 2560 / 8000, places=2)
+        bottom = prepared.convert("L").getpixel((prepared.width // 2, prepared.height - 2))
+        self.assertLess(bottom, 50)
+
+    def test_result_is_smaller_and_within_provider_size(self):
+        """The result is no larger than the provider would scale it to."""
+        raw = screenshot(1280, 6000)
+        prepared = prepare_screenshot(raw, max_tiles=6, quality=70)
+
+        image = decode(prepared)
+        self.assertLessEqual(min(image.size), 768)
+        self.assertLessEqual(
+            get_token_counter().high_detail_tiles(*image.size), 6
+        )
+        self.assertLess(len(base64.b64decode(prepared)), len(raw))
+
+
+class TestFingerprint(unittest.TestCase):
+    """Test perceptual dedup."""
+
+    def test_recompressed_copy_matches_and_other_page_does_not(self):
+        """Re-encoding keeps the fingerprint, different content changes it."""
+        page = prepare_screenshot(screenshot(1280, 720), 6, 90)
+        again = prepare_screenshot(screenshot(1280, 720), 6, 60)
+        other = prepare_screenshot(screenshot(1280, 720, text="other text"), 6, 90)
+
+        self.assertEqual(
+            fingerprint_distance(image_fingerprint(page), image_fingerprint(again)), 0
+        )
+        self.assertGreater(
+            fingerprint_distance(image_fingerprint(page), image_fingerprint(other)), 0
+        )
+
+    @async_test
+    async def test_browser_agent_skips_unchanged_screenshots(self):
+        """The agent only sends a screenshot when the page changed."""
+        agent = BrowserAgent()
+        page = prepare_screenshot(screenshot(1280, 720), 6, 90)
+        other = prepare_screenshot(screenshot(1280, 720, text="other text"), 6, 90)
+
+        self.assertFalse(await agent._is_repeated_screenshot(page))
+        self.assertTrue(await agent._is_repeated_screenshot(page))
+        self.assertFalse(await agent._is_repeated_screenshot(other))
+
+
+class TestAttachImages(unittest.TestCase):
+    """Test which images are sent with a request."""
+
+    def messages(self):
+        return [
+            {"role": "user", "content": "task", "base64_image": "one"},
+            {"role": "assistant", "content": None, "tool_calls": [{"id": "c"}]},
+            {"role": "tool", "content": "done", "tool_call_id": "c", "base64_image": "two"},
+            {"role": "user", "content": "next", "base64_image": "three"},
+        ]
+
+    def test_only_recent_images_are_attached(self):
+        """Older images are dropped and tool images follow the tool results."""
+        result = attach_images(self.messages(), supports_images=True, max_images=2)
+
+        self.assertEqual(result[0], {"role": "user", "content": "task"})
+        self.assertEqual(result[2], {"role": "tool", "content": "done", "tool_call_id": "c"})
+        self.assertEqual(result[3]["role"], "user")
+        self.assertIn("base64,two", result[3]["content"][0]["image_url"]["url"])
+        self.assertEqual(result[4]["content"][0], {"type": "text", "text": "next"})
+        self.assertIn("base64,three", result[4]["content"][1]["image_url"]["url"])
+        self.assertFalse(any("base64_image" in msg for msg in result))
+
+    def test_models_without_vision_get_no_images(self):
+        """All images are stripped for text-only models."""
+        result = attach_images(self.messages(), supports_images=False, max_images=2)
+        self.assertEqual(len(result), 4)
+        self.assertTrue(all(isinstance(msg.get("content"), (str, type(None))) for msg in result))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,132 @@
+"""Tests for RPM/TPM rate limiting."""
+import asyncio
+import unittest
+from unittest.mock import AsyncMock, patch
+
+import litellm
+
+from app.llm.inference import LLM
+from app.llm.rate_limit import RateLimiter, TokenBucket
+from app.schema import Message
+
+
+def async_test(coro):
+    """Decorator for async test methods."""
+    def wrapper(*args, **kwargs):
+        loop = asyncio.get_event_loop()
+        return loop.run_until_complete(coro(*args, **kwargs))
+    return wrapper
+
+
+class TestTokenBucket(unittest.TestCase):
+    """Test the token bucket."""
+
+    def test_reservations_beyond_capacity_wait_for_refill(self):
+        """Once the bucket is empty, reservations wait for the refill rate."""
+        bucket = TokenBucket(capacity=2, refill_per_second=1)
+        self.assertEqual(bucket.reserve(1), 0)
+        self.assertEqual(bucket.reserve(1), 0)
+        self.assertAlmostEqual(bucket.reserve(1), 1.0, places=1)
+        self.assertAlmostEqual(bucket.reserve(1), 2.0, places=1)
+
+    def test_adjust_never_exceeds_capacity(self):
+        """Refunds are capped at the bucket capacity."""
+        bucket = TokenBucket(capacity=10, refill_per_second=1)
+        bucket.reserve(4)
+        bucket.adjust(100)
+        self.assertAlmostEqual(bucket.available, 10)
+
+
+class TestRateLimiter(unittest.TestCase):
+    """Test admission control across both budgets."""
+
+    def test_limiters_are_shared_per_model(self):
+        """The same model and limits give the same limiter."""
+        first = RateLimiter.for_model("shared-model", rpm=10)
+        self.assertIs(RateLimiter.for_model("shared-model", rpm=10), first)
+        self.assertIsNone(RateLimiter.for_model("shared-model"))
+
+    @async_test
+    async def test_rpm_budget_delays_excess_requests(self):
+        """A request beyond the RPM budget sleeps until a slot refills."""
+        limiter = RateLimiter(rpm=60)
+        limiter.requests.reserve(60)
+        with patch("app.llm.rate_limit.asyncio.sleep", new=AsyncMock()) as sleep:
+            await limiter.acquire()
+        self.assertAlmostEqual(sleep.await_args.args[0], 1.0, places=1)
+
+    @async_test
+    async def test_settle_returns_unused_tokens(self):
+        """Reserved tokens beyond actual usage go back to the bucket."""
+        limiter = RateLimiter(tpm=1000)
+        reserved = await limiter.acquire(800)
+        limiter.settle(reserved, 300)
+        self.assertAlmostEqual(limiter.tokens.available, 700, delta=1)
+
+    @async_test
+    async def test_oversized_request_only_refunds_what_it_took(self):
+        """A request above the TPM capacity reserves, and refunds, the capacity."""
+        limiter = RateLimiter(tpm=1000)
+        reserved = await limiter.acquire(5000)
+        self.assertEqual(reserved, 1000)
+        limiter.settle(reserved, 400)
+        self.assertAlmostEqual(limiter.tokens.available, 600, delta=1)
+
+    @async_test
+    async def test_cancelled_wait_releases_the_reservation(self):
+        """A caller cancelled while waiting gives its reservation back."""
+        limiter = RateLimiter(rpm=60, tpm=1000)
+        limiter.requests.reserve(60)
+        task = asyncio.ensure_future(limiter.acquire(500))
+        await asyncio.sleep(0)
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+        self.assertAlmostEqual(limiter.tokens.available, 1000, delta=1)
+
+
+class TestLLMRateLimiting(unittest.TestCase):
+    """Test the limiter in front of provider calls."""
+
+    def setUp(self):
+        """Give the default LLM a token budget."""
+        self.llm = LLM()
+        self.previous = (self.llm.rate_limiter, self.llm.response_cache)
+        self.llm.rate_limiter = RateLimiter(tpm=100000)
+        self.llm.response_cache = None
+
+    def tearDown(self):
+        """Restore the LLM singleton."""
+        self.llm.rate_limiter, self.llm.response_cache = self.previous
+
+    @async_test
+    async def test_ask_reserves_then_settles_with_usage(self):
+        """The worst case is reserved and the reported usage is charged."""
+        response = litellm.ModelResponse(
+            choices=[
+                {
+                    "index": 0,
+                    "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": "ok"},
+                }
+            ],
+            usage={"prompt_tokens": 20, "completion_tokens": 5, "total_tokens": 25},
+        )
+        limiter = self.llm.rate_limiter
+        with patch.object(
+            limiter, "acquire", wraps=limiter.acquire
+        ) as acquire, patch(
+            "app.llm.inference.litellm.acompletion",
+            new=AsyncMock(return_value=response),
+        ):
+            await self.llm.ask([Message.user_message("limit me")], stream=False)
+
+        prompt_tokens = self.llm.count_message_tokens([Message.user_message("limit me")])
+        self.assertEqual(
+            acquire.await_args.args[0], prompt_tokens + self.llm.max_tokens
+        )
+        self.assertAlmostEqual(limiter.tokens.available, 100000 - 25, delta=5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,139 @@
+"""Tests for the LLM response cache."""
+import asyncio
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import AsyncMock, patch
+
+import litellm
+
+from app.config import LLMCacheSettings
+from app.llm.cache import ResponseCache
+from app.llm.inference import LLM
+from app.schema import Message
+
+
+def async_test(coro):
+    """Decorator for async test methods."""
+    def wrapper(*args, **kwargs):
+        loop = asyncio.get_event_loop()
+        return loop.run_until_complete(coro(*args, **kwargs))
+    return wrapper
+
+class TestResponseCache(unittest.TestCase):
+    """Test the two cache tiers."""
+
+    def setUp(self):
+        """Create a cache backed by a temporary SQLite file."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.settings = LLMCacheSettings(
+            enabled=True,
+            memory_max_entries=2,
+            disk_path=os.path.join(self.tmpdir.name, "cache.sqlite"),
+        )
+        self.cache = ResponseCache(self.settings)
+
+    def tearDown(self):
+        """Close the cache and remove the temporary directory."""
+        self.cache.close()
+        self.tmpdir.cleanup()
+
+    def test_make_key_is_stable(self):
+        """Key does not depend on dict ordering."""
+        key_a = ResponseCache.make_key(model="m", messages=[{"role": "user", "content": "x"}])
+        key_b = ResponseCache.make_key(messages=[{"content": "x", "role": "user"}], model="m")
+        self.assertEqual(key_a, key_b)
+        self.assertNotEqual(key_a, ResponseCache.make_key(model="m2", messages=[]))
+
+    def test_memory_tier_evicts_least_recently_used(self):
+        """Memory tier keeps at most memory_max_entries values."""
+        self.cache.set_sync("a", 1)
+        self.cache.set_sync("b", 2)
+        self.cache.get_sync("a")
+        self.cache.set_sync("c", 3)
+        self.assertEqual(self.cache.stats()["memory_entries"], 2)
+        self.assertIn("a", self.cache._memory)
+        self.assertNotIn("b", self.cache._memory)
+        # Evicted values are still served from disk
+        self.assertEqual(self.cache.get_sync("b"), 2)
+
+    def test_disk_tier_survives_restart(self):
+        """A new cache instance sees entries written by a previous one."""
+        self.cache.set_sync("key", {"content": "hello"})
+        self.cache.close()
+        self.cache = ResponseCache(self.settings)
+        self.assertEqual(self.cache.get_sync("key"), {"content": "hello"})
+
+    def test_expired_entries_are_dropped(self):
+        """Entries older than the TTL are misses."""
+        self.cache.settings.ttl = 10
+        with patch("app.llm.cache.time.time", return_value=time.time() - 60):
+            self.cache.set_sync("old", "value")
+        self.assertIsNone(self.cache.get_sync("old"))
+        self.assertEqual(self.cache.stats()["disk_entries"], 0)
+
+    def test_disk_tier_is_bounded(self):
+        """Pruning keeps the disk tier under disk_max_entries."""
+        self.cache.settings.disk_max_entries = 5
+        for i in range(ResponseCache.PRUNE_INTERVAL):
+            self.cache.set_sync(f"k{i}", i)
+        self.assertLessEqual(self.cache.stats()["disk_entries"], 5)
+
+
+class TestLLMResponseCache(unittest.TestCase):
+    """Test cache integration in LLM.ask_tool."""
+
+    def setUp(self):
+        """Attach an in-memory cache to the default LLM."""
+        self.llm = LLM()
+        self.previous_cache = self.llm.response_cache
+        self.llm.response_cache = ResponseCache(
+            LLMCacheSettings(enabled=True, disk_enabled=False)
+        )
+        self.hits = self.llm.cost_tracker.cache_hits
+        self.misses = self.llm.cost_tracker.cache_misses
+
+    def tearDown(self):
+        """Restore the LLM singleton."""
+        self.llm.response_cache = self.previous_cache
+
+    @async_test
+    async def test_identical_ask_tool_calls_hit_cache(self):
+        """Second identical request is served without calling the provider."""
+        response = litellm.ModelResponse(
+            choices=[
+                {
+                    "index": 0,
+                    "finish_reason": "tool_calls",
+                    "message": {
+                        "role": "assistant",
+                        "content": None,
+                        "tool_calls": [
+                            {
+                                "id": "call_1",
+                                "type": "function",
+                                "function": {"name": "planning", "arguments": "{}"},
+                            }
+                        ],
+                    },
+                }
+            ]
+        )
+        messages = [Message.user_message("plan a trip")]
+        with patch(
+            "app.llm.inference.litellm.acompletion",
+            new=AsyncMock(return_value=response),
+        ) as mock_acompletion:
+            first = await self.llm.ask_tool(messages, tools=[])
+            second = await self.llm.ask_tool(messages, tools=[])
+
+        self.assertEqual(mock_acompletion.await_count, 1)
+        self.assertEqual(second.tool_calls[0].function.name, "planning")
+        self.assertEqual(second.tool_calls[0].id, first.tool_calls[0].id)
+        self.assertEqual(self.llm.cost_tracker.cache_hits, self.hits + 1)
+        self.assertEqual(self.llm.cost_tracker.cache_misses, self.misses + 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
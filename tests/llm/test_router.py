@@ -0,0 +1,161 @@
+"""Tests for cheap-first model routing."""
+import asyncio
+import json
+import unittest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import litellm
+
+from app.config import LLMRoutingSettings
+from app.llm.inference import LLM
+from app.llm.router import CascadeLLM, route
+from app.schema import Message
+
+
+def async_test(coro):
+    """Decorator for async test methods."""
+    def wrapper(*args, **kwargs):
+        loop = asyncio.get_event_loop()
+        return loop.run_until_complete(coro(*args, **kwargs))
+    return wrapper
+
+
+TOOLS = [
+    {
+        "type": "function",
+        "function": {"name": "extract", "parameters": {"type": "object"}},
+    }
+]
+
+
+def tool_response(name: str = "extract", arguments: str = '{"a": 1}'):
+    """Build a response message with one tool call."""
+    return SimpleNamespace(
+        content=None,
+        tool_calls=[
+            SimpleNamespace(
+                id="call_1",
+                function=SimpleNamespace(name=name, arguments=arguments),
+            )
+        ],
+    )
+
+
+def fake_llm(model: str) -> MagicMock:
+    """Build an LLM stand-in with async ask methods."""
+    llm = MagicMock()
+    llm.model = model
+    llm.ask = AsyncMock()
+    llm.ask_tool = AsyncMock()
+    return llm
+
+
+class TestCascadeLLM(unittest.TestCase):
+    """Test escalation from the cheap to the primary model."""
+
+    def setUp(self):
+        """Create a cascade over two fake models."""
+        self.cheap = fake_llm("cheap")
+        self.primary = fake_llm("primary")
+        self.cascade = CascadeLLM("test.site", self.cheap, self.primary)
+        self.messages = [Message.user_message("hi")]
+
+    @async_test
+    async def test_valid_cheap_tool_call_is_used(self):
+        """A valid cheap answer is returned and replayed to the callback."""
+        self.cheap.ask_tool.return_value = tool_response()
+        seen = []
+
+        async def on_tool_call(tool_call):
+            seen.append(tool_call.function.name)
+
+        response = await self.cascade.ask_tool(
+            self.messages, tools=TOOLS, tool_choice="required", on_tool_call=on_tool_call
+        )
+
+        self.assertEqual(json.loads(response.tool_calls[0].function.arguments), {"a": 1})
+        self.assertEqual(seen, ["extract"])
+        self.primary.ask_tool.assert_not_awaited()
+        self.assertNotIn("on_tool_call", self.cheap.ask_tool.await_args.kwargs)
+
+    @async_test
+    async def test_invalid_json_arguments_escalate(self):
+        """Unparseable tool arguments go to the primary model."""
+        self.cheap.ask_tool.return_value = tool_response(arguments="{not json")
+        self.primary.ask_tool.return_value = tool_response()
+
+        await self.cascade.ask_tool(self.messages, tools=TOOLS, tool_choice="required")
+
+        self.primary.ask_tool.assert_awaited_once()
+
+    @async_test
+    async def test_unknown_tool_escalates(self):
+        """A tool call outside the offered tools goes to the primary model."""
+        self.cheap.ask_tool.return_value = tool_response(name="other")
+        self.primary.ask_tool.return_value = tool_response()
+
+        await self.cascade.ask_tool(self.messages, tools=TOOLS)
+
+        self.primary.ask_tool.assert_awaited_once()
+
+    @async_test
+    async def test_empty_text_answer_escalates(self):
+        """A blank cheap answer is replaced by the primary answer."""
+        self.cheap.ask.return_value = "  "
+        self.primary.ask.return_value = "summary"
+
+        result = await self.cascade.ask(self.messages)
+
+        self.assertEqual(result, "summary")
+        self.assertFalse(self.cheap.ask.await_args.kwargs["stream"])
+
+    @async_test
+    async def test_cheap_error_escalates(self):
+        """A failing cheap call falls back to the primary model."""
+        self.cheap.ask.side_effect = RuntimeError("boom")
+        self.primary.ask.return_value = "summary"
+
+        self.assertEqual(await self.cascade.ask(self.messages), "summary")
+
+
+    @async_test
+    async def test_unavailable_cheap_model_escalates_without_retrying(self):
+        """A rate-limited cheap model is tried once, not backed off and retried."""
+        cheap = LLM()
+        previous = cheap.response_cache
+        cheap.response_cache = None
+        self.primary.ask.return_value = "summary"
+        acompletion = AsyncMock(
+            side_effect=litellm.RateLimitError("slow down", "openai", cheap.model)
+        )
+        try:
+            with patch("app.llm.inference.litellm.acompletion", new=acompletion):
+                cascade = CascadeLLM("test.site", cheap, self.primary)
+                result = await cascade.ask(self.messages)
+        finally:
+            cheap.response_cache = previous
+
+        self.assertEqual(result, "summary")
+        self.assertEqual(acompletion.await_count, 1)
+
+class TestRoute(unittest.TestCase):
+    """Test call site route resolution."""
+
+    def test_unrouted_call_site_uses_primary(self):
+        """Without routing the primary LLM itself is returned."""
+        primary = LLM()
+        self.assertIs(route("test.site", primary, LLMRoutingSettings()), primary)
+
+        settings = LLMRoutingSettings(enabled=True, routes={"other.site": "default"})
+        self.assertIs(route("test.site", primary, settings), primary)
+
+    def test_unknown_config_name_uses_primary(self):
+        """A route to a missing config falls back to the primary LLM."""
+        primary = LLM()
+        settings = LLMRoutingSettings(enabled=True, routes={"test.site": "missing"})
+        self.assertIs(route("test.site", primary, settings), primary)
+
+
+if __name__ == "__main__":
+    unittest.main()
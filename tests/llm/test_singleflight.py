@@ -0,0 +1,221 @@
+"""Tests for single-flight coalescing of LLM requests."""
+import asyncio
+import contextlib
+import io
+import unittest
+from unittest.mock import AsyncMock, patch
+
+import litellm
+from litellm.types.utils import ModelResponseStream
+
+from app.llm.events import ConsoleTokenSink, token_sink
+from app.llm.inference import LLM
+from app.llm.singleflight import SingleFlight
+from app.schema import Message
+
+
+def async_test(coro):
+    """Decorator for async test methods."""
+    def wrapper(*args, **kwargs):
+        loop = asyncio.get_event_loop()
+        return loop.run_until_complete(coro(*args, **kwargs))
+    return wrapper
+
+
+class TestSingleFlight(unittest.TestCase):
+    """Test the SingleFlight primitive."""
+
+    @async_test
+    async def test_concurrent_calls_share_one_run(self):
+        """Callers with the same key get the result of a single call."""
+        flights = SingleFlight()
+        calls = 0
+
+        async def fn(publish):
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return "result"
+
+        results = await asyncio.gather(*(flights.do("key", fn) for _ in range(5)))
+        self.assertEqual(results, ["result"] * 5)
+        self.assertEqual(calls, 1)
+        self.assertFalse(flights.in_flight("key"))
+
+    @async_test
+    async def test_published_items_are_replayed_to_late_joiners(self):
+        """A caller joining mid-stream still receives every item in order."""
+        flights = SingleFlight()
+        release = asyncio.Event()
+
+        async def fn(publish):
+            publish(1)
+            await release.wait()
+            publish(2)
+            return "done"
+
+        first_items, second_items = [], []
+
+        async def collect(items, item):
+            items.append(item)
+
+        first = asyncio.ensure_future(
+            flights.do("key", fn, on_item=lambda i: collect(first_items, i))
+        )
+        await asyncio.sleep(0)
+        second = asyncio.ensure_future(
+            flights.do("key", fn, on_item=lambda i: collect(second_items, i))
+        )
+        await asyncio.sleep(0)
+        release.set()
+
+        self.assertEqual(await asyncio.gather(first, second), ["done", "done"])
+        self.assertEqual(first_items, [1, 2])
+        self.assertEqual(second_items, [1, 2])
+
+    @async_test
+    async def test_cancelling_one_caller_keeps_the_shared_call(self):
+        """The shared call survives until its last waiter is cancelled."""
+        flights = SingleFlight()
+        release = asyncio.Event()
+        cancelled = False
+
+        async def fn(publish):
+            nonlocal cancelled
+            try:
+                await release.wait()
+                return "result"
+            except asyncio.CancelledError:
+                cancelled = True
+                raise
+
+        first = asyncio.ensure_future(flights.do("key", fn))
+        second = asyncio.ensure_future(flights.do("key", fn))
+        await asyncio.sleep(0)
+
+        first.cancel()
+        await asyncio.sleep(0)
+        self.assertFalse(cancelled)
+        release.set()
+        self.assertEqual(await second, "result")
+
+    @async_test
+    async def test_cancelling_the_last_caller_cancels_the_call(self):
+        """A shared call nobody waits for any more is cancelled."""
+        flights = SingleFlight()
+        started = asyncio.Event()
+        cancelled = asyncio.Event()
+
+        async def fn(publish):
+            started.set()
+            try:
+                await asyncio.Event().wait()
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        caller = asyncio.ensure_future(flights.do("key", fn))
+        await started.wait()
+        caller.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await caller
+        await asyncio.wait_for(cancelled.wait(), timeout=1)
+        await asyncio.sleep(0)
+        self.assertFalse(flights.in_flight("key"))
+
+    @async_test
+    async def test_errors_reach_every_caller(self):
+        """An exception from the shared call is raised to all callers."""
+        flights = SingleFlight()
+
+        async def fn(publish):
+            await asyncio.sleep(0)
+            raise ValueError("boom")
+
+        results = await asyncio.gather(
+            flights.do("key", fn), flights.do("key", fn), return_exceptions=True
+        )
+        self.assertTrue(all(isinstance(r, ValueError) for r in results))
+
+
+class TestLLMCoalescing(unittest.TestCase):
+    """Test coalescing in LLM.ask and LLM.ask_tool."""
+
+    def setUp(self):
+        """Use the default LLM without the response cache."""
+        self.llm = LLM()
+        self.previous_cache = self.llm.response_cache
+        self.llm.response_cache = None
+
+    def tearDown(self):
+        """Restore the LLM singleton."""
+        self.llm.response_cache = self.previous_cache
+
+    @async_test
+    async def test_identical_concurrent_ask_calls_are_coalesced(self):
+        """Concurrent identical non-streaming asks send a single request."""
+        response = litellm.ModelResponse(
+            choices=[
+                {
+                    "index": 0,
+                    "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": "summary"},
+                }
+            ]
+        )
+
+        async def slow_completion(**kwargs):
+            await asyncio.sleep(0.01)
+            return response
+
+        coalesced = self.llm.cost_tracker.coalesced_requests
+        messages = [Message.user_message("summarize the plan")]
+        with patch(
+            "app.llm.inference.litellm.acompletion",
+            new=AsyncMock(side_effect=slow_completion),
+        ) as mock_acompletion:
+            results = await asyncio.gather(
+                *(self.llm.ask(messages, stream=False) for _ in range(3))
+            )
+
+        self.assertEqual(results, ["summary"] * 3)
+        self.assertEqual(mock_acompletion.await_count, 1)
+        self.assertEqual(self.llm.cost_tracker.coalesced_requests, coalesced + 2)
+
+
+    @async_test
+    async def test_coalesced_streams_are_printed_once(self):
+        """A console shared by coalesced callers shows the stream once."""
+        release = asyncio.Event()
+
+        async def stream():
+            yield ModelResponseStream(
+                choices=[{"index": 0, "delta": {"content": "shared "}}]
+            )
+            await release.wait()
+            yield ModelResponseStream(
+                choices=[{"index": 0, "delta": {"content": "answer"}}]
+            )
+
+        messages = [Message.user_message("stream the summary")]
+        output = io.StringIO()
+        with patch(
+            "app.llm.inference.litellm.acompletion",
+            new=AsyncMock(side_effect=lambda **kwargs: stream()),
+        ) as mock_acompletion, contextlib.redirect_stdout(output), token_sink(
+            ConsoleTokenSink()
+        ):
+            first = asyncio.ensure_future(self.llm.ask(messages))
+            await asyncio.sleep(0.01)
+            second = asyncio.ensure_future(self.llm.ask(messages))
+            await asyncio.sleep(0)
+            release.set()
+            results = await asyncio.gather(first, second)
+
+        self.assertEqual(results, ["shared answer"] * 2)
+        self.assertEqual(mock_acompletion.await_count, 1)
+        self.assertEqual(output.getvalue(), "shared answer\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
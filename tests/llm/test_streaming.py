@@ -0,0 +1,151 @@
+"""Tests for streamed tool-call assembly."""
+import asyncio
+import unittest
+from unittest.mock import AsyncMock, patch
+
+from litellm.types.utils import Delta, ModelResponseStream
+
+from app.exceptions import ToolCallStreamInterrupted
+from app.llm.inference import LLM
+from app.llm.streaming import ToolCallAssembler
+from app.schema import Message
+
+
+def async_test(coro):
+    """Decorator for async test methods."""
+    def wrapper(*args, **kwargs):
+        loop = asyncio.get_event_loop()
+        return loop.run_until_complete(coro(*args, **kwargs))
+    return wrapper
+
+
+def tool_delta(index, arguments, call_id=None, name=None):
+    """Build a streamed delta carrying one tool call fragment."""
+    function = {"arguments": arguments}
+    if name:
+        function["name"] = name
+    call = {"index": index, "function": function}
+    if call_id:
+        call.update(id=call_id, type="function")
+    return Delta(tool_calls=[call])
+
+
+def chunks_of(deltas):
+    """Wrap deltas into an async stream of chunks."""
+    async def stream():
+        for delta in deltas:
+            yield ModelResponseStream(choices=[{"index": 0, "delta": delta.model_dump()}])
+    return stream()
+
+
+class TestToolCallAssembler(unittest.TestCase):
+    """Test ToolCallAssembler."""
+
+    def test_call_completes_when_json_closes(self):
+        """A call is reported as soon as its arguments object closes."""
+        assembler = ToolCallAssembler()
+        self.assertEqual(
+            assembler.feed(tool_delta(0, '{"query": "a {b', "call_1", "web_search")), []
+        )
+        completed = assembler.feed(tool_delta(0, '}"}'))
+        self.assertEqual(len(completed), 1)
+        self.assertEqual(completed[0].id, "call_1")
+        self.assertEqual(completed[0].function.arguments, '{"query": "a {b}"}')
+        self.assertEqual(assembler.finish(), [])
+
+    def test_next_index_completes_previous_call(self):
+        """Calls are completed in order, even without closing JSON."""
+        assembler = ToolCallAssembler()
+        assembler.feed(tool_delta(0, '{"a": 1', "call_1", "first"))
+        completed = assembler.feed(tool_delta(1, "{}", "call_2", "second"))
+        self.assertEqual([call.id for call in completed], ["call_1", "call_2"])
+
+    def test_content_is_collected(self):
+        """Text deltas are joined into content."""
+        assembler = ToolCallAssembler()
+        assembler.feed(Delta(content="Let me "))
+        assembler.feed(Delta(content="search."))
+        self.assertEqual(assembler.content, "Let me search.")
+
+
+class TestAskToolStreaming(unittest.TestCase):
+    """Test streamed ask_tool with early tool dispatch."""
+
+    def setUp(self):
+        """Use the default LLM without a response cache."""
+        self.llm = LLM()
+        self.previous_cache = self.llm.response_cache
+        self.llm.response_cache = None
+
+    def tearDown(self):
+        """Restore the LLM singleton."""
+        self.llm.response_cache = self.previous_cache
+
+    @async_test
+    async def test_tool_calls_dispatched_before_stream_ends(self):
+        """Callback sees the first call before the rest has streamed."""
+        dispatched = []
+        stream_finished = False
+        stream_state_at_dispatch = {}
+        first_dispatched = asyncio.Event()
+
+        deltas = [
+            tool_delta(0, '{"query": "x"}', "call_1", "web_search"),
+            tool_delta(1, '{"code": ', "call_2", "python_execute"),
+            tool_delta(1, '"print(1)"}'),
+        ]
+
+        async def stream():
+            nonlocal stream_finished
+            for i, delta in enumerate(deltas):
+                yield ModelResponseStream(
+                    choices=[{"index": 0, "delta": delta.model_dump()}]
+                )
+                if i == 0:
+                    # Hold the rest of the stream until call_1 is dispatched
+                    try:
+                        await asyncio.wait_for(first_dispatched.wait(), timeout=1)
+                    except asyncio.TimeoutError:
+                        pass
+            stream_finished = True
+
+        async def on_tool_call(call):
+            dispatched.append(call.id)
+            stream_state_at_dispatch[call.id] = stream_finished
+            if call.id == "call_1":
+                first_dispatched.set()
+
+        with patch(
+            "app.llm.inference.litellm.acompletion",
+            new=AsyncMock(side_effect=lambda **kwargs: stream()),
+        ):
+            message = await self.llm.ask_tool(
+                [Message.user_message("go")], tools=[], on_tool_call=on_tool_call
+            )
+
+        self.assertEqual(dispatched, ["call_1", "call_2"])
+        self.assertFalse(stream_state_at_dispatch["call_1"])
+        self.assertTrue(stream_finished)
+        self.assertEqual([call.id for call in message.tool_calls], ["call_1", "call_2"])
+        self.assertEqual(message.tool_calls[1].function.arguments, '{"code": "print(1)"}')
+
+    @async_test
+    async def test_failure_after_dispatch_is_not_retried(self):
+        """A stream error after dispatch raises instead of re-running tools."""
+        async def broken_stream():
+            yield ModelResponseStream(
+                choices=[{"index": 0, "delta": tool_delta(0, "{}", "call_1", "a").model_dump()}]
+            )
+            raise ConnectionError("stream dropped")
+
+        acompletion = AsyncMock(side_effect=lambda **kwargs: broken_stream())
+        with patch("app.llm.inference.litellm.acompletion", new=acompletion):
+            with self.assertRaises(ToolCallStreamInterrupted):
+                await self.llm.ask_tool(
+                    [Message.user_message("go")], tools=[], on_tool_call=AsyncMock()
+                )
+        self.assertEqual(acompletion.await_count, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
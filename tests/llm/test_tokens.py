@@ -0,0 +1,81 @@
+"""Tests for the shared tokenizer registry."""
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from app.llm import tokens
+from app.llm.tokens import get_token_counter, prewarm_tokenizers
+
+
+class TestBatchCounting(unittest.TestCase):
+    """Test batched encoding and counting."""
+
+    def setUp(self):
+        """Use the default tokenizer."""
+        self.counter = get_token_counter()
+
+    def test_encode_batch_matches_single_encoding(self):
+        """Batched encoding gives the same tokens, small and large batches alike."""
+        for size in (3, tokens.BATCH_MIN_TEXTS + 4):
+            texts = [f"message number {i} " * (i + 1) for i in range(size)]
+            self.assertEqual(
+                self.counter.encode_batch(texts),
+                [self.counter.tokenizer.encode(text) for text in texts],
+            )
+
+    def test_count_messages_matches_single_counts(self):
+        """Counting many messages at once equals counting them one by one."""
+        messages = [
+            {"role": "user", "content": "hello " * i, "name": "user"} for i in range(30)
+        ] + [
+            {
+                "role": "assistant",
+                "content": [{"type": "text", "text": "let me look"}],
+                "tool_calls": [{"function": {"name": "search", "arguments": "{}"}}],
+            },
+            {"role": "tool", "content": "", "tool_call_id": "call_1"},
+        ]
+        self.assertEqual(
+            self.counter.count_messages(messages),
+            [self.counter.count_single_message(msg) for msg in messages],
+        )
+
+
+class TestRegistry(unittest.TestCase):
+    """Test loading tokenizers once per process."""
+
+    def test_prewarm_loads_in_the_background(self):
+        """Pre-warmed tokenizers are in the shared registry."""
+        with patch.dict(tokens._counters, clear=True):
+            thread = prewarm_tokenizers(["prewarm-test-model"])
+            thread.join(timeout=60)
+            self.assertTrue(thread.daemon)
+            self.assertIn("prewarm-test-model", tokens._counters)
+            self.assertIs(
+                get_token_counter("prewarm-test-model"),
+                tokens._counters["prewarm-test-model"],
+            )
+
+    def test_disk_cache_is_seeded_from_the_previous_cache(self):
+        """Encodings already cached elsewhere are copied to the project cache."""
+        with tempfile.TemporaryDirectory() as tmp:
+            previous = Path(tmp) / "bundled"
+            previous.mkdir()
+            name = "a" * 40
+            (previous / name).write_text("ranks")
+            cache_dir = Path(tmp) / "cache"
+
+            with patch.object(tokens, "_disk_cache_ready", False), patch.object(
+                tokens, "ENCODING_CACHE_DIR", cache_dir
+            ), patch.dict(os.environ, {"TIKTOKEN_CACHE_DIR": str(previous)}):
+                os.environ.pop("CUSTOM_TIKTOKEN_CACHE_DIR", None)
+                tokens._use_disk_cache()
+                self.assertEqual(os.environ["TIKTOKEN_CACHE_DIR"], str(cache_dir))
+
+            self.assertEqual((cache_dir / name).read_text(), "ranks")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,128 @@
+"""Tests for the shared pooled HTTP transport."""
+import asyncio
+import unittest
+from unittest.mock import AsyncMock, patch
+
+import httpx
+import litellm
+from openai import AsyncOpenAI
+
+from app.config import config
+from app.llm import transport
+from app.llm.inference import LLM
+from app.schema import Message
+
+
+def async_test(coro):
+    """Decorator for async test methods."""
+    def wrapper(*args, **kwargs):
+        loop = asyncio.get_event_loop()
+        return loop.run_until_complete(coro(*args, **kwargs))
+    return wrapper
+
+
+class TestPerHostTransport(unittest.TestCase):
+    """Test per-host pooling."""
+
+    def setUp(self):
+        """Replace real connection pools with mock transports."""
+        self.pools = []
+
+        def make_pool(**kwargs):
+            pool = httpx.MockTransport(lambda request: httpx.Response(200, text="ok"))
+            self.pools.append((pool, kwargs))
+            return pool
+
+        patcher = patch.object(
+            transport.httpx, "AsyncHTTPTransport", side_effect=make_pool
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.limits = httpx.Limits(max_connections=1, max_keepalive_connections=1)
+        self.transport = transport.PerHostTransport(limits=self.limits)
+
+    @async_test
+    async def test_one_pool_per_host(self):
+        """Requests to the same host share a pool, other hosts get their own."""
+        async with httpx.AsyncClient(transport=self.transport) as client:
+            for _ in range(3):
+                response = await client.get("https://api.example.com/a")
+                self.assertEqual(response.text, "ok")
+            await client.get("https://other.example.com/a")
+        self.assertEqual(len(self.pools), 2)
+        self.assertTrue(all(kwargs["limits"] is self.limits for _, kwargs in self.pools))
+
+    @async_test
+    async def test_unclosed_responses_do_not_block_later_requests(self):
+        """Abandoned streamed responses leave later requests free to proceed."""
+        async with httpx.AsyncClient(transport=self.transport) as client:
+            for _ in range(5):
+                request = client.build_request("GET", "https://api.example.com/")
+                await asyncio.wait_for(client.send(request, stream=True), timeout=1)
+
+
+class TestSharedClient(unittest.TestCase):
+    """Test the shared client and its use by LLM."""
+
+    @async_test
+    async def test_client_is_shared_within_a_loop(self):
+        """Every caller on the same loop gets the same client."""
+        client = transport.get_async_client()
+        self.assertIs(transport.get_async_client(), client)
+
+    def test_each_loop_gets_its_own_client(self):
+        """Clients are not reused across event loops."""
+
+        async def get_client():
+            return transport.get_async_client()
+
+        first_loop, second_loop = asyncio.new_event_loop(), asyncio.new_event_loop()
+        try:
+            first = first_loop.run_until_complete(get_client())
+            second = second_loop.run_until_complete(get_client())
+        finally:
+            first_loop.close()
+            second_loop.close()
+        self.assertIsNot(first, second)
+
+    def test_http2_falls_back_without_h2(self):
+        """A missing h2 package downgrades to HTTP/1.1 instead of failing."""
+        settings = config.llm["default"].model_copy(update={"http2": True})
+        with patch.object(transport, "_http2_available", return_value=False):
+            client = transport.build_async_client(settings)
+        self.assertIsInstance(client, httpx.AsyncClient)
+
+    @async_test
+    async def test_openai_requests_use_the_pooled_client(self):
+        """OpenAI requests are sent with an SDK client on the shared pool."""
+        llm = LLM()
+        previous = llm.provider
+        llm.provider = "openai"
+        self.addCleanup(setattr, llm, "provider", previous)
+
+        response = litellm.ModelResponse(
+            choices=[
+                {
+                    "index": 0,
+                    "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": "hi"},
+                }
+            ]
+        )
+        with patch(
+            "app.llm.inference.litellm.acompletion",
+            new=AsyncMock(return_value=response),
+        ) as mock_acompletion:
+            await llm.ask([Message.user_message("pooled?")], stream=False)
+
+        client = mock_acompletion.await_args.kwargs["client"]
+        self.assertIsInstance(client, AsyncOpenAI)
+        self.assertIs(client._client, transport.get_async_client())
+
+    def test_other_providers_get_no_sdk_client(self):
+        """Providers outside the OpenAI SDK keep litellm's own handlers."""
+        self.assertIsNone(transport.get_sdk_client("anthropic", "key", None))
+
+
+if __name__ == "__main__":
+    unittest.main()
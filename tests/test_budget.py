@@ -0,0 +1,156 @@
+"""Tests for run budgets and their propagation to LLM and tool calls."""
+import asyncio
+import time
+import unittest
+from unittest.mock import AsyncMock, patch
+
+import litellm
+
+from app.agent.base import BaseAgent
+from app.budget import RunBudget, run_budget
+from app.exceptions import BudgetExceeded
+from app.llm.cost import Cost
+from app.llm.inference import LLM
+from app.schema import AgentState, Message
+from app.tool import ToolCollection
+from app.tool.base import BaseTool
+
+
+def async_test(coro):
+    """Decorator for async test methods."""
+    def wrapper(*args, **kwargs):
+        loop = asyncio.get_event_loop()
+        return loop.run_until_complete(coro(*args, **kwargs))
+    return wrapper
+
+
+class SlowTool(BaseTool):
+    """Sleeps far longer than any budget in these tests."""
+
+    name: str = "slow"
+    description: str = "Take a long time"
+    parameters: dict = {"type": "object", "properties": {}}
+
+    async def execute(self):
+        await asyncio.sleep(10)
+        return "done"
+
+
+class SlowAgent(BaseAgent):
+    """Each step sleeps far longer than any budget in these tests."""
+
+    name: str = "slow"
+    max_steps: int = 3
+
+    async def step(self) -> str:
+        await asyncio.sleep(10)
+        return "slept"
+
+
+class TestRunBudget(unittest.TestCase):
+    """Test the limits of a budget."""
+
+    def test_timeouts_are_cut_to_the_deadline(self):
+        """A call waits for its own timeout or the time left, whichever is less."""
+        budget = RunBudget(timeout=10)
+        self.assertTrue(9 < budget.timeout(120) <= 10)
+        self.assertEqual(budget.timeout(1), 1)
+        self.assertEqual(RunBudget().timeout(120), 120)
+
+    def test_exceeded_names_the_used_up_limit(self):
+        """Usage is charged until a limit is reached."""
+        budget = RunBudget(max_cost=1.0)
+        budget.charge(cost=0.6)
+        self.assertIsNone(budget.exceeded())
+        budget.charge(cost=0.5)
+        self.assertEqual(budget.exceeded(), "cost budget of $1 used up")
+        with self.assertRaises(BudgetExceeded):
+            budget.check()
+
+    def test_prompt_over_the_token_budget_is_refused(self):
+        """A prompt is only sent if it fits in the prompt tokens left."""
+        budget = RunBudget(max_prompt_tokens=100)
+        budget.charge(prompt_tokens=60)
+        budget.check(prompt_tokens=40)
+        with self.assertRaises(BudgetExceeded):
+            budget.check(prompt_tokens=41)
+
+
+class TestBudgetPropagation(unittest.TestCase):
+    """Test that calls made during a run respect its budget."""
+
+    def setUp(self):
+        """Use the default LLM with a fresh tracker and no cache."""
+        self.llm = LLM()
+        self.previous = (self.llm.cost_tracker, self.llm.response_cache)
+        self.llm.cost_tracker = Cost()
+        self.llm.response_cache = None
+
+    def tearDown(self):
+        """Restore the LLM singleton."""
+        self.llm.cost_tracker, self.llm.response_cache = self.previous
+
+    @async_test
+    async def test_llm_calls_use_the_time_left_and_charge_prompt_tokens(self):
+        """Requests time out by the deadline and stop once tokens run out."""
+        response = litellm.ModelResponse(
+            choices=[
+                {
+                    "index": 0,
+                    "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": "ok"},
+                }
+            ],
+            usage={"prompt_tokens": 20, "completion_tokens": 5, "total_tokens": 25},
+        )
+        budget = RunBudget(timeout=5, max_prompt_tokens=20)
+        acompletion = AsyncMock(return_value=response)
+        with run_budget(budget), patch(
+            "app.llm.inference.litellm.acompletion", new=acompletion
+        ):
+            await self.llm.ask([Message.user_message("hi")], stream=False)
+            self.assertLessEqual(acompletion.call_args.kwargs["timeout"], 5)
+            self.assertEqual(budget.prompt_tokens, 20)
+
+            with self.assertRaises(BudgetExceeded):
+                await self.llm.ask([Message.user_message("again")], stream=False)
+        self.assertEqual(acompletion.call_count, 1)
+
+    @async_test
+    async def test_tool_is_cancelled_at_the_deadline(self):
+        """A tool still running at the deadline fails instead of overrunning."""
+        budget = RunBudget(timeout=0.1)
+        started = time.perf_counter()
+        with run_budget(budget):
+            result = await ToolCollection(SlowTool()).execute(name="slow", tool_input={})
+
+        self.assertLess(time.perf_counter() - started, 1)
+        self.assertEqual(result.error, "Run budget exhausted: run deadline reached")
+        self.assertGreater(budget.tool_seconds, 0.05)
+
+    @async_test
+    async def test_tool_time_budget_is_shared_by_calls(self):
+        """Once tools used up their time, further calls are refused."""
+        tools = ToolCollection(SlowTool())
+        with run_budget(RunBudget(max_tool_seconds=0.05)):
+            first = await tools.execute(name="slow", tool_input={})
+            second = await tools.execute(name="slow", tool_input={})
+
+        expected = "Run budget exhausted: tool time budget of 0.05s used up"
+        self.assertEqual(first.error, expected)
+        self.assertEqual(second.error, expected)
+
+    @async_test
+    async def test_agent_step_is_preempted_at_the_deadline(self):
+        """A run stops at its deadline even in the middle of a step."""
+        agent = SlowAgent()
+        started = time.perf_counter()
+        result = await agent.run("wait", budget=RunBudget(timeout=0.1))
+
+        self.assertLess(time.perf_counter() - started, 1)
+        self.assertEqual(result, "Stopped: run budget exhausted (run deadline reached)")
+        self.assertEqual(agent.state, AgentState.IDLE)
+
+
+if __name__ == "__main__":
+    unittest.main()
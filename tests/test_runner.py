@@ -0,0 +1,113 @@
+"""Tests for the concurrent agent task runner."""
+import asyncio
+import json
+import os
+import tempfile
+import time
+import unittest
+from types import SimpleNamespace
+from typing import Any
+
+from app.agent.base import BaseAgent
+from app.config import RunnerSettings
+from app.llm.rate_limit import RateLimiter
+from app.runner import AgentRunner, AgentTask, read_tasks
+from app.sandbox.client import current_sandbox_client
+
+
+def async_test(coro):
+    """Decorator for async test methods."""
+    def wrapper(*args, **kwargs):
+        loop = asyncio.get_event_loop()
+        return loop.run_until_complete(coro(*args, **kwargs))
+    return wrapper
+
+
+class SleepyAgent(BaseAgent):
+    """Sleeps for the number of seconds in its prompt."""
+
+    name: str = "sleepy"
+    max_steps: int = 1
+    monitor: Any = None
+
+    async def run(self, request=None) -> str:
+        self.monitor["running"] += 1
+        self.monitor["peak"] = max(self.monitor["peak"], self.monitor["running"])
+        self.monitor["sandboxes"].add(id(current_sandbox_client()))
+        try:
+            if request == "fail":
+                raise RuntimeError("tool crashed")
+            await asyncio.sleep(float(request))
+            return f"slept {request}"
+        finally:
+            self.monitor["running"] -= 1
+
+    async def step(self) -> str:
+        return ""
+
+
+class TestAgentRunner(unittest.TestCase):
+    """Test bounded concurrent execution of tasks."""
+
+    def setUp(self):
+        self.monitor = {"running": 0, "peak": 0, "sandboxes": set()}
+
+        async def factory():
+            return SleepyAgent(monitor=self.monitor)
+
+        self.runner = AgentRunner(
+            agents={"sleepy": factory},
+            settings=RunnerSettings(max_concurrency=2, admission_tokens=0),
+        )
+        self.runner._admission_llm = SimpleNamespace(rate_limiter=None)
+
+    async def collect(self, prompts):
+        tasks = [
+            AgentTask(id=str(i), prompt=prompt, agent="sleepy")
+            for i, prompt in enumerate(prompts)
+        ]
+        return [result async for result in self.runner.run(tasks)]
+
+    @async_test
+    async def test_results_arrive_as_tasks_finish(self):
+        """At most max_concurrency tasks run, and faster tasks report first."""
+        results = await self.collect(["0.4", "0.05", "0.05", "0.01"])
+        self.assertEqual([r.id for r in results], ["1", "2", "3", "0"])
+        self.assertEqual(self.monitor["peak"], 2)
+        self.assertEqual(len(self.monitor["sandboxes"]), 4)
+
+    @async_test
+    async def test_failures_are_reported_per_task(self):
+        """A failing task does not stop the others."""
+        results = await self.collect(["fail", "0.01"])
+        by_id = {r.id: r for r in results}
+        self.assertEqual(by_id["0"].status, "failed")
+        self.assertEqual(by_id["0"].error, "tool crashed")
+        self.assertEqual(by_id["1"].result, "slept 0.01")
+
+    @async_test
+    async def test_admission_waits_for_rate_limit_headroom(self):
+        """A task only starts once the LLM's request budget has room."""
+        limiter = RateLimiter(rpm=600)  # One request every 0.1s
+        limiter.requests.reserve(600)  # Spend the whole budget
+        self.runner._admission_llm = SimpleNamespace(rate_limiter=limiter)
+        started = time.perf_counter()
+        await self.collect(["0"])
+        self.assertGreaterEqual(time.perf_counter() - started, 0.09)
+
+    @async_test
+    async def test_tasks_are_read_from_jsonl(self):
+        """Lines are task objects or bare prompts; blank lines are skipped."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "batch.jsonl")
+            with open(path, "w") as f:
+                f.write(json.dumps({"id": "a", "prompt": "0.01", "agent": "sleepy"}) + "\n\n")
+                f.write(json.dumps("say hi") + "\n")
+            tasks = [task async for task in read_tasks(path)]
+
+        self.assertEqual([(t.id, t.prompt) for t in tasks], [("a", "0.01"), ("batch-3", "say hi")])
+        self.assertEqual(tasks[1].agent, "manus")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,133 @@
+"""Tests for message formatting and memory token accounting."""
+import unittest
+
+from app.schema import Function, Memory, Message, Role, ToolCall
+
+
+class TestMessageCache(unittest.TestCase):
+    """Test cached formatting and token counts on Message."""
+
+    def test_to_dict_is_cached_and_copied(self):
+        """to_dict returns equal copies of a cached dict."""
+        message = Message.user_message("hello")
+        first = message.to_dict()
+        first["content"] = "changed"
+        self.assertEqual(message.to_dict()["content"], "hello")
+
+    def test_assignment_invalidates_cache(self):
+        """Assigning a field refreshes the dict and token count."""
+        message = Message.user_message("hi")
+        tokens = message.token_count
+        message.content = "a much longer message than before"
+        self.assertEqual(message.to_dict()["content"], "a much longer message than before")
+        self.assertGreater(message.token_count, tokens)
+
+
+class TestMemoryTokenTotal(unittest.TestCase):
+    """Test the running token total of Memory."""
+
+    def test_running_total_matches_sum(self):
+        """Total follows add_message, add_messages and clear."""
+        memory = Memory()
+        memory.add_message(Message.user_message("first message"))
+        memory.add_messages(
+            [Message.assistant_message("second"), Message.user_message("third")]
+        )
+        self.assertEqual(
+            memory.token_count, sum(msg.token_count for msg in memory.messages)
+        )
+        memory.clear()
+        self.assertEqual(memory.token_count, 0)
+
+    def test_eviction_subtracts_tokens(self):
+        """Messages dropped by max_messages no longer count."""
+        memory = Memory(max_messages=2)
+        for i in range(5):
+            memory.add_message(Message.user_message(f"message number {i}"))
+        self.assertEqual(len(memory.messages), 2)
+        self.assertEqual(
+            memory.token_count, sum(msg.token_count for msg in memory.messages)
+        )
+
+    def test_direct_list_changes_are_reconciled(self):
+        """Appending to or replacing the list is picked up."""
+        memory = Memory()
+        memory.add_message(Message.user_message("one"))
+        memory.messages.append(Message.user_message("two"))
+        self.assertEqual(
+            memory.token_count, sum(msg.token_count for msg in memory.messages)
+        )
+        memory.messages = [Message.user_message("three")]
+        self.assertEqual(memory.token_count, memory.messages[0].token_count)
+
+
+    def test_messages_replaced_at_the_same_length_are_recounted(self):
+        """Swapping or editing a message in place keeps the total in sync."""
+        memory = Memory()
+        memory.add_messages([Message.user_message("short"), Message.assistant_message("ok")])
+        self.assertGreater(memory.token_count, 0)
+
+        memory.messages[1] = Message.assistant_message("a much longer answer " * 20)
+        self.assertEqual(
+            memory.token_count, sum(msg.token_count for msg in memory.messages)
+        )
+        memory.messages[0].content = "edited"
+        self.assertEqual(
+            memory.token_count, sum(msg.token_count for msg in memory.messages)
+        )
+
+def tool_group(index: int, results: int = 2):
+    """An assistant message calling tools and their results."""
+    calls = [
+        ToolCall(id=f"call_{index}_{i}", function=Function(name="tool", arguments="{}"))
+        for i in range(results)
+    ]
+    return [Message.from_tool_calls(tool_calls=calls, content=f"step {index}")] + [
+        Message.tool_message("result " * 50, name="tool", tool_call_id=call.id)
+        for call in calls
+    ]
+
+
+class TestMemoryWindow(unittest.TestCase):
+    """Test token-budgeted eviction."""
+
+    def assert_no_orphans(self, memory: Memory):
+        called = set()
+        for msg in memory.messages:
+            if msg.tool_calls:
+                called.update(call.id for call in msg.tool_calls)
+            if msg.role == Role.TOOL:
+                self.assertIn(msg.tool_call_id, called)
+
+    def test_token_budget_keeps_task_and_tool_groups(self):
+        """Old groups are evicted whole and the task stays pinned."""
+        group_tokens = sum(msg.token_count for msg in tool_group(0))
+        memory = Memory(max_tokens=group_tokens * 3)
+        memory.add_message(Message.user_message("the task"))
+        for index in range(10):
+            memory.add_messages(tool_group(index))
+
+            self.assertLessEqual(memory.token_count, memory.max_tokens)
+            self.assert_no_orphans(memory)
+
+        self.assertEqual(memory.messages[0].content, "the task")
+        self.assertEqual(memory.messages[-3].content, "step 9")
+        self.assertEqual(
+            memory.token_count, sum(msg.token_count for msg in memory.messages)
+        )
+
+    def test_add_messages_respects_max_messages(self):
+        """A batch is evicted like single messages, and system messages stay."""
+        memory = Memory(max_messages=5)
+        memory.add_messages([Message.user_message("task"), Message.system_message("note")])
+        memory.add_messages(tool_group(0) + tool_group(1))
+
+        self.assertLessEqual(len(memory.messages), 5)
+        self.assertEqual(
+            [msg.content for msg in memory.messages[:2]], ["task", "note"]
+        )
+        self.assert_no_orphans(memory)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,114 @@
+"""Tests for run tracing and Chrome trace export."""
+import asyncio
+import json
+import os
+import tempfile
+import time
+import unittest
+
+from app.tool import ToolCollection
+from app.tool.base import BaseTool
+from app.tracing import NULL_SPAN, Tracer, begin_span, span, tracing
+
+
+def async_test(coro):
+    """Decorator for async test methods."""
+    def wrapper(*args, **kwargs):
+        loop = asyncio.get_event_loop()
+        return loop.run_until_complete(coro(*args, **kwargs))
+    return wrapper
+
+
+class EchoTool(BaseTool):
+    """Waits, then echoes its input."""
+
+    name: str = "echo"
+    description: str = "Echo the text"
+    parameters: dict = {"type": "object", "properties": {}}
+
+    async def execute(self, text: str):
+        await asyncio.sleep(0.02)
+        return text
+
+
+class TestTracer(unittest.TestCase):
+    """Test recording spans and exporting them."""
+
+    def test_nothing_is_recorded_without_a_tracer(self):
+        """Outside of `tracing`, spans are no-ops."""
+        with span("idle") as current:
+            current.set(size=1)
+        self.assertIs(current, NULL_SPAN)
+        self.assertIs(begin_span("idle"), NULL_SPAN)
+
+    @async_test
+    async def test_spans_record_wall_and_await_time(self):
+        """Time spent awaiting is reported apart from wall time."""
+        tracer = Tracer()
+        with tracing(tracer):
+            with span("outer", "agent", step=1) as outer:
+                await asyncio.sleep(0.05)
+                outer.set(tokens=42)
+
+        (recorded,) = tracer.spans
+        self.assertGreaterEqual(recorded.wall, 0.05)
+        self.assertGreater(recorded.awaited, 0.04)
+        self.assertEqual(recorded.args, {"step": 1, "tokens": 42})
+
+    @async_test
+    async def test_concurrent_tasks_get_their_own_tracks(self):
+        """Spans of tasks running at the same time are on separate tracks."""
+        tracer = Tracer()
+
+        async def work(name: str):
+            with span(name):
+                await asyncio.sleep(0.01)
+
+        with tracing(tracer):
+            await asyncio.gather(work("a"), work("b"))
+
+        tracks = {s.name: s.track for s in tracer.spans}
+        self.assertNotEqual(tracks["a"], tracks["b"])
+
+    @async_test
+    async def test_chrome_trace_export(self):
+        """The saved file holds complete events in microseconds and track names."""
+        tracer = Tracer()
+        with tracing(tracer):
+            with span("step", "agent"):
+                time.sleep(0.01)
+            begin_span("unfinished")
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "trace.json")
+            tracer.save(path)
+            with open(path) as f:
+                trace = json.load(f)
+
+        complete = [e for e in trace["traceEvents"] if e["ph"] == "X"]
+        self.assertEqual([e["name"] for e in complete], ["step"])
+        self.assertGreaterEqual(complete[0]["dur"], 10_000)
+        self.assertIn("await_ms", complete[0]["args"])
+        self.assertTrue(any(e["ph"] == "M" for e in trace["traceEvents"]))
+
+
+class TestToolSpans(unittest.TestCase):
+    """Test the spans recorded around tool calls."""
+
+    @async_test
+    async def test_tool_call_records_payload_sizes(self):
+        """A tool call span has the sizes of its input and output."""
+        tracer = Tracer()
+        tools = ToolCollection(EchoTool())
+        with tracing(tracer):
+            await tools.execute(name="echo", tool_input={"text": "hello"})
+
+        (tool_span,) = tracer.spans
+        self.assertEqual((tool_span.name, tool_span.category), ("echo", "tool"))
+        self.assertEqual(tool_span.args["output_size"], 5)
+        self.assertEqual(tool_span.args["input_size"], len('{"text": "hello"}'))
+        self.assertGreaterEqual(tool_span.wall, 0.02)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+"""Tests for the tool schemas of ToolCollection."""
+import unittest
+
+from app.tool import Terminate, ToolCollection
+from app.tool.base import BaseTool
+
+
+class NamedTool(BaseTool):
+    """Does nothing; only its schema matters."""
+
+    name: str = "lookup"
+    description: str = "Look something up"
+    parameters: dict = {"type": "object", "properties": {"q": {"type": "string"}}}
+
+    async def execute(self, **kwargs):
+        return ""
+
+
+class TestToolParams(unittest.TestCase):
+    """Test caching and versioning of the tool schemas."""
+
+    def test_params_are_reused_until_a_tool_is_added(self):
+        """Every call returns the same schemas while the tools are unchanged."""
+        tools = ToolCollection(Terminate())
+        first = tools.to_params()
+        self.assertIs(tools.to_params(), first)
+        self.assertEqual(tools.version, 0)
+
+        tools.add_tool(NamedTool())
+        self.assertEqual(tools.version, 1)
+        self.assertEqual(
+            [p["function"]["name"] for p in tools.to_params()], ["terminate", "lookup"]
+        )
+
+    def test_adding_a_tool_twice_replaces_it(self):
+        """A tool of an existing name is not listed twice."""
+        tools = ToolCollection(NamedTool())
+        replacement = NamedTool(description="Look something up again")
+        tools.add_tool(replacement)
+        params = tools.to_params()
+        self.assertEqual(len(params), 1)
+        self.assertEqual(params[0]["function"]["description"], "Look something up again")
+        self.assertIs(tools.get_tool("lookup"), replacement)
+
+
+    def test_params_cannot_be_changed_in_place(self):
+        """Callers get read-only schemas, so later requests are unaffected."""
+        tools = ToolCollection(NamedTool())
+        params = tools.to_params()
+        with self.assertRaises(TypeError):
+            params[0]["function"]["name"] = "changed"
+        with self.assertRaises(AttributeError):
+            params.append({"type": "function"})
+
+        copy = params.to_list()
+        copy[0]["function"]["name"] = "changed"
+        copy.append({"type": "function"})
+        self.assertEqual(tools.to_params()[0]["function"]["name"], "lookup")
+        self.assertEqual(len(tools.to_params()), 1)
+        self.assertEqual(tools.to_params().json, params.json)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,179 @@
+"""Tests for memoizing the results of idempotent tool calls."""
+import asyncio
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+from app.config import ToolMemoSettings
+from app.mcp.client import MCPServer, MCPToolSchema
+from app.mcp.tool import MCPTool
+from app.tool import ToolCollection
+from app.tool.base import BaseTool, ToolResult
+from app.tool.memo import ToolMemo
+from app.tool.str_replace_editor import StrReplaceEditor
+from app.tool.web_search import WebSearch
+
+
+def async_test(coro):
+    """Decorator for async test methods."""
+    def wrapper(*args, **kwargs):
+        loop = asyncio.get_event_loop()
+        return loop.run_until_complete(coro(*args, **kwargs))
+    return wrapper
+
+
+class CountingTool(BaseTool):
+    """Counts its calls; its results depend on the `state` fingerprint."""
+
+    name: str = "count"
+    description: str = "Count calls"
+    parameters: dict = {"type": "object", "properties": {"q": {"type": "string"}}}
+    calls: int = 0
+    state: str = "v1"
+    output: str = "found"
+
+    async def memo_fingerprint(self, **kwargs):
+        return self.state
+
+    async def execute(self, q: str = ""):
+        self.calls += 1
+        if q == "fail":
+            return ToolResult(error="lookup failed")
+        return ToolResult(output=self.output and f"{self.output} {q}")
+
+
+class TestToolMemo(unittest.TestCase):
+    """Test reuse of tool results by ToolCollection."""
+
+    def setUp(self):
+        self.tool = CountingTool()
+        self.tools = ToolCollection(self.tool)
+        self.tools.memo = ToolMemo(ToolMemoSettings())
+
+    @async_test
+    async def test_repeated_calls_run_the_tool_once(self):
+        """Calls with the same arguments and state share one result."""
+        first = await self.tools.execute(name="count", tool_input={"q": "a"})
+        second = await self.tools.execute(name="count", tool_input={"q": "a"})
+        await self.tools.execute(name="count", tool_input={"q": "b"})
+
+        self.assertEqual(second.output, "found a")
+        self.assertIs(second, first)
+        self.assertEqual(self.tool.calls, 2)
+        self.assertEqual(self.tools.memo.hits, 1)
+
+    @async_test
+    async def test_changed_state_runs_the_tool_again(self):
+        """A new fingerprint is a new key rather than a stale hit."""
+        await self.tools.execute(name="count", tool_input={"q": "a"})
+        self.tool.state = "v2"
+        await self.tools.execute(name="count", tool_input={"q": "a"})
+        self.assertEqual(self.tool.calls, 2)
+
+    @async_test
+    async def test_failures_and_empty_results_are_not_reused(self):
+        """Results that may be transient are fetched again."""
+        await self.tools.execute(name="count", tool_input={"q": "fail"})
+        await self.tools.execute(name="count", tool_input={"q": "fail"})
+        self.tool.output = ""
+        await self.tools.execute(name="count", tool_input={"q": "a"})
+        await self.tools.execute(name="count", tool_input={"q": "a"})
+        self.assertEqual(self.tool.calls, 4)
+
+    @async_test
+    async def test_disabled_memo_always_runs_the_tool(self):
+        """With [tool_memo] disabled, nothing is reused."""
+        self.tools.memo = ToolMemo(ToolMemoSettings(enabled=False))
+        await self.tools.execute(name="count", tool_input={"q": "a"})
+        await self.tools.execute(name="count", tool_input={"q": "a"})
+        self.assertEqual(self.tool.calls, 2)
+
+    def test_entries_expire_and_are_evicted(self):
+        """Results last for the TTL, and only max_entries are kept."""
+        memo = ToolMemo(ToolMemoSettings(max_entries=2, ttl=60))
+        for key in ("a", "b"):
+            memo.put(key, key)
+        memo.get("a")
+        memo.put("c", "c")
+        self.assertIsNone(memo.get("b"))
+        self.assertEqual(memo.get("a"), "a")
+
+        with patch("app.tool.memo.time.monotonic", return_value=time.monotonic() + 61):
+            self.assertIsNone(memo.get("c"))
+
+
+class TestOptInMemo(unittest.TestCase):
+    """Test tools whose results are only reused when configured to be."""
+
+    @async_test
+    async def test_web_search_is_reused_only_when_enabled(self):
+        """Search results change over time, so reuse is opt-in."""
+        search = WebSearch()
+        with patch("app.tool.web_search.config") as config:
+            config.tool_memo = ToolMemoSettings()
+            self.assertIsNone(await search.memo_fingerprint(query="news"))
+            config.tool_memo = ToolMemoSettings(web_search=True)
+            self.assertEqual(await search.memo_fingerprint(query="news"), "")
+
+    @async_test
+    @patch("app.mcp.tool.HAS_MCP_SDK", True)
+    @patch("app.mcp.tool.mcp_client")
+    async def test_mcp_tools_are_reused_only_when_listed(self, mock_client):
+        """Only tools in the server's readOnly config count as idempotent."""
+        schema = {"type": "object", "properties": {}}
+        server = MCPServer(
+            name="db",
+            command="python",
+            args=[],
+            readOnly=["schema"],
+            tools=[
+                MCPToolSchema(name="schema", description="Table schema", inputSchema=schema),
+                MCPToolSchema(name="query", description="Run a query", inputSchema=schema),
+            ],
+        )
+        mock_client.servers = {"db": server}
+
+        listed = MCPTool(server_name="db", tool_name="schema")
+        unlisted = MCPTool(server_name="db", tool_name="query")
+        self.assertEqual(await listed.memo_fingerprint(), "")
+        self.assertIsNone(await unlisted.memo_fingerprint())
+
+
+class TestFileViewMemo(unittest.TestCase):
+    """Test that file views are reused until the file changes."""
+
+    @async_test
+    async def test_view_is_reused_until_the_file_is_edited(self):
+        """An edit changes the file's fingerprint, so the next view is fresh."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "notes.txt")
+            with open(path, "w") as f:
+                f.write("hello\n")
+            editor = StrReplaceEditor()
+            tools = ToolCollection(editor)
+            tools.memo = ToolMemo(ToolMemoSettings())
+            view = {"command": "view", "path": path}
+
+            with patch("app.tool.str_replace_editor.config.sandbox.use_sandbox", False):
+                first = await tools.execute(name=editor.name, tool_input=view)
+                self.assertIs(await tools.execute(name=editor.name, tool_input=view), first)
+
+                await tools.execute(
+                    name=editor.name,
+                    tool_input={
+                        "command": "str_replace",
+                        "path": path,
+                        "old_str": "hello",
+                        "new_str": "hello world",
+                    },
+                )
+                updated = await tools.execute(name=editor.name, tool_input=view)
+
+        self.assertIn("hello world", str(updated))
+        self.assertEqual(tools.memo.hits, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()